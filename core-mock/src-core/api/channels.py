@@ -1,42 +1,66 @@
 """Channel API endpoints."""
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from src.database import get_db
+from src.config import settings
+from src.database import get_read_db
 from src.schemas import ChannelResponse
 from src.services.channel_service import ChannelService
+from src.utils.etag import etag_response
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 router = APIRouter()
 
+channel_list_adapter = TypeAdapter(List[ChannelResponse])
+
+def _channel_cache_control() -> str:
+    return f"max-age={settings.channel_cache_max_age}"
+
+def _stats_cache_control() -> str:
+    # Stats are already cached server-side for this long
+    return f"max-age={settings.channel_stats_cache_ttl}"
+
 @router.get("/channels", response_model=List[ChannelResponse])
-async def get_channels(db: Session = Depends(get_db)):
-    """Obtener todos los canales activos."""
+async def get_channels(request: Request, db: AsyncSession = Depends(get_read_db)):
+    """Obtener todos los canales activos.
+    
+    Los canales casi no cambian: se pueden cachear (Cache-Control) y revalidar con ETag.
+    """
+    service = ChannelService(db)
+    channels = await service.get_all_channels()
+    return etag_response(request, channel_list_adapter.dump_python(channels), _channel_cache_control())
+
+@router.get("/channels/stats")
+async def get_all_channel_stats(request: Request, db: AsyncSession = Depends(get_read_db)):
+    """Obtener estadísticas de todos los canales en una sola respuesta."""
     service = ChannelService(db)
-    return await service.get_all_channels()
+    return etag_response(request, await service.get_all_channel_stats(), _stats_cache_control())
 
 @router.get("/channels/{channel_name}", response_model=ChannelResponse)
 async def get_channel(
     channel_name: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Obtener un canal específico por nombre."""
     service = ChannelService(db)
     channel = await service.get_channel_by_name(channel_name)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
-    return channel
+    return etag_response(request, channel.model_dump(), _channel_cache_control())
 
 @router.get("/channels/{channel_name}/stats")
 async def get_channel_stats(
     channel_name: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Obtener estadísticas de un canal."""
     service = ChannelService(db)
     stats = await service.get_channel_stats(channel_name)
     if not stats:
         raise HTTPException(status_code=404, detail="Channel not found")
-    return stats
+    return etag_response(request, stats, _stats_cache_control())
@@ -1,58 +1,111 @@
 """Conversation API endpoints."""
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
-from src.database import get_db
-from src.schemas import ConversationResponse, ConversationCreate
-from src.services.conversation_service import ConversationService
+from src.database import get_db, get_read_db
+from src.schemas import ConversationResponse, ConversationCreate, ConversationListItem, MarkReadResponse
+from src.services.conversation_service import ConversationExistsError, ConversationService, conversation_list_adapter
+from src.services.message_service import MessageService
 from src.utils.logger import get_logger
+from src.utils.etag import cache_headers, etag_matches, make_etag, not_modified
+from src.utils.pagination import NEXT_CURSOR_HEADER, next_cursor
 
 logger = get_logger(__name__)
 router = APIRouter()
 
-@router.get("/conversations", response_model=List[ConversationResponse])
+# Conversations change all the time: clients may store them but must revalidate
+CONVERSATION_CACHE_CONTROL = "no-cache"
+
+@router.get("/conversations", response_model=List[ConversationListItem])
 async def get_conversations(
+    request: Request,
     channel_id: Optional[int] = Query(None),
     limit: int = Query(50, le=100),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Cursor de paginación (reemplaza a offset)"),
+    messages_limit: int = Query(20, ge=0, le=50, description="Últimos mensajes incluidos por conversación"),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Obtener conversaciones con filtros opcionales."""
+    """Obtener conversaciones con filtros opcionales.
+    
+    Cada conversación incluye solo sus últimos mensajes (messages_limit).
+    El cursor de la página siguiente se devuelve en el header X-Next-Cursor.
+    La página ya viene validada, así que se serializa directo con orjson.
+    El ETag sale de la versión del listado: si no cambió, 304 sin consultar la página.
+    """
     service = ConversationService(db)
-    return await service.get_conversations(
-        channel_id=channel_id,
-        limit=limit,
-        offset=offset
+    etag = make_etag(
+        "conversations", await service.get_listing_version(channel_id), sorted(request.query_params.multi_items())
     )
+    if etag_matches(request, etag):
+        return not_modified(etag, CONVERSATION_CACHE_CONTROL)
+    
+    try:
+        conversations = await service.get_conversations(
+            channel_id=channel_id,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            messages_limit=messages_limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    headers = cache_headers(etag, CONVERSATION_CACHE_CONTROL)
+    cursor_token = next_cursor(conversations, limit, "updated_at")
+    if cursor_token:
+        headers[NEXT_CURSOR_HEADER] = cursor_token
+    return ORJSONResponse(conversation_list_adapter.dump_python(conversations), headers=headers)
 
 @router.post("/conversations", response_model=ConversationResponse)
 async def create_conversation(
     conversation: ConversationCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Crear una nueva conversación."""
-    from src.models import Channel
+    from src.services.channel_registry import channel_registry
     
-    # Validar que el canal existe
-    channel = db.query(Channel).filter(Channel.id == conversation.channel_id).first()
-    if not channel:
+    # Validar que el canal existe (registro en memoria, sin consulta)
+    await channel_registry.ensure_loaded(db)
+    if not channel_registry.get_by_id(conversation.channel_id):
         raise HTTPException(
             status_code=400, 
             detail=f"Channel with id {conversation.channel_id} not found"
         )
     
     service = ConversationService(db)
-    return await service.create_conversation(conversation)
+    try:
+        return await service.create_conversation(conversation)
+    except ConversationExistsError as e:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Conversation {e.conversation_id} already exists for this participant"
+        )
 
 @router.get("/conversations/{conversation_id}", response_model=ConversationResponse)
 async def get_conversation(
     conversation_id: int,
+    request: Request,
+    response: Response,
     limit: int = Query(50, le=100),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Obtener una conversación específica con sus mensajes."""
+    """Obtener una conversación específica con sus mensajes.
+    
+    Responde 304 si el ETag enviado en If-None-Match coincide con la versión actual.
+    """
     service = ConversationService(db)
+    version = await service.get_version(conversation_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    etag = make_etag("conversation", conversation_id, version, limit)
+    if etag_matches(request, etag):
+        return not_modified(etag, CONVERSATION_CACHE_CONTROL)
+    response.headers.update(cache_headers(etag, CONVERSATION_CACHE_CONTROL))
+    
     conversation = await service.get_conversation_with_messages(
         conversation_id=conversation_id,
         limit=limit
@@ -65,7 +118,7 @@ async def get_conversation(
 async def update_participant_name(
     conversation_id: int,
     participant_name: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Actualizar el nombre del participante en una conversación."""
     service = ConversationService(db)
@@ -77,10 +130,33 @@ async def update_participant_name(
         raise HTTPException(status_code=404, detail="Conversation not found")
     return {"status": "success", "message": "Participant name updated"}
 
+@router.put("/conversations/{conversation_id}/read", response_model=MarkReadResponse)
+async def mark_conversation_as_read(
+    conversation_id: int,
+    up_to_message_id: Optional[int] = Query(None, description="Último mensaje visto; por defecto toda la conversación"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Marcar como leídos los mensajes de una conversación hasta un mensaje dado.
+    
+    Una sola transacción con un UPDATE para todo el rango, en lugar de un
+    request por mensaje.
+    """
+    from src.models import Conversation
+    
+    if not await db.get(Conversation, conversation_id):
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    service = MessageService(db)
+    try:
+        updated = await service.mark_conversation_as_read(conversation_id, up_to_message_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return MarkReadResponse(updated=updated)
+
 @router.put("/conversations/{conversation_id}/deactivate")
 async def deactivate_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Desactivar una conversación."""
     service = ConversationService(db)
@@ -1,12 +1,23 @@
 """Message API endpoints."""
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Any
+from datetime import datetime
+import json
 
-from src.database import get_db
-from src.schemas import MessageResponse, MessageCreate, UnifiedMessage, SendMessageRequest, SendMessageResponse
-from src.services.message_service import MessageService
-from src.utils.logger import get_logger
+from src.config import settings
+from src.database import get_db, get_read_db
+from src.schemas import (
+    MessageResponse, MessageCreate, UnifiedMessage, SendMessageRequest, SendMessageResponse,
+    UnifiedBatchResponse, OutboxStatusResponse, MessageSearchResult, MarkReadRequest, MarkReadResponse
+)
+from src.services.channel_client import channel_clients
+from src.services.message_service import MessageService, message_list_adapter
+from src.services.outbox_service import OutboxService
+from src.services.search_service import SearchService
+from src.utils.logger import SAMPLED, get_logger
+from src.utils.pagination import NEXT_CURSOR_HEADER, next_cursor
 
 logger = get_logger(__name__)
 router = APIRouter()
@@ -17,21 +28,36 @@ async def get_messages(
     channel: Optional[str] = Query(None),
     limit: int = Query(50, le=100),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Cursor de paginación (reemplaza a offset)"),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Obtener mensajes con filtros opcionales."""
+    """Obtener mensajes con filtros opcionales.
+    
+    El cursor de la página siguiente se devuelve en el header X-Next-Cursor.
+    La página ya viene validada, así que se serializa directo con orjson.
+    """
     service = MessageService(db)
-    return await service.get_messages(
-        conversation_id=conversation_id,
-        channel=channel,
-        limit=limit,
-        offset=offset
-    )
+    try:
+        messages = await service.get_messages(
+            conversation_id=conversation_id,
+            channel=channel,
+            limit=limit,
+            offset=offset,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    headers = {}
+    cursor_token = next_cursor(messages, limit, "timestamp")
+    if cursor_token:
+        headers[NEXT_CURSOR_HEADER] = cursor_token
+    return ORJSONResponse(message_list_adapter.dump_python(messages), headers=headers)
 
 @router.post("/messages", response_model=MessageResponse)
 async def create_message(
     message: MessageCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Crear un nuevo mensaje."""
     service = MessageService(db)
@@ -40,22 +66,99 @@ async def create_message(
 @router.post("/messages/unified")
 async def receive_unified_message(
     message: UnifiedMessage,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Endpoint para recibir mensajes unificados de los servicios de canal."""
     service = MessageService(db)
     try:
-        result = await service.process_unified_message(message)
-        logger.info(f"Unified message received from {message.channel}: {message.sender}")
-        return {"status": "success", "message_id": result.id}
+        message_id, created = await service.process_unified_message(message)
+        logger.info(f"Unified message received from {message.channel}: {message.sender}", extra=SAMPLED)
+        # Reintentos del webhook devuelven el id del mensaje ya guardado
+        return {"status": "success", "message_id": message_id, "duplicate": not created}
     except Exception as e:
         logger.error(f"Error processing unified message: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
+def _parse_batch_body(body: bytes, content_type: str) -> List[Any]:
+    """Parse a batch payload sent as a JSON array or as NDJSON."""
+    text = body.decode("utf-8")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    
+    payload = json.loads(text)
+    if not isinstance(payload, list):
+        raise ValueError("Batch payload must be a JSON array")
+    return payload
+
+@router.post("/messages/unified/batch", response_model=UnifiedBatchResponse)
+async def receive_unified_batch(
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """Endpoint para recibir mensajes unificados en lote (JSON array o NDJSON)."""
+    try:
+        items = _parse_batch_body(await request.body(), request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch payload: {str(e)}")
+    
+    if len(items) > settings.unified_batch_max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(items)} > {settings.unified_batch_max_size}"
+        )
+    
+    service = MessageService(db)
+    results = await service.process_unified_batch(items)
+    succeeded = sum(1 for result in results if result.status == "success")
+    duplicates = sum(1 for result in results if result.status == "duplicate")
+    
+    return UnifiedBatchResponse(
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded - duplicates,
+        duplicates=duplicates,
+        results=results
+    )
+
+@router.get("/messages/search", response_model=List[MessageSearchResult])
+async def search_messages(
+    response: Response,
+    q: str = Query(..., min_length=1, description="Texto a buscar"),
+    channel: Optional[str] = Query(None),
+    conversation_id: Optional[int] = Query(None),
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    limit: int = Query(20, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor de paginación"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Buscar mensajes por contenido, ordenados por relevancia.
+    
+    El cursor de la página siguiente se devuelve en el header X-Next-Cursor.
+    """
+    service = SearchService(db)
+    try:
+        results = await service.search_messages(
+            query=q,
+            channel=channel,
+            conversation_id=conversation_id,
+            date_from=date_from,
+            date_to=date_to,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    cursor_token = next_cursor(results, limit, "score")
+    if cursor_token:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_token
+    return results
+
 @router.get("/messages/{message_id}", response_model=MessageResponse)
 async def get_message(
     message_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Obtener un mensaje específico."""
     service = MessageService(db)
@@ -67,7 +170,7 @@ async def get_message(
 @router.put("/messages/{message_id}/read")
 async def mark_message_as_read(
     message_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Marcar un mensaje como leído."""
     service = MessageService(db)
@@ -76,106 +179,62 @@ async def mark_message_as_read(
         raise HTTPException(status_code=404, detail="Message not found")
     return {"status": "success", "message": "Message marked as read"}
 
+@router.post("/messages/read", response_model=MarkReadResponse)
+async def mark_messages_as_read(
+    request: MarkReadRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Marcar varios mensajes como leídos en una sola transacción.
+    
+    Los ids inexistentes o ya leídos se ignoran; `updated` indica cuántos cambiaron.
+    """
+    if len(request.message_ids) > settings.mark_read_max_ids:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many ids: {len(request.message_ids)} > {settings.mark_read_max_ids}"
+        )
+    
+    service = MessageService(db)
+    updated = await service.mark_messages_as_read(request.message_ids)
+    return MarkReadResponse(updated=updated)
+
 @router.get("/messages/unread/count")
 async def get_unread_count(
     conversation_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Obtener cantidad de mensajes no leídos."""
     service = MessageService(db)
     count = await service.get_unread_messages_count(conversation_id)
     return {"unread_count": count}
 
-@router.post("/send", response_model=SendMessageResponse)
+@router.post("/send", response_model=SendMessageResponse, status_code=202)
 async def send_message(
     request: SendMessageRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Enviar mensaje a través de un canal específico."""
-    # This will forward the message to the appropriate channel service
-    import httpx
-    
-    channel_ports = {
-        "whatsapp": 8001,  # Puerto correcto del WhatsApp Service
-        "gmail": 8002,
-        "instagram": 8003
-    }
+    """Encolar un mensaje para enviarlo a través de un canal específico.
     
-    if request.channel not in channel_ports:
+    El envío lo realizan los workers del outbox; el estado se consulta en
+    GET /send/{tracking_id} o se recibe por WebSocket (outbox.status).
+    """
+    if channel_clients.get(request.channel) is None:
         raise HTTPException(status_code=400, detail=f"Unsupported channel: {request.channel}")
     
-    port = channel_ports[request.channel]
-    url = f"http://localhost:{port}/send/{request.channel}"
-    
-    # Formatear número para WhatsApp
-    formatted_to = request.to
-    if request.channel == "whatsapp":
-        if request.to.startswith("+"):
-            # Remover el +
-            number = request.to[1:]
-            
-            # Para números argentinos (+549...), remover solo el 9 del código de área
-            if number.startswith("549"):
-                formatted_to = "54" + number[3:]  # Remover "9" -> queda "54" + número local
-            else:
-                formatted_to = number  # Para otros países, solo remover el +
-        else:
-            formatted_to = request.to
-    
-    payload = {
-        "to": formatted_to,
-        "message": request.message,
-        "message_type": request.message_type
-    }
-    
-    if request.media_url:
-        payload["media_url"] = request.media_url
-    
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=payload)
-            result = response.json()
-            
-            if response.status_code == 200 and result.get("success"):
-                # Store outgoing message in database
-                service = MessageService(db)
-                # Find conversation
-                conversation = await service._get_or_create_conversation(
-                    channel_name=request.channel,
-                    participant_identifier=request.to
-                )
-                
-                # Create message record
-                from src.schemas import MessageCreate
-                from datetime import datetime
-                
-                message_data = MessageCreate(
-                    conversation_id=conversation.id,
-                    external_message_id=result.get("message_id"),
-                    content=request.message,
-                    message_type=request.message_type,
-                    direction="outgoing",
-                    sender_identifier="system",  # Or current user
-                    timestamp=datetime.utcnow()
-                )
-                
-                await service.create_message(message_data)
-                
-                return SendMessageResponse(
-                    success=True,
-                    message_id=result.get("message_id"),
-                    details=result
-                )
-            else:
-                return SendMessageResponse(
-                    success=False,
-                    error=result.get("error", "Unknown error"),
-                    details=result
-                )
-                
-    except Exception as e:
-        logger.error(f"Error sending message to {request.channel}: {str(e)}")
-        return SendMessageResponse(
-            success=False,
-            error=str(e)
-        )
+    item = await OutboxService(db).enqueue(request)
+    return SendMessageResponse(
+        success=True,
+        tracking_id=item.id,
+        status=item.status
+    )
+
+@router.get("/send/{tracking_id}", response_model=OutboxStatusResponse)
+async def get_send_status(
+    tracking_id: int,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Obtener el estado de un mensaje saliente encolado."""
+    status = await OutboxService(db).get_status(tracking_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Outgoing message not found")
+    return status
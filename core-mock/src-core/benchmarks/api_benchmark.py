@@ -0,0 +1,467 @@
+"""Core API load benchmark.
+
+Seeds the database configured in Settings (DB_URL) with synthetic
+conversations and messages, then drives the API in-process through the ASGI
+transport and through a uvicorn server started as a subprocess. Measured:
+
+- unified ingestion throughput (single and batch endpoints)
+- list and detail latency percentiles
+- unread-count latency
+- /send end to end (202 to "sent") against a local stub channel service
+- WebSocket fan-out latency of /broadcast (uvicorn only; needs websockets)
+
+Everything runs on localhost; results are printed as JSON (and written to
+--output) so runs can be compared.
+    
+    DB_URL=sqlite+aiosqlite:///./bench.db python -m src.benchmarks.api_benchmark --conversations 10000 --messages 1000000
+
+Use a dedicated database: the corpus and the ingested messages stay in it.
+With --workers > 1 set PUBSUB_BACKEND=unix so broadcasts reach every worker.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from sqlalchemy import func, insert, select
+
+from src.benchmarks.search_benchmark import summarize
+from src.config import settings
+from src.database import SessionLocal, init_db
+from src.models import Channel, Conversation, Message
+from src.services.unread_counter_service import UnreadCounterService
+
+SCENARIOS = ("ingest", "reads", "send", "websocket")
+
+async def seed(conversations: int, messages: int, unread_ratio: float, rng: random.Random) -> float:
+    """Insert the bench corpus unless it is already there; rebuilds unread counters."""
+    async with SessionLocal() as db:
+        existing_conversations = await db.scalar(
+            select(func.count(Conversation.id)).where(Conversation.external_id.like("load_%"))
+        )
+        existing_messages = await db.scalar(
+            select(func.count(Message.id)).where(Message.sender_identifier == "load-bench")
+        )
+        if existing_conversations >= conversations and existing_messages >= messages:
+            return 0.0
+        
+        started = time.perf_counter()
+        channel_ids = (await db.execute(select(Channel.id))).scalars().all()
+        if existing_conversations < conversations:
+            await db.execute(insert(Conversation), [
+                {
+                    "channel_id": channel_ids[i % len(channel_ids)],
+                    "external_id": f"load_{i}",
+                    "participant_identifier": f"load-{i}",
+                    "participant_name": f"Participante {i}"
+                }
+                for i in range(existing_conversations, conversations)
+            ])
+            await db.commit()
+        conversation_ids = (await db.execute(
+            select(Conversation.id).where(Conversation.external_id.like("load_%"))
+        )).scalars().all()
+        
+        start_time = datetime.utcnow() - timedelta(days=365)
+        remaining = messages - existing_messages
+        while remaining > 0:
+            rows = [
+                {
+                    "conversation_id": rng.choice(conversation_ids),
+                    "content": f"Mensaje de prueba {rng.randint(0, 10 ** 9)}",
+                    "message_type": "text",
+                    "direction": rng.choice(("incoming", "outgoing")),
+                    "sender_identifier": "load-bench",
+                    "timestamp": start_time + timedelta(seconds=rng.randint(0, 365 * 86400)),
+                    "is_read": rng.random() >= unread_ratio
+                }
+                for _ in range(min(10000, remaining))
+            ]
+            await db.execute(insert(Message), rows)
+            await db.commit()
+            remaining -= len(rows)
+        
+        await UnreadCounterService(db).rebuild()
+        return time.perf_counter() - started
+
+async def corpus_ids() -> Tuple[List[int], Tuple[int, int]]:
+    """Bench conversation ids and the (min, max) message id."""
+    async with SessionLocal() as db:
+        conversation_ids = (await db.execute(
+            select(Conversation.id).where(Conversation.external_id.like("load_%"))
+        )).scalars().all()
+        bounds = (await db.execute(select(func.min(Message.id), func.max(Message.id)))).one()
+        return list(conversation_ids), (bounds[0] or 0, bounds[1] or 0)
+
+async def run_load(total: int, concurrency: int, call: Callable[[int], Awaitable[bool]]) -> dict:
+    """Run `call(i)` for i in range(total) on `concurrency` workers.
+    
+    `call` returns whether the request succeeded; exceptions count as errors.
+    """
+    samples: List[float] = []
+    errors = 0
+    indexes = iter(range(total))
+    
+    async def worker():
+        nonlocal errors
+        for i in indexes:
+            started = time.perf_counter()
+            try:
+                ok = await call(i)
+            except Exception:
+                ok = False
+            samples.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, total)))))
+    elapsed = time.perf_counter() - started
+    return {
+        **(summarize(samples) if samples else {"runs": 0}),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(total / elapsed, 1) if elapsed else None
+    }
+
+async def bench_ingest(client: httpx.AsyncClient, args: argparse.Namespace, run_id: str) -> dict:
+    def unified(i: int, prefix: str) -> dict:
+        return {
+            "channel": ("whatsapp", "gmail", "instagram")[i % 3],
+            "sender": f"+54911{i % args.ingest_senders:06d}",
+            "message": f"Mensaje entrante {i}",
+            "timestamp": datetime.utcnow().isoformat(),
+            "message_id": f"{prefix}-{run_id}-{i}"
+        }
+    
+    async def single(i: int) -> bool:
+        response = await client.post("/api/v1/messages/unified", json=unified(i, "single"))
+        return response.status_code == 200
+    
+    batch_size = args.batch_size
+    
+    async def batch(i: int) -> bool:
+        items = [unified(i * batch_size + j, "batch") for j in range(batch_size)]
+        response = await client.post("/api/v1/messages/unified/batch", json=items)
+        return response.status_code == 200 and response.json()["failed"] == 0
+    
+    single_result = await run_load(args.ingest_messages, args.concurrency, single)
+    batches = max(1, args.ingest_messages // batch_size)
+    batch_result = await run_load(batches, args.concurrency, batch)
+    batch_result["messages_per_second"] = round(
+        batches * batch_size / batch_result["seconds"], 1
+    ) if batch_result["seconds"] else None
+    return {"single": single_result, f"batch_{batch_size}": batch_result}
+
+async def bench_reads(
+    client: httpx.AsyncClient,
+    args: argparse.Namespace,
+    rng: random.Random,
+    conversation_ids: List[int],
+    message_bounds: Tuple[int, int]
+) -> dict:
+    first_id, last_id = message_bounds
+    requests: Dict[str, Callable[[], str]] = {
+        "list_conversations": lambda: "/api/v1/conversations?limit=50",
+        "list_messages": lambda: f"/api/v1/messages?conversation_id={rng.choice(conversation_ids)}&limit=50",
+        "conversation_detail": lambda: f"/api/v1/conversations/{rng.choice(conversation_ids)}",
+        "message_detail": lambda: f"/api/v1/messages/{rng.randint(first_id, last_id)}",
+        "unread_count_total": lambda: "/api/v1/messages/unread/count",
+        "unread_count_conversation": lambda: f"/api/v1/messages/unread/count?conversation_id={rng.choice(conversation_ids)}",
+        "channel_stats": lambda: "/api/v1/channels/stats"
+    }
+    
+    results = {}
+    for name, make_url in requests.items():
+        async def get(i: int) -> bool:
+            response = await client.get(make_url())
+            # A random message id may have been deleted; that is still a served request
+            return response.status_code < 500
+        results[name] = await run_load(args.requests, args.concurrency, get)
+    return results
+
+async def bench_send(client: httpx.AsyncClient, args: argparse.Namespace) -> dict:
+    """POST /send, then poll every tracking id until it is sent or failed."""
+    accepted: Dict[int, float] = {}
+    
+    async def send(i: int) -> bool:
+        started = time.perf_counter()
+        response = await client.post("/api/v1/send", json={
+            "channel": "whatsapp",
+            "to": f"+54911{i:08d}",
+            "message": f"Mensaje saliente {i}"
+        })
+        if response.status_code != 202:
+            return False
+        accepted[response.json()["tracking_id"]] = started
+        return True
+    
+    phase_started = time.perf_counter()
+    accept_result = await run_load(args.sends, args.concurrency, send)
+    
+    delivery: List[float] = []
+    statuses: Dict[str, int] = {}
+    pending = dict(accepted)
+    deadline = time.perf_counter() + args.timeout
+    while pending and time.perf_counter() < deadline:
+        tracking_ids = list(pending)
+        
+        async def poll(i: int) -> bool:
+            tracking_id = tracking_ids[i]
+            response = await client.get(f"/api/v1/send/{tracking_id}")
+            status = response.json().get("status")
+            if status in ("sent", "failed"):
+                statuses[status] = statuses.get(status, 0) + 1
+                started = pending.pop(tracking_id)
+                if status == "sent":
+                    delivery.append(time.perf_counter() - started)
+            return response.status_code == 200
+        
+        await run_load(len(tracking_ids), args.concurrency, poll)
+        if pending:
+            await asyncio.sleep(0.01)
+    
+    elapsed = time.perf_counter() - phase_started
+    statuses["unfinished"] = len(pending)
+    return {
+        "accept": accept_result,
+        "delivery": summarize(delivery) if delivery else {"runs": 0},
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "sent_per_second": round(statuses.get("sent", 0) / elapsed, 1)
+    }
+
+async def bench_websocket(client: httpx.AsyncClient, ws_url: Optional[str], args: argparse.Namespace) -> dict:
+    """Time from POST /broadcast to receipt on each of --ws-clients connections."""
+    if ws_url is None:
+        return {"skipped": "the ASGI transport has no WebSocket support"}
+    try:
+        import websockets
+    except ImportError:
+        return {"skipped": "websockets package not installed"}
+    
+    sent_at: Dict[int, float] = {}
+    lags: List[float] = []
+    expected = args.ws_clients * args.ws_messages
+    done = asyncio.Event()
+    
+    async def listen(connection) -> None:
+        async for text in connection:
+            if not text.startswith("bench:"):
+                continue
+            lags.append(time.perf_counter() - sent_at[int(text[6:])])
+            if len(lags) == expected:
+                done.set()
+    
+    connections = []
+    try:
+        for _ in range(args.ws_clients):
+            connection = await websockets.connect(ws_url)
+            await connection.send(json.dumps({"action": "subscribe", "topic": "all"}))
+            await connection.recv()
+            connections.append(connection)
+        listeners = [asyncio.create_task(listen(connection)) for connection in connections]
+        
+        started = time.perf_counter()
+        for seq in range(args.ws_messages):
+            sent_at[seq] = time.perf_counter()
+            await client.post("/broadcast", params={"message": f"bench:{seq}"})
+        try:
+            await asyncio.wait_for(done.wait(), args.timeout)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - started
+        
+        for listener in listeners:
+            listener.cancel()
+    finally:
+        for connection in connections:
+            await connection.close()
+    
+    return {
+        "clients": args.ws_clients,
+        "messages": args.ws_messages,
+        "delivered": len(lags),
+        "expected": expected,
+        "lag": summarize(lags) if lags else {"runs": 0},
+        "deliveries_per_second": round(len(lags) / elapsed, 1) if elapsed else None
+    }
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def stub_channel_app() -> FastAPI:
+    """Channel service stand-in: accepts every POST /send/<channel>."""
+    stub = FastAPI()
+    
+    @stub.post("/send/{channel}")
+    async def send(channel: str):
+        return {"success": True, "message_id": f"stub-{uuid.uuid4().hex}"}
+    
+    return stub
+
+@asynccontextmanager
+async def stub_channel_service() -> AsyncIterator[str]:
+    """Run the stub on a background thread; yields its base URL."""
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(stub_channel_app(), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        await asyncio.sleep(0.05)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(5)
+
+@asynccontextmanager
+async def asgi_target(stub_url: str) -> AsyncIterator[Tuple[httpx.AsyncClient, Optional[str]]]:
+    """The app in this process, lifespan included, behind httpx's ASGI transport."""
+    for channel in settings.channel_service_urls:
+        setattr(settings, f"{channel}_service_url", stub_url)
+    from src.main import app
+    
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://core", timeout=60) as client:
+            yield client, None
+
+@asynccontextmanager
+async def uvicorn_target(stub_url: str, workers: int) -> AsyncIterator[Tuple[httpx.AsyncClient, Optional[str]]]:
+    """The app served by a uvicorn subprocess on a free local port."""
+    port = free_port()
+    env = dict(os.environ)
+    for channel in settings.channel_service_urls:
+        env[f"{channel.upper()}_SERVICE_URL"] = stub_url
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "src.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning"
+        ],
+        env=env
+    )
+    
+    base_url = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+            deadline = time.monotonic() + 30
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError("uvicorn did not become healthy within 30s")
+                await asyncio.sleep(0.1)
+            
+            yield client, f"ws://127.0.0.1:{port}/ws"
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+async def run_target(
+    client: httpx.AsyncClient,
+    ws_url: Optional[str],
+    args: argparse.Namespace,
+    rng: random.Random,
+    conversation_ids: List[int],
+    message_bounds: Tuple[int, int]
+) -> dict:
+    run_id = uuid.uuid4().hex[:8]
+    results = {}
+    if "ingest" in args.scenarios:
+        results["ingest"] = await bench_ingest(client, args, run_id)
+    if "reads" in args.scenarios:
+        results["reads"] = await bench_reads(client, args, rng, conversation_ids, message_bounds)
+    if "send" in args.scenarios:
+        results["send"] = await bench_send(client, args)
+    if "websocket" in args.scenarios:
+        results["websocket"] = await bench_websocket(client, ws_url, args)
+    return results
+
+async def run(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    await init_db()
+    seed_seconds = await seed(args.conversations, args.messages, args.unread_ratio, rng)
+    conversation_ids, message_bounds = await corpus_ids()
+    
+    targets = {}
+    async with stub_channel_service() as stub_url:
+        for target in args.targets:
+            if target == "asgi":
+                context = asgi_target(stub_url)
+            else:
+                context = uvicorn_target(stub_url, args.workers)
+            async with context as (client, ws_url):
+                targets[target] = await run_target(client, ws_url, args, rng, conversation_ids, message_bounds)
+    
+    return {
+        "benchmark": "api",
+        "started_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "database": settings.database_url.split(":", 1)[0],
+        "conversations": args.conversations,
+        "messages": args.messages,
+        "seed_seconds": round(seed_seconds, 3),
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "targets": targets
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--unread-ratio", type=float, default=0.1, help="share of seeded messages left unread")
+    parser.add_argument("--targets", type=lambda value: value.split(","), default=["asgi", "uvicorn"],
+                        help="comma-separated: asgi, uvicorn")
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS),
+                        help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent client requests")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--requests", type=int, default=500, help="requests per read endpoint")
+    parser.add_argument("--ingest-messages", type=int, default=2000)
+    parser.add_argument("--ingest-senders", type=int, default=200, help="distinct senders (conversations) ingested")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--sends", type=int, default=500)
+    parser.add_argument("--ws-clients", type=int, default=100)
+    parser.add_argument("--ws-messages", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for deliveries")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+if __name__ == "__main__":
+    main()
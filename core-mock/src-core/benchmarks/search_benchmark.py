@@ -0,0 +1,180 @@
+"""Search latency benchmark.
+
+Seeds the database configured in Settings (DB_URL) with a synthetic corpus and
+times SearchService.search_messages for a mix of queries. Against MySQL this
+measures the FULLTEXT index; against SQLite it measures the in-process index,
+including the time it takes to build it.
+    
+    DB_URL=sqlite+aiosqlite:///./bench.db python -m src.benchmarks.search_benchmark --messages 1000000
+
+Use a dedicated database: the corpus is inserted into the messages table.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import func, insert, select
+
+from src.database import SessionLocal, init_db
+from src.models import Channel, Conversation, Message
+from src.services.search_service import SearchService
+from src.utils.pagination import encode_cursor
+
+COMMON_WORDS = [
+    "hola", "gracias", "pedido", "envio", "ayuda", "consulta", "precio", "pago",
+    "factura", "entrega", "cuenta", "problema", "producto", "horario", "direccion"
+]
+
+def build_vocabulary(size: int, rng: random.Random) -> List[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set(COMMON_WORDS)
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    return sorted(words, key=lambda word: (word not in COMMON_WORDS, word))
+
+async def seed(messages: int, conversations: int, rng: random.Random) -> float:
+    """Insert the corpus unless the database already holds enough messages."""
+    async with SessionLocal() as db:
+        existing = await db.scalar(select(func.count(Message.id)))
+        if existing >= messages:
+            return 0.0
+        
+        started = time.perf_counter()
+        channel_ids = (await db.execute(select(Channel.id))).scalars().all()
+        await db.execute(insert(Conversation), [
+            {
+                "channel_id": channel_ids[i % len(channel_ids)],
+                "external_id": f"bench_{i}",
+                "participant_identifier": f"bench-{i}"
+            }
+            for i in range(conversations)
+        ])
+        conversation_ids = (await db.execute(
+            select(Conversation.id).where(Conversation.external_id.like("bench_%"))
+        )).scalars().all()
+        
+        # Zipf-like word frequencies: a few very common terms, a long tail of rare ones
+        vocabulary = build_vocabulary(20000, rng)
+        weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+        cumulative = []
+        total = 0.0
+        for weight in weights:
+            total += weight
+            cumulative.append(total)
+        
+        start_time = datetime.utcnow() - timedelta(days=365)
+        remaining = messages - existing
+        chunk = 10000
+        while remaining > 0:
+            rows = []
+            for _ in range(min(chunk, remaining)):
+                words = rng.choices(vocabulary, cum_weights=cumulative, k=rng.randint(5, 20))
+                rows.append({
+                    "conversation_id": rng.choice(conversation_ids),
+                    "content": " ".join(words),
+                    "message_type": "text",
+                    "direction": "incoming",
+                    "sender_identifier": "bench",
+                    "timestamp": start_time + timedelta(seconds=rng.randint(0, 365 * 86400)),
+                    "is_read": True
+                })
+            await db.execute(insert(Message), rows)
+            await db.commit()
+            remaining -= len(rows)
+        return time.perf_counter() - started
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    return {
+        "runs": len(samples),
+        "mean_ms": round(statistics.mean(samples) * 1000, 3),
+        "p50_ms": round(percentile(0.50) * 1000, 3),
+        "p95_ms": round(percentile(0.95) * 1000, 3),
+        "p99_ms": round(percentile(0.99) * 1000, 3)
+    }
+
+async def run(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    await init_db()
+    seed_seconds = await seed(args.messages, args.conversations, rng)
+    
+    async with SessionLocal() as db:
+        dialect = db.bind.dialect.name
+        started = time.perf_counter()
+        await SearchService(db).search_messages("hola", limit=args.limit)
+        first_query_seconds = time.perf_counter() - started
+    
+    vocabulary = build_vocabulary(20000, random.Random(args.seed))
+    rare_words = vocabulary[len(COMMON_WORDS) + 2000:]
+    recent = datetime.utcnow() - timedelta(days=30)
+    scenarios = {
+        "common_term": lambda: {"query": rng.choice(COMMON_WORDS)},
+        "rare_term": lambda: {"query": rng.choice(rare_words)},
+        "two_terms": lambda: {"query": f"{rng.choice(COMMON_WORDS)} {rng.choice(rare_words)}"},
+        "channel_filter": lambda: {"query": rng.choice(COMMON_WORDS), "channel": "gmail"},
+        "date_range": lambda: {"query": rng.choice(COMMON_WORDS), "date_from": recent}
+    }
+    
+    results = {}
+    async with SessionLocal() as db:
+        service = SearchService(db)
+        for name, make_params in scenarios.items():
+            samples = []
+            for _ in range(args.queries):
+                params = make_params()
+                started = time.perf_counter()
+                await service.search_messages(limit=args.limit, **params)
+                samples.append(time.perf_counter() - started)
+            results[name] = summarize(samples)
+        
+        # Second page through the cursor of the first one
+        samples = []
+        for _ in range(args.queries):
+            query = rng.choice(COMMON_WORDS)
+            first_page = await service.search_messages(query, limit=args.limit)
+            if len(first_page) < args.limit:
+                continue
+            last = first_page[-1]
+            started = time.perf_counter()
+            await service.search_messages(query, limit=args.limit, cursor=encode_cursor(last.score, last.id))
+            samples.append(time.perf_counter() - started)
+        if samples:
+            results["second_page"] = summarize(samples)
+    
+    return {
+        "benchmark": "search",
+        "backend": "mysql_fulltext" if dialect == "mysql" else "inverted_index",
+        "messages": args.messages,
+        "conversations": args.conversations,
+        "limit": args.limit,
+        "seed_seconds": round(seed_seconds, 3),
+        "first_query_seconds": round(first_query_seconds, 3),
+        "scenarios": results
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--conversations", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=50, help="runs per scenario")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""List endpoint serialization benchmark.
+
+Compares, for 100-row pages of /api/v1/messages and /api/v1/conversations,
+the previous path (ORM objects, from_orm per row, FastAPI response_model
+validation and stdlib json) with the fast path (column rows, one TypeAdapter
+validation, orjson). Checks that both produce byte-identical JSON and
+reports the CPU time per row.
+    
+    DB_URL=sqlite+aiosqlite:///./bench.db python -m src.benchmarks.serialization_benchmark
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import APIRoute, serialize_response
+from sqlalchemy import desc, func, insert, select
+from sqlalchemy.orm import aliased, noload
+
+from src.database import SessionLocal, init_db
+from src.main import app
+from src.models import Channel, Conversation, Message
+from src.schemas import ConversationListItem, MessageResponse
+from src.services.conversation_service import ConversationService, conversation_list_adapter
+from src.services.message_service import MessageService, message_list_adapter
+
+async def seed(conversations: int, messages_per_conversation: int) -> None:
+    """Insert bench conversations with their messages unless already present."""
+    async with SessionLocal() as db:
+        existing = await db.scalar(
+            select(func.count(Conversation.id)).where(Conversation.external_id.like("serial_%"))
+        )
+        if existing >= conversations:
+            return
+        
+        channel_id = await db.scalar(select(Channel.id).limit(1))
+        await db.execute(insert(Conversation), [
+            {
+                "channel_id": channel_id,
+                "external_id": f"serial_{i}",
+                "participant_identifier": f"serial-{i}",
+                "participant_name": f"Participante {i} – ñandú"
+            }
+            for i in range(existing, conversations)
+        ])
+        conversation_ids = (await db.execute(
+            select(Conversation.id).where(Conversation.external_id.like("serial_%"))
+        )).scalars().all()
+        
+        start_time = datetime.utcnow() - timedelta(days=30)
+        rows = []
+        for conversation_id in conversation_ids:
+            for i in range(messages_per_conversation):
+                rows.append({
+                    "conversation_id": conversation_id,
+                    "external_message_id": f"serial-{conversation_id}-{i}",
+                    "content": f"Mensaje {i} con acentos: envío, canción 🚀",
+                    "message_type": "text",
+                    "direction": "incoming" if i % 2 else "outgoing",
+                    "sender_name": "Bench",
+                    "sender_identifier": f"serial-{conversation_id}",
+                    "timestamp": start_time + timedelta(minutes=conversation_id * 100 + i, microseconds=i),
+                    "is_read": bool(i % 3)
+                })
+        await db.execute(insert(Message), rows)
+        await db.commit()
+
+async def legacy_messages(db, limit: int) -> List[MessageResponse]:
+    """Previous MessageService.get_messages: ORM entities and from_orm per row."""
+    result = await db.execute(
+        select(Message).order_by(desc(Message.timestamp), desc(Message.id)).limit(limit)
+    )
+    return [MessageResponse.from_orm(msg) for msg in result.scalars().all()]
+
+async def legacy_conversations(db, limit: int, messages_limit: int) -> List[ConversationListItem]:
+    """Previous ConversationService.get_conversations."""
+    result = await db.execute(
+        select(Conversation).options(noload(Conversation.messages))
+        .order_by(desc(Conversation.updated_at), desc(Conversation.id)).limit(limit)
+    )
+    conversations = result.scalars().all()
+    
+    ranked = select(
+        Message,
+        func.row_number().over(
+            partition_by=Message.conversation_id,
+            order_by=(desc(Message.timestamp), desc(Message.id))
+        ).label("position")
+    ).where(Message.conversation_id.in_([conv.id for conv in conversations])).subquery()
+    recent_message = aliased(Message, ranked)
+    result = await db.execute(
+        select(recent_message)
+        .where(ranked.c.position <= messages_limit)
+        .order_by(ranked.c.conversation_id, ranked.c.position.desc())
+    )
+    recent: Dict[int, List[MessageResponse]] = {}
+    for msg in result.scalars().all():
+        recent.setdefault(msg.conversation_id, []).append(MessageResponse.from_orm(msg))
+    
+    items = []
+    for conv in conversations:
+        item = ConversationListItem.from_orm(conv)
+        item.messages = recent.get(conv.id, [])
+        item.last_message = item.messages[-1] if item.messages else None
+        item.has_unread = item.unread_count > 0
+        items.append(item)
+    return items
+
+def response_field(path: str):
+    route = next(r for r in app.routes if isinstance(r, APIRoute) and r.path == path and "GET" in r.methods)
+    return route.response_field
+
+async def measure(render: Callable[[], Awaitable[bytes]], runs: int) -> Dict[str, float]:
+    """CPU seconds per call (process time, so aiosqlite's thread is included)."""
+    await render()
+    started = time.process_time()
+    for _ in range(runs):
+        await render()
+    return (time.process_time() - started) / runs
+
+async def run(args: argparse.Namespace) -> dict:
+    await init_db()
+    await seed(args.rows, args.messages_limit)
+    limit = args.rows
+    
+    async with SessionLocal() as db:
+        # Drop cached ORM state between calls, like a fresh request session
+        async def before_messages() -> bytes:
+            db.expunge_all()
+            items = await legacy_messages(db, limit)
+            content = await serialize_response(
+                field=response_field("/api/v1/messages"), response_content=items, is_coroutine=True
+            )
+            return JSONResponse(content).body
+        
+        async def after_messages() -> bytes:
+            db.expunge_all()
+            items = await MessageService(db).get_messages(limit=limit)
+            return ORJSONResponse(message_list_adapter.dump_python(items)).body
+        
+        async def before_conversations() -> bytes:
+            db.expunge_all()
+            items = await legacy_conversations(db, limit, args.messages_limit)
+            content = await serialize_response(
+                field=response_field("/api/v1/conversations"), response_content=items, is_coroutine=True
+            )
+            return JSONResponse(content).body
+        
+        async def after_conversations() -> bytes:
+            db.expunge_all()
+            items = await ConversationService(db).get_conversations(limit=limit, messages_limit=args.messages_limit)
+            return ORJSONResponse(conversation_list_adapter.dump_python(items)).body
+        
+        report = {}
+        for name, before, after in [
+            ("messages", before_messages, after_messages),
+            ("conversations", before_conversations, after_conversations)
+        ]:
+            identical = await before() == await after()
+            before_seconds = await measure(before, args.runs)
+            after_seconds = await measure(after, args.runs)
+            report[name] = {
+                "identical_json": identical,
+                "before_us_per_row": round(before_seconds / limit * 1e6, 2),
+                "after_us_per_row": round(after_seconds / limit * 1e6, 2),
+                "speedup": round(before_seconds / after_seconds, 2)
+            }
+    
+    return {
+        "benchmark": "serialization",
+        "rows_per_page": limit,
+        "messages_per_conversation": args.messages_limit,
+        "runs": args.runs,
+        "endpoints": report
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100, help="rows per page")
+    parser.add_argument("--messages-limit", type=int, default=20, help="messages embedded per conversation")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    
+    if not all(endpoint["identical_json"] for endpoint in report["endpoints"].values()):
+        raise SystemExit("JSON output differs between the previous and the fast path")
+
+if __name__ == "__main__":
+    main()
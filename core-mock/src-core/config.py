@@ -1,7 +1,7 @@
 """Configuration settings for Core API."""
 import os
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     # Database settings
@@ -10,6 +10,16 @@ class Settings(BaseSettings):
     db_name: str = "unified_messaging"
     db_user: str = "root"
     db_password: str = ""
+    # Full async URL override, e.g. sqlite+aiosqlite:///./core.db for local tests
+    db_url: Optional[str] = None
+    # Read replicas (async URLs like DB_URL, JSON list). Read-only endpoints use
+    # them unless they lag more than db_replica_max_lag seconds (checked every
+    # db_replica_check_interval) or the client wrote within the last
+    # db_read_your_writes_window seconds, in which case they read the primary
+    db_replica_urls: List[str] = []
+    db_replica_max_lag: float = 5.0
+    db_replica_check_interval: float = 5.0
+    db_read_your_writes_window: float = 5.0
     
     # API settings
     api_host: str = "0.0.0.0"
@@ -17,10 +27,108 @@ class Settings(BaseSettings):
     
     # Core settings
     core_secret_key: str = "your-secret-key-here"
+    # Maximum number of messages accepted by /messages/unified/batch
+    unified_batch_max_size: int = 5000
+    # Maximum number of message ids accepted by POST /messages/read
+    mark_read_max_ids: int = 5000
+    # (channel, participant) -> conversation id cache used on ingestion
+    conversation_cache_size: int = 10000
+    conversation_cache_ttl: int = 300
+    # (channel, participant, external message id) -> message id of recently ingested messages,
+    # answers webhook retries without a database round trip
+    message_dedup_cache_size: int = 100000
+    message_dedup_cache_ttl: int = 3600
+    # Seconds between unread counter reconciliations (0 disables the job)
+    unread_reconcile_interval: int = 3600
+    # Message retention: messages older than this many days are moved to
+    # messages_archive (0 disables archiving). The job runs every archive_interval
+    # seconds, archive_batch_size rows per transaction with a pause in between
+    message_retention_days: int = 0
+    archive_interval: int = 3600
+    archive_batch_size: int = 1000
+    archive_batch_pause: float = 0.5
+    # Seconds between reloads of the in-memory channel registry (0 disables
+    # the periodic reload; channel_registry.invalidate() still forces one)
+    channel_registry_refresh_interval: int = 60
+    # Cache-Control max-age (seconds) of the channel list and detail responses
+    channel_cache_max_age: int = 60
+    # Seconds channel statistics stay cached between writes
+    channel_stats_cache_ttl: int = 5
+    
+    # Logging: level of the src.* loggers, per-module overrides as JSON
+    # (LOG_LEVELS='{"src.services.connection_manager": "WARNING"}'), "text" or
+    # "json" output and "size" or "time" based file rotation
+    log_level: str = "INFO"
+    log_levels: Dict[str, str] = {}
+    log_format: str = "text"
+    log_dir: str = "logs"
+    log_rotation: str = "size"
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 7
+    log_rotate_when: str = "midnight"
+    # Fraction of per-message logs (ingestion, reads, sends) that are kept
+    log_sample_rate: float = 1.0
+    # Log every SQL statement through the logging pipeline; keep off in production
+    db_echo: bool = False
+    
+    # Seconds /health waits for the database to answer SELECT 1
+    health_db_timeout: float = 2.0
+    
+    # Per-request SQL profiling: "off", "header" (only requests sending
+    # X-Profile-Queries: 1) or "always". Statements repeated this many times in
+    # one request are reported as N+1 candidates; slower ones get an EXPLAIN
+    query_profiling: str = "off"
+    profile_n_plus_one_threshold: int = 3
+    profile_slow_query_ms: float = 100.0
+    profile_history_size: int = 100
+    
+    # WebSocket fan-out: per-connection queue size, overflow policy
+    # ("disconnect" or "drop_oldest") and per-send timeout in seconds
+    ws_queue_size: int = 100
+    ws_overflow_policy: str = "disconnect"
+    ws_send_timeout: float = 5.0
+    
+    # Pub/sub backend that carries WebSocket events between workers:
+    # "memory" (single worker), "unix" (same host) or "redis"
+    pubsub_backend: str = "memory"
+    pubsub_socket_dir: str = "/tmp/core-pubsub"
+    pubsub_redis_url: str = "redis://localhost:6379/0"
+    pubsub_redis_channel: str = "core:websocket"
+    pubsub_heartbeat_interval: float = 2.0
+    
+    # Channel services used by /send
+    whatsapp_service_url: str = "http://localhost:8001"
+    gmail_service_url: str = "http://localhost:8002"
+    instagram_service_url: str = "http://localhost:8003"
+    # Outbound HTTP policy for channel services (timeouts in seconds)
+    channel_connect_timeout: float = 3.0
+    channel_read_timeout: float = 15.0
+    channel_max_concurrency: int = 20
+    channel_max_retries: int = 2
+    channel_retry_backoff: float = 0.2
+    channel_breaker_threshold: int = 5
+    channel_breaker_reset_timeout: float = 30.0
+    
+    # Outbox workers that deliver /send requests in the background
+    outbox_workers: int = 4
+    outbox_poll_interval: float = 1.0
+    outbox_max_attempts: int = 5
+    outbox_retry_delay: float = 5.0
+    outbox_lease_timeout: float = 120.0
+    
+    @property
+    def channel_service_urls(self) -> Dict[str, str]:
+        return {
+            "whatsapp": self.whatsapp_service_url,
+            "gmail": self.gmail_service_url,
+            "instagram": self.instagram_service_url
+        }
     
     @property
     def database_url(self) -> str:
-        return f"mysql+pymysql://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
+        if self.db_url:
+            return self.db_url
+        return f"mysql+aiomysql://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
     
     class Config:
         env_file = ".env"
@@ -1,59 +1,295 @@
 """Database connection and session management."""
-from sqlalchemy import create_engine
+import asyncio
+import itertools
+import math
+import time
+from fastapi import Request, Response
+from sqlalchemy import event, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from typing import List, Optional
 from src.config import settings
+from src.utils.cache import TTLCache
+from src.utils.logger import get_logger
+from src.utils.metrics import registry
+from src.utils.profiler import record_query
 
-# Create database engine
-engine = create_engine(
-    settings.database_url,
-    echo=True,  # Set to False in production
-    pool_pre_ping=True,
-    pool_recycle=300
+logger = get_logger(__name__)
+
+db_queries = registry.counter(
+    "db_queries_total", "SQL statements executed by operation", ("operation",)
+)
+db_query_errors = registry.counter(
+    "db_query_errors_total", "SQL statements (or connection attempts) that raised an error"
+)
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds", "SQL statement execution time by operation", ("operation",)
+)
+db_pool_wait = registry.histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled connection"
+)
+
+QUERY_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "ROLLBACK"}
+
+def _instrumented_pool_class(database_url: str):
+    """The dialect's default pool class, timing every connection checkout.
+    
+    A subclass (rather than a patched instance) survives pool.recreate().
+    It keeps the base class module so its logger stays under sqlalchemy.pool
+    (quiet unless enabled in LOG_LEVELS) instead of inheriting LOG_LEVEL from
+    `src`, which at DEBUG logs every checkout and checkin.
+    """
+    url = make_url(database_url)
+    base = url.get_dialect().get_pool_class(url)
+    
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return base._do_get(self)
+        finally:
+            db_pool_wait.observe(time.perf_counter() - started)
+    
+    return type(
+        f"Instrumented{base.__name__}", (base,), {"_do_get": _do_get, "__module__": base.__module__}
+    )
+
+def _create_engine(database_url: str) -> AsyncEngine:
+    return create_async_engine(
+        database_url,
+        echo=False,  # SQL logging goes through the logging pipeline (DB_ECHO)
+        pool_pre_ping=True,
+        pool_recycle=300,
+        poolclass=_instrumented_pool_class(database_url)
+    )
+
+# Create async database engine (aiomysql for MySQL, aiosqlite for local tests)
+engine = _create_engine(settings.database_url)
+# Read replicas; two local databases can stand in for a primary and a replica
+replica_engines = [_create_engine(url) for url in settings.db_replica_urls]
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    if operation not in QUERY_OPERATIONS:
+        operation = "OTHER"
+    db_queries.inc(operation)
+    db_query_duration.observe(elapsed, operation)
+    record_query(statement, parameters, elapsed, executemany)
+
+def _handle_error(context):
+    db_query_errors.inc()
+    started = context.connection.info.get("query_started") if context.connection else None
+    if started:
+        started.pop()
+
+for _engine in [engine, *replica_engines]:
+    event.listen(_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(_engine.sync_engine, "handle_error", _handle_error)
+
+def _pool_stats():
+    """Pool gauges; pools without a fixed size (NullPool, StaticPool) report none."""
+    pool = engine.sync_engine.pool
+    if not hasattr(pool, "checkedout"):
+        return None
+    return [
+        (("checked_out",), pool.checkedout()),
+        (("checked_in",), pool.checkedin()),
+        (("overflow",), max(pool.overflow(), 0)),
+        (("size",), pool.size())
+    ]
+
+registry.gauge("db_pool_connections", "Connection pool state", _pool_stats, ("state",))
+
+async def ping_db(timeout: float) -> None:
+    """Run SELECT 1; raises if the database does not answer within `timeout`."""
+    async def _ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    await asyncio.wait_for(_ping(), timeout)
+
+async def _replica_lag(replica: AsyncEngine) -> float:
+    """Seconds the replica is behind its source.
+    
+    Only MySQL reports replication lag; other databases (local stand-ins)
+    count as up to date once they answer.
+    """
+    async with replica.connect() as conn:
+        if replica.dialect.name != "mysql":
+            await conn.execute(text("SELECT 1"))
+            return 0.0
+        
+        try:
+            row = (await conn.exec_driver_sql("SHOW REPLICA STATUS")).mappings().first()
+            column = "Seconds_Behind_Source"
+        except Exception:
+            # MySQL < 8.0.22
+            row = (await conn.exec_driver_sql("SHOW SLAVE STATUS")).mappings().first()
+            column = "Seconds_Behind_Master"
+        if row is None:
+            # Not configured as a replica; nothing to lag behind
+            return 0.0
+        if row[column] is None:
+            raise RuntimeError("replication is not running")
+        return float(row[column])
+
+class ReplicaRouter:
+    """Picks the engine for read-only sessions.
+    
+    Replicas are used round-robin while their last lag check succeeded and
+    stayed within db_replica_max_lag; otherwise reads go to the primary.
+    """
+    
+    def __init__(self, replicas: List[AsyncEngine]):
+        self.replicas = replicas
+        # Last measured lag per replica; None = unavailable or not checked yet
+        self.lag: List[Optional[float]] = [None] * len(replicas)
+        self._turn = itertools.count()
+    
+    def choose(self) -> AsyncEngine:
+        usable = [
+            replica for replica, lag in zip(self.replicas, self.lag)
+            if lag is not None and lag <= settings.db_replica_max_lag
+        ]
+        if not usable:
+            return engine
+        return usable[next(self._turn) % len(usable)]
+    
+    async def check(self) -> None:
+        """Measure the lag of every replica."""
+        for index, replica in enumerate(self.replicas):
+            try:
+                lag = await asyncio.wait_for(_replica_lag(replica), settings.health_db_timeout)
+            except Exception as e:
+                lag = None
+                if self.lag[index] is not None:
+                    logger.warning(f"Replica {index} unavailable, reading from the primary: {str(e)}")
+            else:
+                if lag > settings.db_replica_max_lag:
+                    logger.warning(f"Replica {index} is {lag:.0f}s behind, reading from the primary")
+            self.lag[index] = lag
+    
+    async def run(self, interval: float) -> None:
+        """Background job that keeps the lag measurements fresh."""
+        while True:
+            await asyncio.sleep(interval)
+            await self.check()
+    
+    def status(self) -> List[dict]:
+        return [
+            {
+                "lag_seconds": lag,
+                "in_use": lag is not None and lag <= settings.db_replica_max_lag
+            }
+            for lag in self.lag
+        ]
+
+replica_router = ReplicaRouter(replica_engines)
+
+registry.gauge(
+    "db_replica_lag_seconds",
+    "Last measured replication lag per replica (absent while unavailable)",
+    lambda: [((str(index),), lag) for index, lag in enumerate(replica_router.lag) if lag is not None],
+    ("replica",)
 )
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Create session factory. Objects stay usable after commit so that responses
+# can be built without triggering implicit (blocking) refreshes.
+SessionLocal = async_sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
 
 # Create base class for models
 Base = declarative_base()
 
-def get_db():
-    """Dependency to get database session."""
-    db = SessionLocal()
+# Read-your-writes: clients that used a read-write session recently read from
+# the primary. The cookie covers every worker; clients that ignore cookies
+# can identify themselves with the X-Client-Id header instead (per-process).
+# Never keyed on the client address: services calling from localhost and
+# browsers behind one proxy would pin every read to the primary.
+PRIMARY_COOKIE = "db_primary_until"
+CLIENT_ID_HEADER = "x-client-id"
+recent_writers = TTLCache(maxsize=10000, ttl=settings.db_read_your_writes_window)
+
+def _reads_primary(request: Request) -> bool:
+    client_id = request.headers.get(CLIENT_ID_HEADER)
+    if client_id and recent_writers.get(client_id):
+        return True
     try:
+        return float(request.cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+async def get_db(request: Request, response: Response):
+    """Dependency to get a read-write (primary) database session."""
+    if replica_engines and settings.db_read_your_writes_window > 0:
+        window = settings.db_read_your_writes_window
+        client_id = request.headers.get(CLIENT_ID_HEADER)
+        if client_id:
+            recent_writers.set(client_id, True)
+        response.set_cookie(
+            PRIMARY_COOKIE, f"{time.time() + window:.3f}", max_age=math.ceil(window), httponly=True
+        )
+    async with SessionLocal() as db:
+        yield db
+
+async def get_read_db(request: Request):
+    """Dependency to get a read-only session, on a replica when one is usable."""
+    if not replica_engines or _reads_primary(request):
+        async with SessionLocal() as db:
+            yield db
+        return
+    
+    async with SessionLocal(bind=replica_router.choose()) as db:
         yield db
-    finally:
-        db.close()
 
 async def init_db():
     """Initialize database tables."""
     from src.models import Channel, Conversation, Message
+    from src.migrations import run_migrations
     
     # Create all tables
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    # Real replicas get the schema through replication; local stand-ins don't
+    for replica in replica_engines:
+        if replica.dialect.name == "sqlite":
+            async with replica.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+    
+    # Bring existing tables up to date (indexes, constraints, columns)
+    await run_migrations()
     
     # Create default channels if they don't exist
-    db = SessionLocal()
-    try:
-        # Check if channels exist
-        if not db.query(Channel).first():
-            # Create default channels
-            channels = [
-                Channel(name="whatsapp", display_name="WhatsApp"),
-                Channel(name="gmail", display_name="Gmail"),
-                Channel(name="instagram", display_name="Instagram")
-            ]
-            
-            for channel in channels:
-                db.add(channel)
-            
-            db.commit()
-            print("✅ Default channels created")
-        else:
-            print("✅ Channels already exist")
-    except Exception as e:
-        print(f"❌ Error creating default channels: {e}")
-        db.rollback()
-    finally:
-        db.close()
+    async with SessionLocal() as db:
+        try:
+            # Check if channels exist
+            result = await db.execute(select(Channel).limit(1))
+            if not result.scalars().first():
+                # Create default channels
+                channels = [
+                    Channel(name="whatsapp", display_name="WhatsApp"),
+                    Channel(name="gmail", display_name="Gmail"),
+                    Channel(name="instagram", display_name="Instagram")
+                ]
+                
+                for channel in channels:
+                    db.add(channel)
+                
+                await db.commit()
+                logger.info("✅ Default channels created")
+                
+                from src.services.channel_registry import channel_registry
+                channel_registry.invalidate()
+            else:
+                logger.info("✅ Channels already exist")
+        except Exception as e:
+            logger.error(f"❌ Error creating default channels: {e}")
+            await db.rollback()
@@ -1,60 +1,68 @@
 """Core API - Unified messaging system."""
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import asyncio
-from typing import List
+import json
 
-from src.database import init_db
+from src.config import settings
+from src.database import engine, init_db, ping_db, replica_engines, replica_router
 from src.api import messages, conversations, channels
-from src.utils.logger import get_logger
+from src.services.archive_service import run_message_archival
+from src.services.channel_client import channel_clients
+from src.services.channel_registry import channel_registry
+from src.services.connection_manager import manager
+from src.services.outbox_service import outbox_dispatcher
+from src.services.unread_counter_service import run_unread_reconciliation
+from src.utils.logger import SAMPLED, get_logger
+from src.utils.metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from src.utils.pagination import NEXT_CURSOR_HEADER
+from src.utils.profiler import (
+    N_PLUS_ONE_HEADER, QUERY_COUNT_HEADER, QUERY_TIME_HEADER, QueryProfilerMiddleware, recent_profiles
+)
 
 logger = get_logger(__name__)
 
-# WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(f"WebSocket connected. Total connections: {len(self.active_connections)}")
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-        logger.info(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
-
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
-
-    async def broadcast(self, message: str):
-        """Broadcast message to all connected clients."""
-        if self.active_connections:
-            disconnected = []
-            for connection in self.active_connections:
-                try:
-                    await connection.send_text(message)
-                except:
-                    disconnected.append(connection)
-            
-            # Remove disconnected connections
-            for conn in disconnected:
-                self.active_connections.remove(conn)
-            
-            logger.info(f"Broadcasted to {len(self.active_connections)} clients")
-
-manager = ConnectionManager()
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("🚀 Starting Core API...")
     await init_db()
     logger.info("✅ Database initialized")
+    await channel_registry.refresh()
+    logger.info(f"✅ Channel registry: {len(channel_registry.all())} channels")
+    if replica_engines:
+        await replica_router.check()
+        logger.info(f"✅ Read replicas: {replica_router.status()}")
+    await manager.start()
+    await outbox_dispatcher.start()
+    
+    background_tasks = []
+    if settings.channel_registry_refresh_interval > 0:
+        background_tasks.append(
+            asyncio.create_task(channel_registry.run(settings.channel_registry_refresh_interval))
+        )
+    if replica_engines:
+        background_tasks.append(
+            asyncio.create_task(replica_router.run(settings.db_replica_check_interval))
+        )
+    if settings.unread_reconcile_interval > 0:
+        background_tasks.append(
+            asyncio.create_task(run_unread_reconciliation(settings.unread_reconcile_interval))
+        )
+    if settings.message_retention_days > 0:
+        background_tasks.append(
+            asyncio.create_task(run_message_archival(settings.archive_interval))
+        )
     yield
     # Shutdown
     logger.info("🛑 Shutting down Core API...")
+    for task in background_tasks:
+        task.cancel()
+    await outbox_dispatcher.stop()
+    await manager.stop()
+    await channel_clients.close()
 
 app = FastAPI(
     title="Core Unified Messaging API",
@@ -70,7 +78,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, QUERY_COUNT_HEADER, QUERY_TIME_HEADER, N_PLUS_ONE_HEADER],
 )
+# Per-route latency and status counts for /metrics
+app.add_middleware(MetricsMiddleware)
+# Opt-in SQL profiling (QUERY_PROFILING); a no-op when disabled
+app.add_middleware(QueryProfilerMiddleware, engine=engine)
 
 # Include routers
 app.include_router(messages.router, prefix="/api/v1", tags=["messages"])
@@ -89,23 +102,71 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Detailed health check."""
-    return {
-        "status": "healthy",
-        "service": "Core Unified Messaging API",
-        "version": "1.0.0",
-        "database": "connected",
-        "websocket_connections": len(manager.active_connections)
-    }
+    """Detailed health check; answers 503 when the database does not respond."""
+    try:
+        await ping_db(settings.health_db_timeout)
+        database = "connected"
+    except Exception as e:
+        logger.error(f"Health check: database unavailable: {str(e)}")
+        database = "unavailable"
+    
+    healthy = database == "connected"
+    return JSONResponse(
+        status_code=200 if healthy else 503,
+        content={
+            "status": "healthy" if healthy else "unhealthy",
+            "service": "Core Unified Messaging API",
+            "version": "1.0.0",
+            "database": database,
+            "replicas": replica_router.status(),
+            "websocket_connections": len(manager.connections),
+            "websocket": manager.metrics(),
+            "websocket_cluster": manager.cluster_metrics(),
+            "channel_services": channel_clients.metrics()
+        }
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Metrics in Prometheus text format."""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+@app.get("/debug/queries")
+async def debug_queries(limit: int = 20):
+    """SQL profiles of the most recent profiled requests, newest first."""
+    if settings.query_profiling == "off":
+        return JSONResponse(status_code=404, content={"detail": "Query profiling is disabled"})
+    return list(reversed(recent_profiles))[:limit]
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time messaging."""
+    """WebSocket endpoint for real-time messaging.
+    
+    Clients receive message.created events for the topics they subscribe to:
+    {"action": "subscribe", "topic": "all" | "channel:<name>" | "conversation:<id>"}
+    ({"action": "unsubscribe", ...} to stop). Any other text is echoed back.
+    """
     await manager.connect(websocket)
     try:
         while True:
             data = await websocket.receive_text()
-            logger.info(f"WebSocket message received: {data}")
+            logger.info(f"WebSocket message received: {data}", extra=SAMPLED)
+            
+            try:
+                command = json.loads(data)
+            except ValueError:
+                command = None
+            
+            if isinstance(command, dict) and command.get("action") in ("subscribe", "unsubscribe"):
+                topic = str(command.get("topic", ""))
+                if command["action"] == "subscribe":
+                    ok = manager.subscribe(websocket, topic)
+                else:
+                    manager.unsubscribe(websocket, topic)
+                    ok = True
+                reply = {"type": f"{command['action']}d" if ok else "error", "topic": topic}
+                await manager.send_personal_message(json.dumps(reply), websocket)
+                continue
             
             # Echo back for testing
             await manager.send_personal_message(f"Echo: {data}", websocket)
@@ -115,7 +176,7 @@ async def websocket_endpoint(websocket: WebSocket):
 
 @app.post("/broadcast")
 async def broadcast_message(message: str):
-    """Broadcast a message to all connected WebSocket clients."""
+    """Broadcast a message to all connected WebSocket clients (every worker)."""
     await manager.broadcast(message)
     return {"status": "success", "message": "Broadcasted to all clients"}
 
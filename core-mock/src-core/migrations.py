@@ -0,0 +1,203 @@
+"""Versioned schema migrations.
+
+`Base.metadata.create_all` only creates missing tables, it never alters the
+ones that already exist. Every schema change to an existing table (new index,
+constraint or column) is added here as a numbered migration so live databases
+catch up on startup. Migrations must be idempotent: on a fresh database the
+tables are created from the models first and the migrations only record
+themselves as applied.
+"""
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select
+from sqlalchemy.engine import Connection
+
+from src.database import Base, engine
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, default=datetime.utcnow)
+)
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+def _create_index_if_missing(conn: Connection, table_name: str, index_name: str) -> None:
+    """Create an index declared on the models unless the table already has it."""
+    inspector = inspect(conn)
+    existing = {index["name"] for index in inspector.get_indexes(table_name)}
+    existing.update(
+        constraint["name"] for constraint in inspector.get_unique_constraints(table_name)
+    )
+    if index_name in existing:
+        return
+    
+    table = Base.metadata.tables[table_name]
+    index = next(index for index in table.indexes if index.name == index_name)
+    index.create(conn)
+    logger.info(f"Index {index_name} created on {table_name}")
+
+# Conversations that lost the concurrent-first-message race: every
+# (channel_id, participant_identifier) except its first conversation
+_DUPLICATE_CONVERSATIONS = (
+    "SELECT id FROM conversations WHERE id NOT IN ("
+    "SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM conversations "
+    "GROUP BY channel_id, participant_identifier) AS keep)"
+)
+
+def _add_conversation_participant_unique(conn: Connection) -> None:
+    from src.services.unread_counter_service import rebuild_statements
+    
+    # Created as a unique index: SQLite can't add constraints to existing tables
+    inspector = inspect(conn)
+    existing = {c["name"] for c in inspector.get_unique_constraints("conversations")}
+    existing.update(index["name"] for index in inspector.get_indexes("conversations"))
+    if "uq_conversations_channel_participant" in existing:
+        return
+    
+    # Merge duplicate conversations into the first one of each participant
+    duplicates = conn.exec_driver_sql(_DUPLICATE_CONVERSATIONS).scalars().all()
+    if duplicates:
+        for table_name in ("messages", "messages_archive"):
+            conn.exec_driver_sql(
+                f"UPDATE {table_name} SET conversation_id = ("
+                "SELECT MIN(keeper.id) FROM conversations AS dup "
+                "JOIN conversations AS keeper ON keeper.channel_id = dup.channel_id "
+                "AND keeper.participant_identifier = dup.participant_identifier "
+                f"WHERE dup.id = {table_name}.conversation_id) "
+                f"WHERE conversation_id IN ({_DUPLICATE_CONVERSATIONS})"
+            )
+        # Derived table: MySQL can't select from the table it deletes from
+        conn.exec_driver_sql(
+            f"DELETE FROM conversations WHERE id IN (SELECT id FROM ({_DUPLICATE_CONVERSATIONS}) AS dup_ids)"
+        )
+        logger.info(f"Duplicate conversations merged: {len(duplicates)}")
+        
+        # Databases older than migration 4 get their counters backfilled there
+        columns = {column["name"] for column in inspector.get_columns("conversations")}
+        if "unread_count" in columns:
+            for stmt in rebuild_statements():
+                conn.execute(stmt)
+    
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX uq_conversations_channel_participant "
+        "ON conversations (channel_id, participant_identifier)"
+    )
+    logger.info("Unique index uq_conversations_channel_participant created")
+
+def _add_hot_path_indexes(conn: Connection) -> None:
+    _create_index_if_missing(conn, "messages", "ix_messages_conversation_timestamp")
+    _create_index_if_missing(conn, "messages", "ix_messages_is_read")
+    _create_index_if_missing(conn, "conversations", "ix_conversations_channel_updated")
+
+def _add_keyset_indexes(conn: Connection) -> None:
+    # Unfiltered listings page by (timestamp, id) / (updated_at, id)
+    _create_index_if_missing(conn, "messages", "ix_messages_timestamp")
+    _create_index_if_missing(conn, "conversations", "ix_conversations_updated")
+
+def _add_unread_counters(conn: Connection) -> None:
+    from src.services.unread_counter_service import rebuild_statements
+    
+    inspector = inspect(conn)
+    for table_name in ("conversations", "channels"):
+        columns = {column["name"] for column in inspector.get_columns(table_name)}
+        if "unread_count" not in columns:
+            conn.exec_driver_sql(
+                f"ALTER TABLE {table_name} ADD COLUMN unread_count INTEGER NOT NULL DEFAULT 0"
+            )
+            logger.info(f"Column unread_count added to {table_name}")
+    
+    # Backfill from the messages table
+    for stmt in rebuild_statements():
+        conn.execute(stmt)
+
+def _add_message_external_unique(conn: Connection) -> None:
+    from src.services.unread_counter_service import rebuild_statements
+    
+    inspector = inspect(conn)
+    existing = {c["name"] for c in inspector.get_unique_constraints("messages")}
+    existing.update(index["name"] for index in inspector.get_indexes("messages"))
+    if "uq_messages_conversation_external" in existing:
+        return
+    
+    # Keep the first copy of every message stored more than once
+    result = conn.exec_driver_sql(
+        "DELETE FROM messages WHERE external_message_id IS NOT NULL AND id NOT IN ("
+        "SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM messages "
+        "WHERE external_message_id IS NOT NULL "
+        "GROUP BY conversation_id, external_message_id) AS keep)"
+    )
+    if result.rowcount:
+        logger.info(f"Duplicate messages removed: {result.rowcount}")
+        for stmt in rebuild_statements():
+            conn.execute(stmt)
+    
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX uq_messages_conversation_external "
+        "ON messages (conversation_id, external_message_id)"
+    )
+    logger.info("Unique index uq_messages_conversation_external created")
+
+def _add_message_fulltext(conn: Connection) -> None:
+    # Only InnoDB has FULLTEXT; other databases search with the in-process index
+    if conn.dialect.name != "mysql":
+        return
+    existing = {index["name"] for index in inspect(conn).get_indexes("messages")}
+    if "ft_messages_content" not in existing:
+        conn.exec_driver_sql("CREATE FULLTEXT INDEX ft_messages_content ON messages (content)")
+        logger.info("Full-text index ft_messages_content created")
+
+def _add_conversation_version(conn: Connection) -> None:
+    columns = {column["name"] for column in inspect(conn).get_columns("conversations")}
+    if "version" not in columns:
+        conn.exec_driver_sql("ALTER TABLE conversations ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        logger.info("Column version added to conversations")
+
+def _add_channel_conversations_version(conn: Connection) -> None:
+    inspector = inspect(conn)
+    columns = {column["name"] for column in inspector.get_columns("channels")}
+    if "conversations_version" not in columns:
+        conn.exec_driver_sql("ALTER TABLE channels ADD COLUMN conversations_version INTEGER NOT NULL DEFAULT 0")
+        logger.info("Column conversations_version added to channels")
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Unique (channel_id, participant_identifier) on conversations", _add_conversation_participant_unique),
+    Migration(2, "Composite indexes for message and conversation listings", _add_hot_path_indexes),
+    Migration(3, "Sort indexes for keyset pagination", _add_keyset_indexes),
+    Migration(4, "Materialized unread counters on conversations and channels", _add_unread_counters),
+    Migration(5, "Unique (conversation_id, external_message_id) on messages", _add_message_external_unique),
+    Migration(6, "FULLTEXT index on messages.content (MySQL)", _add_message_fulltext),
+    Migration(7, "Change version on conversations for ETags", _add_conversation_version),
+    Migration(8, "Per-channel conversations version for listing ETags", _add_channel_conversations_version),
+]
+
+def _upgrade(conn: Connection) -> None:
+    schema_migrations.create(conn, checkfirst=True)
+    applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+    
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version in applied:
+            continue
+        
+        logger.info(f"Applying migration {migration.version}: {migration.description}")
+        migration.upgrade(conn)
+        conn.execute(
+            schema_migrations.insert().values(
+                version=migration.version,
+                description=migration.description
+            )
+        )
+
+async def run_migrations() -> None:
+    """Apply every pending migration in version order."""
+    async with engine.begin() as conn:
+        await conn.run_sync(_upgrade)
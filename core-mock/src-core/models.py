@@ -1,5 +1,5 @@
 """Database models for unified messaging system."""
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from src.database import Base
@@ -11,6 +11,8 @@ class Channel(Base):
     name = Column(String(50), unique=True, nullable=False)  # whatsapp, gmail, instagram
     display_name = Column(String(100), nullable=False)
     is_active = Column(Boolean, default=True)
+    unread_count = Column(Integer, nullable=False, default=0, server_default="0")  # incoming unread, kept by UnreadCounterService
+    conversations_version = Column(Integer, nullable=False, default=0, server_default="0")  # +1 whenever one of its conversations changes (listing ETags)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -18,6 +20,13 @@ class Channel(Base):
 
 class Conversation(Base):
     __tablename__ = "conversations"
+    __table_args__ = (
+        # One conversation per participant and channel; backs the ingestion upsert
+        UniqueConstraint("channel_id", "participant_identifier", name="uq_conversations_channel_participant"),
+        # Conversation listings filter by channel and sort by last activity
+        Index("ix_conversations_channel_updated", "channel_id", "updated_at"),
+        Index("ix_conversations_updated", "updated_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     channel_id = Column(Integer, ForeignKey("channels.id"), nullable=False)
@@ -25,6 +34,8 @@ class Conversation(Base):
     participant_name = Column(String(255))
     participant_identifier = Column(String(255), nullable=False)  # email, phone, username
     is_active = Column(Boolean, default=True)
+    unread_count = Column(Integer, nullable=False, default=0, server_default="0")  # incoming unread, kept by UnreadCounterService
+    version = Column(Integer, nullable=False, default=0, server_default="0")  # +1 on every change to the conversation or its messages (ETags)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -34,6 +45,15 @@ class Conversation(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Message listings filter by conversation and sort by timestamp
+        Index("ix_messages_conversation_timestamp", "conversation_id", "timestamp"),
+        Index("ix_messages_timestamp", "timestamp"),
+        Index("ix_messages_is_read", "is_read"),
+        # Webhook retries deliver the same external message more than once
+        UniqueConstraint("conversation_id", "external_message_id", name="uq_messages_conversation_external"),
+        # FULLTEXT ft_messages_content (MySQL only) is created by migration 6
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
@@ -50,3 +70,49 @@ class Message(Base):
     
     # Relationships
     conversation = relationship("Conversation", back_populates="messages")
+
+class ArchivedMessage(Base):
+    """Message moved out of `messages` by ArchiveService once past the retention age."""
+    __tablename__ = "messages_archive"
+    __table_args__ = (
+        # Archived history is only read per conversation, newest first
+        Index("ix_messages_archive_conversation_timestamp", "conversation_id", "timestamp"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)  # Mismo id que tenía en messages
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
+    external_message_id = Column(String(255))
+    content = Column(Text, nullable=False)
+    message_type = Column(String(50), default="text")
+    direction = Column(String(10), nullable=False)
+    sender_name = Column(String(255))
+    sender_identifier = Column(String(255), nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    is_read = Column(Boolean, default=False)
+    message_metadata = Column(Text)
+    created_at = Column(DateTime)
+    archived_at = Column(DateTime, nullable=False)
+
+class OutboxMessage(Base):
+    """Outgoing message waiting to be delivered to a channel service."""
+    __tablename__ = "outbox"
+    __table_args__ = (
+        # Workers pick due messages by status and next attempt time
+        Index("ix_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    channel = Column(String(50), nullable=False)
+    recipient = Column(String(255), nullable=False)  # "to" del request
+    content = Column(Text, nullable=False)
+    message_type = Column(String(50), default="text")
+    media_url = Column(String(1024))
+    status = Column(String(20), nullable=False, default="pending")  # pending, sending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    external_message_id = Column(String(255))  # ID devuelto por el servicio de canal
+    message_id = Column(Integer, ForeignKey("messages.id"))  # Mensaje guardado al enviarse
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    locked_at = Column(DateTime)  # Lease del worker que lo está enviando
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
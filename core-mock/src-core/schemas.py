@@ -26,6 +26,19 @@ class MessageResponse(MessageBase):
     class Config:
         from_attributes = True
 
+class MessageSearchResult(MessageResponse):
+    """Mensaje encontrado por la búsqueda, con su relevancia"""
+    score: float
+
+class MarkReadRequest(BaseModel):
+    """Ids de los mensajes a marcar como leídos"""
+    message_ids: List[int]
+
+class MarkReadResponse(BaseModel):
+    """Resultado de marcar mensajes como leídos en bloque"""
+    status: str = "success"
+    updated: int  # Mensajes que pasaron de no leídos a leídos
+
 class ConversationBase(BaseModel):
     participant_name: Optional[str] = None
     participant_identifier: str
@@ -46,6 +59,12 @@ class ConversationResponse(ConversationBase):
     class Config:
         from_attributes = True
 
+class ConversationListItem(ConversationResponse):
+    """Conversación en listados: solo los últimos mensajes, no el historial completo"""
+    last_message: Optional[MessageResponse] = None
+    unread_count: int = 0
+    has_unread: bool = False
+
 class ChannelResponse(BaseModel):
     id: int
     name: str
@@ -66,6 +85,22 @@ class UnifiedMessage(BaseModel):
     message_type: str = "text"
     sender_name: Optional[str] = None
 
+class UnifiedBatchItemResult(BaseModel):
+    """Resultado por item de una ingesta en lote"""
+    index: int
+    status: str  # success, duplicate, error
+    message_id: Optional[int] = None
+    conversation_id: Optional[int] = None
+    error: Optional[str] = None
+
+class UnifiedBatchResponse(BaseModel):
+    """Response de la ingesta en lote de mensajes unificados"""
+    total: int
+    succeeded: int
+    failed: int
+    duplicates: int = 0
+    results: List[UnifiedBatchItemResult]
+
 class SendMessageRequest(BaseModel):
     """Request para enviar mensaje a través de un canal"""
     channel: str
@@ -80,3 +115,18 @@ class SendMessageResponse(BaseModel):
     message_id: Optional[str] = None
     error: Optional[str] = None
     details: Optional[dict] = None
+    tracking_id: Optional[int] = None  # ID en el outbox para seguir el envío
+    status: Optional[str] = None  # pending, sending, sent, failed
+
+class OutboxStatusResponse(BaseModel):
+    """Estado de un envío encolado en el outbox"""
+    tracking_id: int
+    channel: str
+    to: str
+    status: str
+    attempts: int
+    error: Optional[str] = None
+    external_message_id: Optional[str] = None
+    message_id: Optional[int] = None
+    created_at: datetime
+    updated_at: datetime
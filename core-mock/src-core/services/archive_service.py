@@ -0,0 +1,123 @@
+"""Archive service: moves messages past the retention age out of the hot table."""
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import DateTime, delete, desc, insert, literal, select, update
+from typing import Dict, List
+
+from src.config import settings
+from src.models import ArchivedMessage, Message, OutboxMessage
+from src.services.channel_service import invalidate_channel_stats
+from src.services.search_service import search_index
+from src.services.unread_counter_service import UnreadCounterService
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Columns copied verbatim from messages to messages_archive
+ARCHIVED_COLUMNS = [column.name for column in Message.__table__.columns]
+
+class ArchiveService:
+    """Moves old messages to messages_archive in small batches.
+    
+    Each batch is its own short transaction (copy, delete, counter
+    adjustment), so the hot table is never locked for longer than one batch.
+    Unread messages leave the unread counters when archived; outbox rows
+    that pointed at an archived message keep their own copy of the content
+    and lose the link.
+    """
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def archive_before(
+        self,
+        cutoff: datetime,
+        batch_size: int = 1000,
+        pause: float = 0.0
+    ) -> int:
+        """Archive every message with timestamp < cutoff. Returns how many moved."""
+        total = 0
+        while True:
+            archived = await self.archive_batch(cutoff, batch_size)
+            total += archived
+            if archived < batch_size:
+                break
+            # Leave room for the ingestion traffic between batches
+            await asyncio.sleep(pause)
+        
+        if total:
+            logger.info(f"Archived {total} messages older than {cutoff.isoformat()}")
+        return total
+    
+    async def archive_expired(self) -> int:
+        """Archive the messages older than settings.message_retention_days."""
+        cutoff = datetime.utcnow() - timedelta(days=settings.message_retention_days)
+        return await self.archive_before(cutoff, settings.archive_batch_size, settings.archive_batch_pause)
+    
+    async def archive_batch(self, cutoff: datetime, batch_size: int) -> int:
+        """Move the oldest `batch_size` messages before the cutoff in one transaction."""
+        result = await self.db.execute(
+            select(Message.id, Message.conversation_id, Message.direction, Message.is_read)
+            .where(Message.timestamp < cutoff)
+            .order_by(Message.timestamp)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            return 0
+        
+        message_ids = [row.id for row in rows]
+        unread_deltas: Dict[int, int] = {}
+        for row in rows:
+            # Every touched conversation gets a version bump, unread or not
+            unread = row.direction == "incoming" and not row.is_read
+            unread_deltas[row.conversation_id] = unread_deltas.get(row.conversation_id, 0) - unread
+        
+        try:
+            await self.db.execute(
+                insert(ArchivedMessage).from_select(
+                    ARCHIVED_COLUMNS + ["archived_at"],
+                    select(
+                        *[getattr(Message, name) for name in ARCHIVED_COLUMNS],
+                        literal(datetime.utcnow(), DateTime)
+                    ).where(Message.id.in_(message_ids))
+                )
+            )
+            await self.db.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.message_id.in_(message_ids))
+                .values(message_id=None)
+            )
+            await self.db.execute(delete(Message).where(Message.id.in_(message_ids)))
+            await UnreadCounterService(self.db).adjust(unread_deltas)
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        
+        search_index.remove(message_ids)
+        invalidate_channel_stats()
+        return len(message_ids)
+    
+    async def get_archived_messages(self, conversation_id: int, limit: int) -> List[ArchivedMessage]:
+        """Newest archived messages of a conversation."""
+        result = await self.db.execute(
+            select(ArchivedMessage)
+            .where(ArchivedMessage.conversation_id == conversation_id)
+            .order_by(desc(ArchivedMessage.timestamp))
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+async def run_message_archival(interval: int) -> None:
+    """Background job that periodically archives messages past the retention age."""
+    from src.database import SessionLocal
+    
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with SessionLocal() as db:
+                await ArchiveService(db).archive_expired()
+        except Exception as e:
+            logger.error(f"Error archiving messages: {str(e)}")
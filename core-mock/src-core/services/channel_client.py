@@ -0,0 +1,185 @@
+"""Pooled HTTP clients for the channel services (WhatsApp, Gmail, Instagram)."""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+import httpx
+
+from src.config import settings
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Failures where the channel service certainly did not process the request,
+# so retrying can't send the message twice
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+RETRYABLE_STATUS = {503}
+
+class ChannelUnavailableError(Exception):
+    """Raised without calling the channel service while its circuit is open."""
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures and fails fast for `reset_timeout`
+    seconds; then lets a single trial request through (half-open)."""
+    
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+    
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+    
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+    
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+class ChannelClient:
+    """Keep-alive HTTP client for one channel service with a concurrency limit,
+    timeouts, jittered retries and a circuit breaker."""
+    
+    def __init__(self, channel: str, base_url: str):
+        self.channel = channel
+        self.base_url = base_url
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(
+                settings.channel_read_timeout,
+                connect=settings.channel_connect_timeout
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.channel_max_concurrency,
+                max_keepalive_connections=settings.channel_max_concurrency
+            )
+        )
+        self.semaphore = asyncio.Semaphore(settings.channel_max_concurrency)
+        self.breaker = CircuitBreaker(
+            threshold=settings.channel_breaker_threshold,
+            reset_timeout=settings.channel_breaker_reset_timeout
+        )
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+        self._latencies: Deque[float] = deque(maxlen=1000)
+    
+    async def send(self, payload: dict) -> Tuple[int, dict]:
+        """POST /send/<channel>. Returns (status_code, json body)."""
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise ChannelUnavailableError(f"Channel service {self.channel} is unavailable")
+        
+        async with self.semaphore:
+            started = time.monotonic()
+            self.requests += 1
+            try:
+                response = await self._post_with_retries(payload)
+            except Exception:
+                self.errors += 1
+                self.breaker.record_failure()
+                raise
+            finally:
+                self._latencies.append(time.monotonic() - started)
+        
+        if response.status_code >= 500:
+            self.errors += 1
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        
+        try:
+            body = response.json()
+        except ValueError:
+            # Proxies answer 502/504 with an HTML page or an empty body
+            body = {"error": f"Non-JSON response from {self.channel} service (HTTP {response.status_code})"}
+        return response.status_code, body
+    
+    async def _post_with_retries(self, payload: dict) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.post(f"/send/{self.channel}", json=payload)
+                if response.status_code not in RETRYABLE_STATUS or attempt >= settings.channel_max_retries:
+                    return response
+            except RETRYABLE_ERRORS as e:
+                if attempt >= settings.channel_max_retries:
+                    raise
+                logger.warning(f"Retrying {self.channel} send after error: {str(e)}")
+            
+            attempt += 1
+            self.retries += 1
+            # Exponential backoff with full jitter
+            await asyncio.sleep(random.uniform(0, settings.channel_retry_backoff * 2 ** attempt))
+    
+    def metrics(self) -> dict:
+        latencies = sorted(self._latencies)
+        
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 6)
+        
+        return {
+            "base_url": self.base_url,
+            "circuit": self.breaker.state,
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "in_flight": settings.channel_max_concurrency - self.semaphore._value,
+            "latency_p50": percentile(0.50),
+            "latency_p99": percentile(0.99)
+        }
+
+class ChannelClientRegistry:
+    """One shared ChannelClient per configured channel, for the app's lifetime."""
+    
+    def __init__(self):
+        self._clients: Dict[str, ChannelClient] = {}
+    
+    def get(self, channel: str) -> Optional[ChannelClient]:
+        """Client for a channel, or None if the channel has no service URL."""
+        base_url = settings.channel_service_urls.get(channel)
+        if not base_url:
+            return None
+        
+        client = self._clients.get(channel)
+        if client is None or client.client.is_closed:
+            client = ChannelClient(channel, base_url)
+            self._clients[channel] = client
+        return client
+    
+    async def close(self):
+        for client in self._clients.values():
+            await client.client.aclose()
+        self._clients.clear()
+    
+    def metrics(self) -> dict:
+        return {channel: client.metrics() for channel, client in self._clients.items()}
+
+channel_clients = ChannelClientRegistry()
@@ -0,0 +1,74 @@
+"""Process-wide registry of channels (reference data)."""
+import asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import Dict, List, Optional
+
+from src.models import Channel
+from src.schemas import ChannelResponse
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class ChannelRegistry:
+    """In-memory copy of the channels table (name -> row, id -> row).
+    
+    Channels almost never change, so request paths read them from here
+    instead of querying. The registry is loaded in the app lifespan, reloaded
+    every channel_registry_refresh_interval seconds, and reloaded on the next
+    access after `invalidate()`. Code running outside the app (scripts,
+    benchmarks) loads it on first use through `ensure_loaded`.
+    """
+    
+    def __init__(self):
+        self._by_id: Dict[int, ChannelResponse] = {}
+        self._by_name: Dict[str, ChannelResponse] = {}
+        self.loaded = False
+    
+    async def load(self, db: AsyncSession) -> None:
+        """Replace the registry with the current contents of the channels table."""
+        result = await db.execute(select(Channel).order_by(Channel.id))
+        channels = [ChannelResponse.from_orm(channel) for channel in result.scalars().all()]
+        # Swap whole dicts so readers never see a half-built registry
+        self._by_id = {channel.id: channel for channel in channels}
+        self._by_name = {channel.name: channel for channel in channels}
+        self.loaded = True
+    
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        if not self.loaded:
+            await self.load(db)
+    
+    async def refresh(self) -> None:
+        """Reload using a session of its own."""
+        from src.database import SessionLocal
+        
+        async with SessionLocal() as db:
+            await self.load(db)
+        logger.debug(f"Channel registry loaded: {', '.join(self._by_name)}")
+    
+    def invalidate(self) -> None:
+        """Reload on the next access; call after writing to the channels table."""
+        self.loaded = False
+    
+    def get(self, name: str) -> Optional[ChannelResponse]:
+        return self._by_name.get(name)
+    
+    def get_by_id(self, channel_id: int) -> Optional[ChannelResponse]:
+        return self._by_id.get(channel_id)
+    
+    def all(self, active_only: bool = False) -> List[ChannelResponse]:
+        return [
+            channel for channel in self._by_id.values()
+            if channel.is_active or not active_only
+        ]
+    
+    async def run(self, interval: int) -> None:
+        """Background job that periodically reloads the registry."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing channel registry: {str(e)}")
+
+channel_registry = ChannelRegistry()
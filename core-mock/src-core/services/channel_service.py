@@ -1,57 +1,78 @@
 """Channel service for handling channel operations."""
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
 from typing import List, Optional
 
 from src.models import Channel, Conversation, Message
+from src.config import settings
 from src.schemas import ChannelResponse
+from src.services.channel_registry import channel_registry
+from src.utils.cache import TTLCache
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Short-lived cache of the per-channel statistics
+channel_stats_cache = TTLCache(maxsize=1, ttl=settings.channel_stats_cache_ttl)
+
+def invalidate_channel_stats() -> None:
+    """Drop cached channel statistics after a write."""
+    channel_stats_cache.clear()
+
 class ChannelService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
     async def get_all_channels(self) -> List[ChannelResponse]:
-        """Get all active channels."""
-        channels = self.db.query(Channel).filter(Channel.is_active == True).all()
-        return [ChannelResponse.from_orm(channel) for channel in channels]
+        """Get all active channels (from the channel registry)."""
+        await channel_registry.ensure_loaded(self.db)
+        return channel_registry.all(active_only=True)
     
     async def get_channel_by_name(self, channel_name: str) -> Optional[ChannelResponse]:
-        """Get channel by name."""
-        channel = self.db.query(Channel).filter(Channel.name == channel_name).first()
-        if channel:
-            return ChannelResponse.from_orm(channel)
-        return None
+        """Get channel by name (from the channel registry)."""
+        await channel_registry.ensure_loaded(self.db)
+        return channel_registry.get(channel_name)
     
-    async def get_channel_stats(self, channel_name: str) -> dict:
-        """Get statistics for a channel."""
-        channel = self.db.query(Channel).filter(Channel.name == channel_name).first()
-        if not channel:
-            return {}
+    async def get_all_channel_stats(self) -> List[dict]:
+        """Get statistics for every channel with a single aggregate query.
         
-        # Get conversation count
-        conversation_count = self.db.query(Conversation).filter(
-            Conversation.channel_id == channel.id
-        ).count()
+        Results are cached for a few seconds and dropped on every write
+        (see invalidate_channel_stats).
+        """
+        stats = channel_stats_cache.get("all")
+        if stats is not None:
+            return stats
         
-        # Get message count
-        message_count = self.db.query(Message).join(Conversation).filter(
-            Conversation.channel_id == channel.id
-        ).count()
-        
-        # Get unread message count
-        unread_count = self.db.query(Message).join(Conversation).filter(
-            and_(
-                Conversation.channel_id == channel.id,
-                Message.is_read == False
+        result = await self.db.execute(
+            select(
+                Channel.name,
+                func.count(func.distinct(Conversation.id)),
+                func.count(Message.id),
+                Channel.unread_count
             )
-        ).count()
+            .select_from(Channel)
+            .outerjoin(Conversation, Conversation.channel_id == Channel.id)
+            .outerjoin(Message, Message.conversation_id == Conversation.id)
+            .group_by(Channel.id, Channel.name, Channel.unread_count)
+            .order_by(Channel.id)
+        )
+        stats = [
+            {
+                "channel_name": name,
+                "conversation_count": conversation_count,
+                "message_count": message_count,
+                # Materialized counter of unread incoming messages
+                "unread_count": unread_count
+            }
+            for name, conversation_count, message_count, unread_count in result.all()
+        ]
         
-        return {
-            "channel_name": channel_name,
-            "conversation_count": conversation_count,
-            "message_count": message_count,
-            "unread_count": unread_count
-        }
+        channel_stats_cache.set("all", stats)
+        return stats
+    
+    async def get_channel_stats(self, channel_name: str) -> dict:
+        """Get statistics for a channel."""
+        for stats in await self.get_all_channel_stats():
+            if stats["channel_name"] == channel_name:
+                return stats
+        return {}
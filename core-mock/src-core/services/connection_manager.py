@@ -0,0 +1,315 @@
+"""WebSocket connection manager with per-connection send queues."""
+import asyncio
+import json
+import re
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from fastapi import WebSocket
+
+from src.config import settings
+from src.services.pubsub import InProcessBackend, PubSubBackend, create_backend
+from src.utils.logger import get_logger
+from src.utils.metrics import registry
+
+logger = get_logger(__name__)
+
+broadcast_duration = registry.histogram(
+    "websocket_broadcast_duration_seconds",
+    "Time to hand an event to the pub/sub backend (includes local fan-out in memory mode)",
+    ("kind",)
+)
+delivery_lag = registry.histogram(
+    "websocket_delivery_lag_seconds", "Time events wait in a client's send queue"
+)
+
+# Close code sent to clients evicted for not keeping up (RFC 6455 "Try Again Later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+# Topics a client may subscribe to: every message, a channel, or a conversation
+TOPIC_PATTERN = re.compile(r"^(all|channel:[\w.-]+|conversation:\d+)$")
+
+def message_topics(channel: str, conversation_id: int) -> List[str]:
+    """Topics an event about a message in this channel/conversation is published to."""
+    return ["all", f"channel:{channel}", f"conversation:{conversation_id}"]
+
+class ClientConnection:
+    """A connected client: its bounded outbound queue and the task draining it."""
+    
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue: "asyncio.Queue[Tuple[str, float]]" = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.topics: Set[str] = set()
+        self.sent = 0
+        self.dropped = 0
+
+class ConnectionManager:
+    """Fans messages out to WebSocket clients without waiting on any of them.
+    
+    Every connection gets its own bounded queue and writer task, so broadcast
+    only enqueues and a slow or half-dead client can't delay the others. When
+    a client's queue is full the overflow policy applies: "drop_oldest"
+    discards its oldest pending message, "disconnect" evicts the client.
+    
+    Broadcasts and topic events go through a pub/sub backend so that they
+    reach the clients of every worker; each worker only writes to its own.
+    """
+    
+    def __init__(
+        self,
+        queue_size: int = 100,
+        overflow_policy: str = "disconnect",
+        send_timeout: float = 5.0,
+        backend: Optional[PubSubBackend] = None,
+        heartbeat_interval: float = 2.0
+    ):
+        self.backend = backend or InProcessBackend()
+        self.heartbeat_interval = heartbeat_interval
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.send_timeout = send_timeout
+        self.connections: Dict[WebSocket, ClientConnection] = {}
+        self.subscriptions: Dict[str, Set[WebSocket]] = {}
+        self.evicted = 0
+        self.dropped = 0
+        self._lags: Deque[float] = deque(maxlen=1000)
+        self._workers: Dict[str, Tuple[int, float]] = {}
+        self._heartbeat: Optional[asyncio.Task] = None
+    
+    async def start(self):
+        """Start the pub/sub backend and the cluster heartbeat."""
+        await self.backend.start(self._on_event)
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+    
+    async def stop(self):
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+        await self.backend.stop()
+    
+    async def connect(self, websocket: WebSocket):
+        await websocket.accept()
+        conn = ClientConnection(websocket, self.queue_size)
+        conn.writer = asyncio.create_task(self._writer(conn))
+        self.connections[websocket] = conn
+        logger.info(f"WebSocket connected. Total connections: {len(self.connections)}")
+    
+    def disconnect(self, websocket: WebSocket):
+        conn = self.connections.pop(websocket, None)
+        if conn is None:
+            return
+        for topic in conn.topics:
+            self._unindex(topic, websocket)
+        if conn.writer and conn.writer is not asyncio.current_task():
+            conn.writer.cancel()
+        logger.info(f"WebSocket disconnected. Total connections: {len(self.connections)}")
+    
+    async def send_personal_message(self, message: str, websocket: WebSocket):
+        conn = self.connections.get(websocket)
+        if conn:
+            self._enqueue(conn, message, time.monotonic())
+    
+    def subscribe(self, websocket: WebSocket, topic: str) -> bool:
+        """Subscribe a client to a topic. Returns False for unknown topics."""
+        conn = self.connections.get(websocket)
+        if conn is None or not TOPIC_PATTERN.match(topic):
+            return False
+        conn.topics.add(topic)
+        self.subscriptions.setdefault(topic, set()).add(websocket)
+        return True
+    
+    def unsubscribe(self, websocket: WebSocket, topic: str):
+        conn = self.connections.get(websocket)
+        if conn and topic in conn.topics:
+            conn.topics.discard(topic)
+            self._unindex(topic, websocket)
+    
+    def _unindex(self, topic: str, websocket: WebSocket):
+        subscribers = self.subscriptions.get(topic)
+        if subscribers is not None:
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self.subscriptions[topic]
+    
+    async def publish(self, topics: Iterable[str], event: Any):
+        """Send an event to the clients of every worker subscribed to any of the topics."""
+        with broadcast_duration.time("publish"):
+            text = event if isinstance(event, str) else json.dumps(event, default=str)
+            await self.backend.publish({"kind": "publish", "topics": list(topics), "text": text})
+    
+    async def broadcast(self, message: Union[str, Any]):
+        """Send a message to every client of every worker.
+        
+        Non-string payloads are JSON-encoded once and the same text is shared
+        by all connections.
+        """
+        with broadcast_duration.time("broadcast"):
+            text = message if isinstance(message, str) else json.dumps(message, default=str)
+            await self.backend.publish({"kind": "broadcast", "text": text})
+    
+    async def _on_event(self, envelope: dict):
+        """Handle an event delivered by the pub/sub backend."""
+        kind = envelope.get("kind")
+        if kind == "publish":
+            self._deliver_topics(envelope["topics"], envelope["text"])
+        elif kind == "broadcast":
+            self._deliver_all(envelope["text"])
+        elif kind == "heartbeat":
+            self._workers[envelope["origin"]] = (envelope["connections"], time.monotonic())
+    
+    def _deliver_topics(self, topics: Iterable[str], text: str) -> int:
+        """Queue an event for the local clients subscribed to any of the topics.
+        
+        A client subscribed to several matching topics receives it once.
+        """
+        recipients: Set[WebSocket] = set()
+        for topic in topics:
+            recipients.update(self.subscriptions.get(topic, ()))
+        if not recipients:
+            return 0
+        
+        enqueued_at = time.monotonic()
+        
+        queued = 0
+        for websocket in recipients:
+            conn = self.connections.get(websocket)
+            if conn and self._enqueue(conn, text, enqueued_at):
+                queued += 1
+        return queued
+    
+    def _deliver_all(self, text: str) -> int:
+        """Queue a message for every local client."""
+        enqueued_at = time.monotonic()
+        
+        queued = 0
+        for conn in list(self.connections.values()):
+            if self._enqueue(conn, text, enqueued_at):
+                queued += 1
+        return queued
+    
+    def _enqueue(self, conn: ClientConnection, text: str, enqueued_at: float) -> bool:
+        try:
+            conn.queue.put_nowait((text, enqueued_at))
+            return True
+        except asyncio.QueueFull:
+            pass
+        
+        if self.overflow_policy == "drop_oldest":
+            conn.queue.get_nowait()
+            conn.queue.put_nowait((text, enqueued_at))
+            conn.dropped += 1
+            self.dropped += 1
+            return True
+        
+        self.evicted += 1
+        logger.warning("Evicting slow WebSocket consumer: send queue full")
+        self.disconnect(conn.websocket)
+        asyncio.create_task(self._close(conn.websocket, SLOW_CONSUMER_CLOSE_CODE))
+        return False
+    
+    async def _writer(self, conn: ClientConnection):
+        """Drain a connection's queue; any send failure or timeout drops the client."""
+        try:
+            while True:
+                text, enqueued_at = await conn.queue.get()
+                await asyncio.wait_for(conn.websocket.send_text(text), self.send_timeout)
+                conn.sent += 1
+                lag = time.monotonic() - enqueued_at
+                self._lags.append(lag)
+                delivery_lag.observe(lag)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"WebSocket send failed, dropping client: {str(e)}")
+            self.disconnect(conn.websocket)
+            await self._close(conn.websocket)
+    
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int = 1000):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+    
+    async def _heartbeat_loop(self):
+        """Periodically announce this worker's connection count to the cluster."""
+        while True:
+            try:
+                await self.backend.publish({
+                    "kind": "heartbeat",
+                    "connections": len(self.connections)
+                })
+            except Exception as e:
+                logger.error(f"Error publishing WebSocket heartbeat: {str(e)}")
+            await asyncio.sleep(self.heartbeat_interval)
+    
+    def cluster_metrics(self) -> dict:
+        """Connection counts of every worker seen recently (including this one)."""
+        stale_after = self.heartbeat_interval * 3
+        now = time.monotonic()
+        workers = {
+            worker_id: connections
+            for worker_id, (connections, seen_at) in self._workers.items()
+            if now - seen_at <= stale_after
+        }
+        # This worker's own count is always current
+        workers[self.backend.worker_id] = len(self.connections)
+        return {
+            "workers": len(workers),
+            "connections": sum(workers.values())
+        }
+    
+    def metrics(self) -> dict:
+        """Connection count, queue depth, drops/evictions and delivery lag (seconds)."""
+        lags = sorted(self._lags)
+        
+        def percentile(p: float) -> Optional[float]:
+            if not lags:
+                return None
+            return round(lags[min(len(lags) - 1, int(p * len(lags)))], 6)
+        
+        depths = [conn.queue.qsize() for conn in self.connections.values()]
+        return {
+            "connections": len(self.connections),
+            "topics": len(self.subscriptions),
+            "queued_messages": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped_messages": self.dropped,
+            "evicted_clients": self.evicted,
+            "delivery_lag_p50": percentile(0.50),
+            "delivery_lag_p99": percentile(0.99),
+            "delivery_lag_max": round(lags[-1], 6) if lags else None
+        }
+
+manager = ConnectionManager(
+    queue_size=settings.ws_queue_size,
+    overflow_policy=settings.ws_overflow_policy,
+    send_timeout=settings.ws_send_timeout,
+    backend=create_backend(
+        settings.pubsub_backend,
+        socket_dir=settings.pubsub_socket_dir,
+        redis_url=settings.pubsub_redis_url,
+        redis_channel=settings.pubsub_redis_channel
+    ),
+    heartbeat_interval=settings.pubsub_heartbeat_interval
+)
+
+registry.gauge("websocket_connections", "WebSocket clients connected to this worker", lambda: len(manager.connections))
+registry.gauge(
+    "websocket_queue_depth",
+    "Events waiting in send queues (total and deepest single queue)",
+    lambda: [
+        (("total",), sum(conn.queue.qsize() for conn in manager.connections.values())),
+        (("max",), max((conn.queue.qsize() for conn in manager.connections.values()), default=0))
+    ],
+    ("aggregate",)
+)
+registry.gauge(
+    "websocket_dropped_messages_total", "Events dropped by the drop_oldest policy",
+    lambda: manager.dropped, kind="counter"
+)
+registry.gauge(
+    "websocket_evicted_clients_total", "Clients disconnected for not keeping up",
+    lambda: manager.evicted, kind="counter"
+)
@@ -1,65 +1,199 @@
 """Conversation service for handling conversation operations."""
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import noload
+from sqlalchemy import desc, select, func, update
+from sqlalchemy.exc import IntegrityError
+from typing import Any, Dict, List, Optional
+from pydantic import TypeAdapter
 
 from src.models import Conversation, Channel, Message
-from src.schemas import ConversationCreate, ConversationResponse, MessageResponse
-from src.utils.logger import get_logger
+from src.schemas import ConversationCreate, ConversationResponse, ConversationListItem, MessageResponse
+from src.services.archive_service import ArchiveService
+from src.services.channel_service import invalidate_channel_stats
+from src.services.message_service import MESSAGE_COLUMNS
+from src.utils.logger import SAMPLED, get_logger
+from src.utils.pagination import keyset_filter
 
 logger = get_logger(__name__)
 
+# Listings select plain rows and validate the whole page with one adapter
+CONVERSATION_COLUMNS = [
+    getattr(Conversation, name)
+    for name in ConversationListItem.model_fields
+    if name in Conversation.__table__.columns
+]
+conversation_list_adapter = TypeAdapter(List[ConversationListItem])
+
+class ConversationExistsError(Exception):
+    """The channel already has a conversation with this participant."""
+    
+    def __init__(self, conversation_id: Optional[int]):
+        super().__init__(f"Conversation already exists: {conversation_id}")
+        self.conversation_id = conversation_id
+
 class ConversationService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
     async def get_conversations(
         self,
         channel_id: Optional[int] = None,
         limit: int = 50,
-        offset: int = 0
-    ) -> List[ConversationResponse]:
-        """Get conversations with optional channel filter."""
-        query = self.db.query(Conversation)
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        messages_limit: int = 20
+    ) -> List[ConversationListItem]:
+        """Get conversations with optional channel filter.
+        
+        Each conversation embeds only its last `messages_limit` messages, all
+        of them fetched with one extra query for the whole page.
+        When a cursor is given it replaces the offset: the page starts right
+        after the (updated_at, id) the cursor points to.
+        """
+        query = select(*CONVERSATION_COLUMNS)
         
         if channel_id:
-            query = query.filter(Conversation.channel_id == channel_id)
+            query = query.where(Conversation.channel_id == channel_id)
+        
+        if cursor:
+            query = query.where(keyset_filter(Conversation.updated_at, Conversation.id, cursor))
+        else:
+            query = query.offset(offset)
         
-        conversations = query.order_by(desc(Conversation.updated_at)).offset(offset).limit(limit).all()
+        result = await self.db.execute(
+            query.order_by(desc(Conversation.updated_at), desc(Conversation.id)).limit(limit)
+        )
+        conversations = result.all()
         
-        return [ConversationResponse.from_orm(conv) for conv in conversations]
+        recent = await self._get_recent_messages(
+            [conv.id for conv in conversations],
+            messages_limit
+        )
+        
+        items = []
+        for conv in conversations:
+            messages = recent.get(conv.id, [])
+            items.append({
+                **conv._mapping,
+                "messages": messages,
+                "last_message": messages[-1] if messages else None,
+                "has_unread": conv.unread_count > 0
+            })
+        return conversation_list_adapter.validate_python(items, from_attributes=True)
     
-    async def get_conversation_by_id(self, conversation_id: int) -> Optional[ConversationResponse]:
-        """Get a specific conversation by ID."""
-        conversation = self.db.query(Conversation).filter(Conversation.id == conversation_id).first()
-        if conversation:
-            return ConversationResponse.from_orm(conversation)
-        return None
+    async def _get_recent_messages(
+        self,
+        conversation_ids: List[int],
+        limit: int
+    ) -> Dict[int, List[Any]]:
+        """Last `limit` messages of each conversation, oldest first, in one query.
+        
+        Messages are returned as plain rows with the MessageResponse columns.
+        """
+        if not conversation_ids or limit <= 0:
+            return {}
+        
+        ranked = select(
+            *MESSAGE_COLUMNS,
+            func.row_number().over(
+                partition_by=Message.conversation_id,
+                order_by=(desc(Message.timestamp), desc(Message.id))
+            ).label("position")
+        ).where(Message.conversation_id.in_(conversation_ids)).subquery()
+        
+        result = await self.db.execute(
+            select(*[ranked.c[column.key] for column in MESSAGE_COLUMNS])
+            .where(ranked.c.position <= limit)
+            .order_by(ranked.c.conversation_id, ranked.c.position.desc())
+        )
+        
+        recent: Dict[int, List[Any]] = {}
+        for msg in result.all():
+            recent.setdefault(msg.conversation_id, []).append(msg)
+        return recent
     
     async def create_conversation(self, conversation_data: ConversationCreate) -> ConversationResponse:
         """Create a new conversation."""
-        conversation = Conversation(**conversation_data.dict())
+        # A new conversation has no messages yet; initialise the collection so
+        # serialising it doesn't trigger a lazy load
+        conversation = Conversation(**conversation_data.dict(), messages=[])
         self.db.add(conversation)
-        self.db.commit()
-        self.db.refresh(conversation)
+        try:
+            await self._bump_listing_version(conversation.channel_id)
+            await self.db.commit()
+        except IntegrityError:
+            # uq_conversations_channel_participant: one per participant and channel
+            await self.db.rollback()
+            raise ConversationExistsError(await self.db.scalar(
+                select(Conversation.id).where(
+                    Conversation.channel_id == conversation_data.channel_id,
+                    Conversation.participant_identifier == conversation_data.participant_identifier
+                )
+            ))
+        invalidate_channel_stats()
         
-        logger.info(f"Conversation created: {conversation.id}")
+        logger.info(f"Conversation created: {conversation.id}", extra=SAMPLED)
         return ConversationResponse.from_orm(conversation)
     
+    async def get_listing_version(self, channel_id: Optional[int] = None) -> int:
+        """Version of the conversations a listing draws from (one channel or all).
+        
+        Each channel's conversations_version grows whenever one of its
+        conversations is created or changed, so the sum only grows too. A
+        primary key lookup (a few rows unfiltered): the cheap ETag marker for
+        get_conversations, whatever the number of conversations.
+        """
+        query = select(func.coalesce(func.sum(Channel.conversations_version), 0))
+        if channel_id:
+            query = query.where(Channel.id == channel_id)
+        return int(await self.db.scalar(query))
+    
+    async def _bump_listing_version(self, channel_id: int) -> None:
+        await self.db.execute(
+            update(Channel)
+            .where(Channel.id == channel_id)
+            .values(conversations_version=Channel.conversations_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+    
+    async def get_version(self, conversation_id: int) -> Optional[int]:
+        """Version of one conversation, or None if it does not exist."""
+        return await self.db.scalar(
+            select(Conversation.version).where(Conversation.id == conversation_id)
+        )
+    
     async def get_conversation_with_messages(
         self,
         conversation_id: int,
         limit: int = 50
     ) -> Optional[ConversationResponse]:
-        """Get conversation with its messages."""
-        conversation = self.db.query(Conversation).filter(Conversation.id == conversation_id).first()
+        """Get conversation with its messages.
+        
+        When the hot table holds fewer than `limit` messages the page is
+        completed from messages_archive, so archived history stays readable.
+        """
+        result = await self.db.execute(
+            select(Conversation)
+            .options(noload(Conversation.messages))
+            .where(Conversation.id == conversation_id)
+        )
+        conversation = result.scalars().first()
         if not conversation:
             return None
         
         # Get recent messages
-        messages = self.db.query(Message).filter(
-            Message.conversation_id == conversation_id
-        ).order_by(desc(Message.timestamp)).limit(limit).all()
+        result = await self.db.execute(
+            select(Message).where(
+                Message.conversation_id == conversation_id
+            ).order_by(desc(Message.timestamp)).limit(limit)
+        )
+        messages = result.scalars().all()
+        
+        if len(messages) < limit:
+            archived = await ArchiveService(self.db).get_archived_messages(
+                conversation_id, limit - len(messages)
+            )
+            messages = list(messages) + list(archived)
         
         # Convert to response format
         conv_response = ConversationResponse.from_orm(conversation)
@@ -73,20 +207,24 @@ class ConversationService:
         participant_name: str
     ) -> bool:
         """Update participant name in conversation."""
-        conversation = self.db.query(Conversation).filter(Conversation.id == conversation_id).first()
+        conversation = await self.db.get(Conversation, conversation_id)
         if conversation:
             conversation.participant_name = participant_name
-            self.db.commit()
+            conversation.version = Conversation.version + 1
+            await self._bump_listing_version(conversation.channel_id)
+            await self.db.commit()
             logger.info(f"Conversation {conversation_id} participant name updated")
             return True
         return False
     
     async def deactivate_conversation(self, conversation_id: int) -> bool:
         """Deactivate a conversation."""
-        conversation = self.db.query(Conversation).filter(Conversation.id == conversation_id).first()
+        conversation = await self.db.get(Conversation, conversation_id)
         if conversation:
             conversation.is_active = False
-            self.db.commit()
+            conversation.version = Conversation.version + 1
+            await self._bump_listing_version(conversation.channel_id)
+            await self.db.commit()
             logger.info(f"Conversation {conversation_id} deactivated")
             return True
         return False
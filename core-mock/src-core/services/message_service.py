@@ -1,74 +1,202 @@
 """Message service for handling message operations."""
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, case, desc, or_, select, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import mysql, sqlite
+from typing import List, Optional, Dict, Tuple, Any
+from collections import Counter, defaultdict
 from datetime import datetime
+from pydantic import TypeAdapter
 import json
 
-from src.models import Message, Conversation, Channel
-from src.schemas import MessageCreate, MessageResponse, UnifiedMessage
-from src.utils.logger import get_logger
+from src.config import settings
+from src.models import Message, Conversation
+from src.schemas import MessageCreate, MessageResponse, UnifiedMessage, UnifiedBatchItemResult
+from src.services.channel_registry import channel_registry
+from src.services.channel_service import invalidate_channel_stats
+from src.services.connection_manager import manager, message_topics
+from src.services.search_service import search_index
+from src.services.unread_counter_service import UnreadCounterService
+from src.utils.cache import TTLCache
+from src.utils.pagination import keyset_filter
+from src.utils.timestamps import to_naive_utc
+from src.utils.logger import SAMPLED, get_logger
+from src.utils.metrics import registry
 
 logger = get_logger(__name__)
 
+# List endpoints select these columns as plain rows and validate the whole page
+# at once, instead of loading ORM objects and converting them one by one
+MESSAGE_COLUMNS = [getattr(Message, name) for name in MessageResponse.model_fields]
+message_list_adapter = TypeAdapter(List[MessageResponse])
+
+messages_ingested = registry.counter(
+    "messages_ingested_total", "Inbound messages received from channel services", ("channel", "result")
+)
+
+# (channel_name, participant_identifier) -> conversation id, shared by all requests
+conversation_cache = TTLCache(
+    maxsize=settings.conversation_cache_size,
+    ttl=settings.conversation_cache_ttl
+)
+
+# (channel_name, participant_identifier, external_message_id) -> message id,
+# answers most webhook retries without touching the database
+recent_message_ids = TTLCache(
+    maxsize=settings.message_dedup_cache_size,
+    ttl=settings.message_dedup_cache_ttl
+)
+
+# Distinct first-column values per pair lookup query; SQLite caps the depth
+# of an expression (an OR chain) at 1000
+PAIR_LOOKUP_GROUPS = 500
+
+def _pair_filters(first, second, pairs) -> List[Any]:
+    """WHERE clauses matching (first, second) pairs, one per lookup query.
+    
+    SQLite answers `(a, b) IN ((...), ...)` by scanning the whole unique
+    index; `a = ? AND b IN (...)` per distinct `a` is an index search on
+    every database.
+    """
+    grouped: Dict[Any, List[Any]] = defaultdict(list)
+    for a, b in pairs:
+        grouped[a].append(b)
+    groups = list(grouped.items())
+    return [
+        or_(*[and_(first == a, second.in_(bs)) for a, bs in groups[start:start + PAIR_LOOKUP_GROUPS]])
+        for start in range(0, len(groups), PAIR_LOOKUP_GROUPS)
+    ]
+
 class MessageService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
+        self.counters = UnreadCounterService(db)
     
     async def get_messages(
         self,
         conversation_id: Optional[int] = None,
         channel: Optional[str] = None,
         limit: int = 50,
-        offset: int = 0
+        offset: int = 0,
+        cursor: Optional[str] = None
     ) -> List[MessageResponse]:
-        """Get messages with optional filters."""
-        query = self.db.query(Message)
+        """Get messages with optional filters.
+        
+        When a cursor is given it replaces the offset: the page starts right
+        after the (timestamp, id) the cursor points to.
+        """
+        query = select(*MESSAGE_COLUMNS)
         
         if conversation_id:
-            query = query.filter(Message.conversation_id == conversation_id)
+            query = query.where(Message.conversation_id == conversation_id)
         
         if channel:
-            query = query.join(Conversation).join(Channel).filter(Channel.name == channel)
+            await channel_registry.ensure_loaded(self.db)
+            known = channel_registry.get(channel)
+            if known is None:
+                return []
+            query = query.where(Message.conversation_id.in_(
+                select(Conversation.id).where(Conversation.channel_id == known.id)
+            ))
         
-        messages = query.order_by(desc(Message.timestamp)).offset(offset).limit(limit).all()
+        if cursor:
+            query = query.where(keyset_filter(Message.timestamp, Message.id, cursor))
+        else:
+            query = query.offset(offset)
         
-        return [MessageResponse.from_orm(msg) for msg in messages]
+        result = await self.db.execute(
+            query.order_by(desc(Message.timestamp), desc(Message.id)).limit(limit)
+        )
+        return message_list_adapter.validate_python(result.all(), from_attributes=True)
     
     async def get_message_by_id(self, message_id: int) -> Optional[MessageResponse]:
         """Get a specific message by ID."""
-        message = self.db.query(Message).filter(Message.id == message_id).first()
+        message = await self.db.get(Message, message_id)
         if message:
             return MessageResponse.from_orm(message)
         return None
     
-    async def create_message(self, message_data: MessageCreate) -> MessageResponse:
-        """Create a new message."""
+    async def create_message(
+        self,
+        message_data: MessageCreate,
+        channel: Optional[str] = None
+    ) -> MessageResponse:
+        """Create a new message and push it to subscribed WebSocket clients.
+        
+        `channel` is the channel name when the caller already knows it; it
+        saves a lookup when publishing the event.
+        """
         message = Message(**message_data.dict())
         self.db.add(message)
-        self.db.commit()
-        self.db.refresh(message)
+        await self.counters.adjust(
+            {message.conversation_id: 1 if message.direction == "incoming" else 0},
+            touch=True
+        )
+        await self.db.commit()
+        invalidate_channel_stats()
+        await self.db.refresh(message)
+        search_index.add(message.id, message.conversation_id, message.timestamp, message.content)
+        
+        logger.info(f"Message created: {message.id}", extra=SAMPLED)
+        response = MessageResponse.from_orm(message)
+        await self._publish_created(response, channel)
+        return response
+    
+    async def _publish_created(self, message: MessageResponse, channel: Optional[str]) -> None:
+        """Publish a message.created event to the all/channel/conversation topics.
         
-        logger.info(f"Message created: {message.id}")
-        return MessageResponse.from_orm(message)
+        Called after the message is committed: the event is best effort and a
+        failure is logged, never raised to the request that stored the message.
+        """
+        try:
+            if channel is None:
+                channel_id = await self.db.scalar(
+                    select(Conversation.channel_id).where(Conversation.id == message.conversation_id)
+                )
+                await channel_registry.ensure_loaded(self.db)
+                known = channel_registry.get_by_id(channel_id)
+                channel = known.name if known else None
+            
+            await manager.publish(
+                message_topics(channel, message.conversation_id),
+                {
+                    "type": "message.created",
+                    "channel": channel,
+                    "conversation_id": message.conversation_id,
+                    "message": message.model_dump(mode="json")
+                }
+            )
+        except Exception as e:
+            logger.error(f"Error publishing message {message.id}: {str(e)}")
     
-    async def process_unified_message(self, unified_msg: UnifiedMessage) -> MessageResponse:
-        """Process a unified message from channel services."""
+    async def process_unified_message(self, unified_msg: UnifiedMessage) -> Tuple[int, bool]:
+        """Process a unified message from channel services.
+        
+        Returns (message_id, created). Channel webhooks retry, so a message
+        whose external id is already stored in the conversation is not inserted
+        again: the id of the stored copy is returned with created=False. Recent
+        ids are answered from memory; the rest are caught by the unique key.
+        """
+        dedup_key = (unified_msg.channel, unified_msg.sender, unified_msg.message_id)
+        if unified_msg.message_id:
+            message_id = recent_message_ids.get(dedup_key)
+            if message_id is not None:
+                logger.info(f"Duplicate unified message skipped: {unified_msg.channel} {unified_msg.message_id}", extra=SAMPLED)
+                messages_ingested.inc(unified_msg.channel, "duplicate")
+                return message_id, False
+        
         # Find or create conversation
-        conversation = await self._get_or_create_conversation(
+        conversation_id = await self._get_or_create_conversation_id(
             channel_name=unified_msg.channel,
             participant_identifier=unified_msg.sender
         )
         
         # Parse timestamp
-        try:
-            timestamp = datetime.fromisoformat(unified_msg.timestamp.replace('Z', '+00:00'))
-        except:
-            timestamp = datetime.utcnow()
+        timestamp = self._parse_timestamp(unified_msg.timestamp)
         
         # Create message
         message_data = MessageCreate(
-            conversation_id=conversation.id,
+            conversation_id=conversation_id,
             external_message_id=unified_msg.message_id,
             content=unified_msg.message,
             message_type=unified_msg.message_type,
@@ -78,61 +206,401 @@ class MessageService:
             timestamp=timestamp
         )
         
-        message = await self.create_message(message_data)
+        try:
+            message = await self.create_message(message_data, channel=unified_msg.channel)
+        except IntegrityError:
+            # Another request stored the same message first
+            await self.db.rollback()
+            existing = await self._select_message_ids([(conversation_id, unified_msg.message_id)])
+            if not existing:
+                raise
+            message_id = existing[(conversation_id, unified_msg.message_id)]
+            conversation_cache.set((unified_msg.channel, unified_msg.sender), conversation_id)
+            recent_message_ids.set(dedup_key, message_id)
+            logger.info(f"Duplicate unified message skipped: {unified_msg.channel} {unified_msg.message_id}", extra=SAMPLED)
+            messages_ingested.inc(unified_msg.channel, "duplicate")
+            return message_id, False
+        
+        # Committed together with the message: safe to share now
+        conversation_cache.set((unified_msg.channel, unified_msg.sender), conversation_id)
+        if unified_msg.message_id:
+            recent_message_ids.set(dedup_key, message.id)
+        logger.info(f"Unified message processed: {unified_msg.channel} from {unified_msg.sender}", extra=SAMPLED)
+        messages_ingested.inc(unified_msg.channel, "created")
+        return message.id, True
+    
+    async def process_unified_batch(
+        self,
+        items: List[Any]
+    ) -> List[UnifiedBatchItemResult]:
+        """Process a batch of unified messages in a single transaction.
+        
+        Items may be raw dicts or UnifiedMessage instances. Invalid items and
+        unknown channels are reported per item without aborting the batch.
+        Messages already stored, or repeated within the batch, are reported as
+        "duplicate" with the id of the stored copy.
+        """
+        results: List[Optional[UnifiedBatchItemResult]] = [None] * len(items)
+        valid: List[Tuple[int, UnifiedMessage]] = []
+        item_channels: Dict[int, str] = {}
+        
+        for index, item in enumerate(items):
+            if isinstance(item, UnifiedMessage):
+                msg = item
+            else:
+                try:
+                    msg = UnifiedMessage.model_validate(item)
+                except ValueError as e:
+                    results[index] = UnifiedBatchItemResult(index=index, status="error", error=str(e))
+                    continue
+            
+            item_channels[index] = msg.channel
+            message_id = None
+            if msg.message_id:
+                message_id = recent_message_ids.get((msg.channel, msg.sender, msg.message_id))
+            if message_id is not None:
+                results[index] = UnifiedBatchItemResult(index=index, status="duplicate", message_id=message_id)
+            else:
+                valid.append((index, msg))
+        
+        # Resolve channels from the registry, no query
+        await channel_registry.ensure_loaded(self.db)
+        channel_ids: Dict[str, int] = {
+            channel.name: channel.id for channel in channel_registry.all()
+        }
+        
+        pending: List[Tuple[int, UnifiedMessage]] = []
+        for index, msg in valid:
+            if msg.channel not in channel_ids:
+                results[index] = UnifiedBatchItemResult(
+                    index=index, status="error", error=f"Channel {msg.channel} not found"
+                )
+            else:
+                pending.append((index, msg))
+        
+        if pending:
+            try:
+                conversations = await self._resolve_conversations(
+                    {(msg.channel, msg.sender) for _, msg in pending},
+                    channel_ids
+                )
+                
+                # Messages already stored are looked up with a single query
+                stored = await self._select_message_ids([
+                    (conversations[(msg.channel, msg.sender)], msg.message_id)
+                    for _, msg in pending if msg.message_id
+                ])
+                
+                messages = []
+                repeated = []
+                first_in_batch: Dict[Tuple[int, str], Message] = {}
+                for index, msg in pending:
+                    conversation_id = conversations[(msg.channel, msg.sender)]
+                    key = (conversation_id, msg.message_id)
+                    if msg.message_id and key in stored:
+                        results[index] = UnifiedBatchItemResult(
+                            index=index,
+                            status="duplicate",
+                            message_id=stored[key],
+                            conversation_id=conversation_id
+                        )
+                        recent_message_ids.set((msg.channel, msg.sender, msg.message_id), stored[key])
+                        continue
+                    if msg.message_id and key in first_in_batch:
+                        repeated.append((index, conversation_id, first_in_batch[key]))
+                        continue
+                    
+                    message = Message(
+                        conversation_id=conversation_id,
+                        external_message_id=msg.message_id,
+                        content=msg.message,
+                        message_type=msg.message_type,
+                        direction="incoming",
+                        sender_name=msg.sender_name,
+                        sender_identifier=msg.sender,
+                        timestamp=self._parse_timestamp(msg.timestamp)
+                    )
+                    if msg.message_id:
+                        first_in_batch[key] = message
+                    messages.append((index, msg, conversation_id, message))
+                
+                self.db.add_all([message for _, _, _, message in messages])
+                await self.counters.adjust(
+                    Counter(conversation_id for _, _, conversation_id, _ in messages),
+                    touch=True
+                )
+                await self.db.commit()
+            except Exception as e:
+                await self.db.rollback()
+                logger.error(f"Error processing unified batch: {str(e)}")
+                for index, _ in pending:
+                    results[index] = UnifiedBatchItemResult(index=index, status="error", error=str(e))
+            else:
+                # Everything below runs on committed rows: nothing here may
+                # turn a stored message into an "error" result
+                invalidate_channel_stats()
+                
+                for key, conversation_id in conversations.items():
+                    conversation_cache.set(key, conversation_id)
+                
+                for index, conversation_id, message in repeated:
+                    results[index] = UnifiedBatchItemResult(
+                        index=index,
+                        status="duplicate",
+                        message_id=message.id,
+                        conversation_id=conversation_id
+                    )
+                
+                for index, msg, conversation_id, message in messages:
+                    search_index.add(message.id, conversation_id, message.timestamp, message.content)
+                    if msg.message_id:
+                        recent_message_ids.set((msg.channel, msg.sender, msg.message_id), message.id)
+                    results[index] = UnifiedBatchItemResult(
+                        index=index,
+                        status="success",
+                        message_id=message.id,
+                        conversation_id=conversation_id
+                    )
+                    await self._publish_created(MessageResponse.from_orm(message), msg.channel)
+        
+        for index, channel in item_channels.items():
+            if results[index].status in ("success", "duplicate"):
+                messages_ingested.inc(channel, "created" if results[index].status == "success" else "duplicate")
+        
+        stored_count = sum(1 for result in results if result.status == "success")
+        logger.info(f"Unified batch processed: {stored_count}/{len(items)} messages stored")
+        return results
+    
+    async def _resolve_conversations(
+        self,
+        keys: set,
+        channel_ids: Dict[str, int]
+    ) -> Dict[Tuple[str, str], int]:
+        """Map (channel_name, participant_identifier) pairs to conversation ids.
+        
+        Cached pairs cost no query. The rest are fetched with a single set-based
+        query, and the missing ones are inserted in the current transaction with
+        an insert that ignores rows created concurrently by another request.
+        """
+        resolved: Dict[Tuple[str, str], int] = {}
+        for key in keys:
+            conversation_id = conversation_cache.get(key)
+            if conversation_id is not None:
+                resolved[key] = conversation_id
+        
+        missing = [key for key in keys if key not in resolved]
+        if missing:
+            resolved.update(await self._select_conversation_ids(missing, channel_ids))
+        
+        # Sorted so concurrent batches take the unique index locks in one order
+        missing = sorted(key for key in keys if key not in resolved)
+        if missing:
+            rows = [
+                {
+                    "channel_id": channel_ids[channel],
+                    "external_id": f"{channel}_{sender}",
+                    "participant_identifier": sender
+                }
+                for channel, sender in missing
+            ]
+            if self.db.bind.dialect.name == "mysql":
+                stmt = mysql.insert(Conversation)
+                stmt = stmt.on_duplicate_key_update(
+                    participant_identifier=stmt.inserted.participant_identifier
+                )
+            else:
+                stmt = sqlite.insert(Conversation).on_conflict_do_nothing(
+                    index_elements=["channel_id", "participant_identifier"]
+                )
+            await self.db.execute(stmt, rows)
+            
+            resolved.update(await self._select_conversation_ids(missing, channel_ids))
+            logger.info(f"New conversations created in batch: {len(missing)}")
         
-        logger.info(f"Unified message processed: {unified_msg.channel} from {unified_msg.sender}")
-        return message
+        return resolved
+    
+    async def _select_conversation_ids(
+        self,
+        keys: List[Tuple[str, str]],
+        channel_ids: Dict[str, int]
+    ) -> Dict[Tuple[str, str], int]:
+        """Fetch the ids of existing conversations for the given pairs in one query."""
+        channel_names = {channel_id: name for name, channel_id in channel_ids.items()}
+        conversation_ids: Dict[Tuple[str, str], int] = {}
+        for condition in _pair_filters(
+            Conversation.channel_id,
+            Conversation.participant_identifier,
+            [(channel_ids[channel], sender) for channel, sender in keys]
+        ):
+            result = await self.db.execute(
+                select(Conversation.id, Conversation.channel_id, Conversation.participant_identifier)
+                .where(condition)
+            )
+            conversation_ids.update(
+                ((channel_names[channel_id], participant_identifier), conversation_id)
+                for conversation_id, channel_id, participant_identifier in result.all()
+            )
+        return conversation_ids
     
-    async def _get_or_create_conversation(
+    async def _select_message_ids(
+        self,
+        keys: List[Tuple[int, str]]
+    ) -> Dict[Tuple[int, str], int]:
+        """Fetch the ids of stored messages by (conversation_id, external_message_id)."""
+        message_ids: Dict[Tuple[int, str], int] = {}
+        for condition in _pair_filters(Message.conversation_id, Message.external_message_id, keys):
+            result = await self.db.execute(
+                select(Message.id, Message.conversation_id, Message.external_message_id)
+                .where(condition)
+            )
+            message_ids.update(
+                ((conversation_id, external_message_id), message_id)
+                for message_id, conversation_id, external_message_id in result.all()
+            )
+        return message_ids
+    
+    @staticmethod
+    def _parse_timestamp(value: str) -> datetime:
+        """Parse an ISO timestamp from a channel service (as naive UTC), falling back to now."""
+        try:
+            return to_naive_utc(datetime.fromisoformat(value.replace('Z', '+00:00')))
+        except:
+            return datetime.utcnow()
+    
+    async def _get_or_create_conversation_id(
         self,
         channel_name: str,
         participant_identifier: str
-    ) -> Conversation:
-        """Get or create a conversation for a participant in a channel."""
-        # Get channel
-        channel = self.db.query(Channel).filter(Channel.name == channel_name).first()
-        if not channel:
+    ) -> int:
+        """Get or create a conversation for a participant in a channel.
+        
+        Returns the conversation id. A cache hit costs no query; a miss is a
+        single atomic upsert (the channel id comes from the registry), so
+        concurrent first messages from the same sender end up in the same
+        conversation. The upsert is not committed here, it is committed with
+        the message; callers cache the id (conversation_cache) only after that
+        commit, so no request ever reuses the id of a rolled-back conversation.
+        """
+        key = (channel_name, participant_identifier)
+        conversation_id = conversation_cache.get(key)
+        if conversation_id is not None:
+            return conversation_id
+        
+        await channel_registry.ensure_loaded(self.db)
+        channel = channel_registry.get(channel_name)
+        if channel is None:
             raise ValueError(f"Channel {channel_name} not found")
+        values = {
+            "channel_id": channel.id,
+            "external_id": f"{channel_name}_{participant_identifier}",
+            "participant_identifier": participant_identifier
+        }
         
-        # Try to find existing conversation
-        conversation = self.db.query(Conversation).filter(
-            and_(
-                Conversation.channel_id == channel.id,
-                Conversation.participant_identifier == participant_identifier
-            )
-        ).first()
-        
-        if not conversation:
-            # Create new conversation
-            conversation = Conversation(
-                channel_id=channel.id,
-                external_id=f"{channel_name}_{participant_identifier}",
-                participant_identifier=participant_identifier,
-                participant_name=None  # Will be updated when we have more info
-            )
-            self.db.add(conversation)
-            self.db.commit()
-            self.db.refresh(conversation)
-            
-            logger.info(f"New conversation created: {conversation.id}")
+        if self.db.bind.dialect.name == "mysql":
+            # LAST_INSERT_ID(id) makes lastrowid report the existing row on conflict
+            stmt = mysql.insert(Conversation).values(**values)
+            stmt = stmt.on_duplicate_key_update(id=func.last_insert_id(Conversation.id))
+            result = await self.db.execute(stmt)
+            conversation_id = result.lastrowid or None
+        else:
+            stmt = sqlite.insert(Conversation).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["channel_id", "participant_identifier"],
+                set_={"participant_identifier": stmt.excluded.participant_identifier}
+            ).returning(Conversation.id)
+            result = await self.db.execute(stmt)
+            conversation_id = result.scalar()
         
-        return conversation
+        return conversation_id
     
     async def mark_message_as_read(self, message_id: int) -> bool:
         """Mark a message as read."""
-        message = self.db.query(Message).filter(Message.id == message_id).first()
+        message = await self.db.get(Message, message_id)
         if message:
-            message.is_read = True
-            self.db.commit()
-            logger.info(f"Message {message_id} marked as read")
+            # Conditional update so concurrent calls decrement the counters only once
+            result = await self.db.execute(
+                update(Message)
+                .where(Message.id == message_id, Message.is_read == False)
+                .values(is_read=True)
+            )
+            if result.rowcount:
+                await self.counters.adjust({message.conversation_id: -1 if message.direction == "incoming" else 0})
+            await self.db.commit()
+            invalidate_channel_stats()
+            logger.info(f"Message {message_id} marked as read", extra=SAMPLED)
             return True
         return False
     
-    async def get_unread_messages_count(self, conversation_id: Optional[int] = None) -> int:
-        """Get count of unread messages."""
-        query = self.db.query(Message).filter(Message.is_read == False)
+    async def mark_conversation_as_read(
+        self,
+        conversation_id: int,
+        up_to_message_id: Optional[int] = None
+    ) -> int:
+        """Mark a conversation's messages as read, up to (and including) a message.
+        
+        "Up to" follows the display order: every message whose timestamp is not
+        later than the given message's. Raises ValueError if that message is
+        not part of the conversation.
+        """
+        conditions = [Message.conversation_id == conversation_id]
+        if up_to_message_id is not None:
+            up_to = await self.db.scalar(
+                select(Message.timestamp).where(
+                    Message.id == up_to_message_id,
+                    Message.conversation_id == conversation_id
+                )
+            )
+            if up_to is None:
+                raise ValueError(
+                    f"Message {up_to_message_id} not found in conversation {conversation_id}"
+                )
+            conditions.append(Message.timestamp <= up_to)
         
+        updated = await self._mark_read_where(conditions)
+        logger.info(f"Conversation {conversation_id}: {updated} messages marked as read", extra=SAMPLED)
+        return updated
+    
+    async def mark_messages_as_read(self, message_ids: List[int]) -> int:
+        """Mark a list of messages as read; unknown or already read ids are ignored."""
+        if not message_ids:
+            return 0
+        updated = await self._mark_read_where([Message.id.in_(set(message_ids))])
+        logger.info(f"{updated} of {len(message_ids)} messages marked as read", extra=SAMPLED)
+        return updated
+    
+    async def _mark_read_where(self, conditions: List[Any]) -> int:
+        """Flip every unread message matching `conditions` in one transaction.
+        
+        The unread rows are locked first (FOR UPDATE, a no-op on SQLite) to
+        know which conversations change and how much each unread counter
+        drops, then a single set-based UPDATE with the same conditions marks
+        them read.
+        """
+        unread = (Message.is_read == False)
+        incoming = func.sum(case((Message.direction == "incoming", 1), else_=0))
+        result = await self.db.execute(
+            select(Message.conversation_id, incoming)
+            .where(*conditions, unread)
+            .group_by(Message.conversation_id)
+            .with_for_update()
+        )
+        deltas = {conversation_id: -(count or 0) for conversation_id, count in result.all()}
+        
+        result = await self.db.execute(
+            update(Message)
+            .where(*conditions, unread)
+            .values(is_read=True)
+            .execution_options(synchronize_session=False)
+        )
+        await self.counters.adjust(deltas)
+        await self.db.commit()
+        if any(deltas.values()):
+            invalidate_channel_stats()
+        return result.rowcount
+    
+    async def get_unread_messages_count(self, conversation_id: Optional[int] = None) -> int:
+        """Get count of unread incoming messages from the materialized counters."""
         if conversation_id:
-            query = query.filter(Message.conversation_id == conversation_id)
+            return await self.counters.get_conversation_unread(conversation_id)
         
-        return query.count()
+        return await self.counters.get_total_unread()
@@ -0,0 +1,290 @@
+"""Outbox service: persistent queue and background workers for outgoing messages."""
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, select, update
+from typing import List, Optional, Tuple
+
+from src.config import settings
+from src.models import OutboxMessage
+from src.schemas import MessageCreate, OutboxStatusResponse, SendMessageRequest
+from src.services.channel_client import RETRYABLE_ERRORS, ChannelUnavailableError, channel_clients
+from src.services.connection_manager import manager, message_topics
+from src.services.message_service import MessageService, conversation_cache
+from src.utils.logger import SAMPLED, get_logger
+
+logger = get_logger(__name__)
+
+def build_channel_payload(channel: str, to: str, message: str, message_type: str, media_url: Optional[str]) -> dict:
+    """Request body for POST /send/<channel> on the channel service."""
+    # Formatear número para WhatsApp
+    formatted_to = to
+    if channel == "whatsapp":
+        if to.startswith("+"):
+            # Remover el +
+            number = to[1:]
+            
+            # Para números argentinos (+549...), remover solo el 9 del código de área
+            if number.startswith("549"):
+                formatted_to = "54" + number[3:]  # Remover "9" -> queda "54" + número local
+            else:
+                formatted_to = number  # Para otros países, solo remover el +
+        else:
+            formatted_to = to
+    
+    payload = {
+        "to": formatted_to,
+        "message": message,
+        "message_type": message_type
+    }
+    
+    if media_url:
+        payload["media_url"] = media_url
+    return payload
+
+class OutboxService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def enqueue(self, request: SendMessageRequest) -> OutboxMessage:
+        """Persist an outgoing message; workers deliver it after commit."""
+        item = OutboxMessage(
+            channel=request.channel,
+            recipient=request.to,
+            content=request.message,
+            message_type=request.message_type,
+            media_url=request.media_url,
+            status="pending"
+        )
+        self.db.add(item)
+        await self.db.commit()
+        
+        logger.info(f"Outgoing message queued: {item.id} ({request.channel})", extra=SAMPLED)
+        outbox_dispatcher.notify()
+        return item
+    
+    async def get_status(self, tracking_id: int) -> Optional[OutboxStatusResponse]:
+        item = await self.db.get(OutboxMessage, tracking_id)
+        if not item:
+            return None
+        return OutboxStatusResponse(
+            tracking_id=item.id,
+            channel=item.channel,
+            to=item.recipient,
+            status=item.status,
+            attempts=item.attempts,
+            error=item.last_error,
+            external_message_id=item.external_message_id,
+            message_id=item.message_id,
+            created_at=item.created_at,
+            updated_at=item.updated_at
+        )
+    
+    async def claim_due(self, limit: int) -> List[int]:
+        """Lease up to `limit` due messages to this process.
+        
+        A message is due when pending and its next attempt time has passed, or
+        when it has been "sending" longer than the lease (its worker died).
+        Each claim is a conditional UPDATE, so two processes never share one.
+        """
+        now = datetime.utcnow()
+        expired = now - timedelta(seconds=settings.outbox_lease_timeout)
+        due = or_(
+            and_(OutboxMessage.status == "pending", OutboxMessage.next_attempt_at <= now),
+            and_(OutboxMessage.status == "sending", OutboxMessage.locked_at < expired)
+        )
+        
+        candidates = (await self.db.execute(
+            select(OutboxMessage.id).where(due).order_by(OutboxMessage.id).limit(limit)
+        )).scalars().all()
+        
+        claimed = []
+        for outbox_id in candidates:
+            result = await self.db.execute(
+                update(OutboxMessage)
+                .where(and_(OutboxMessage.id == outbox_id, due))
+                .values(status="sending", locked_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                claimed.append(outbox_id)
+        await self.db.commit()
+        return claimed
+    
+    async def deliver(self, outbox_id: int) -> None:
+        """Send a claimed message to its channel service and record the outcome.
+        
+        Only failures where the channel service surely did not process the
+        request are retried; when the outcome is unknown (read timeout, broken
+        connection) the message is marked failed rather than risk sending it
+        twice.
+        """
+        item = await self.db.get(OutboxMessage, outbox_id)
+        if not item or item.status != "sending":
+            return
+        
+        retryable = True
+        result = {}
+        try:
+            client = channel_clients.get(item.channel)
+            if client is None:
+                raise ValueError(f"Unsupported channel: {item.channel}")
+            status_code, result = await client.send(build_channel_payload(
+                item.channel, item.recipient, item.content, item.message_type, item.media_url
+            ))
+            success = status_code == 200 and result.get("success")
+            error = None if success else result.get("error", "Unknown error")
+            retryable = status_code >= 500
+        except (ChannelUnavailableError, *RETRYABLE_ERRORS) as e:
+            # Never reached the channel service
+            success, error = False, str(e) or type(e).__name__
+        except ValueError as e:
+            success, error, retryable = False, str(e), False
+        except Exception as e:
+            # The request may have been processed before the error
+            success, error, retryable = False, f"Delivery outcome unknown ({type(e).__name__}): {e}", False
+        
+        item.attempts += 1
+        item.locked_at = None
+        conversation_id = None
+        
+        if success:
+            item.status = "sent"
+            item.last_error = None
+            item.external_message_id = result.get("message_id")
+            # Committed before anything else can fail, so the lease never
+            # expires on a message that was already sent
+            await self.db.commit()
+            
+            try:
+                conversation_id, item.message_id = await self._record_sent(item)
+                await self.db.commit()
+            except Exception as e:
+                await self.db.rollback()
+                await self.db.refresh(item)
+                logger.error(f"Message {item.id} sent to {item.channel} but not stored: {str(e)}")
+        else:
+            item.last_error = error
+            if retryable and item.attempts < settings.outbox_max_attempts:
+                item.status = "pending"
+                item.next_attempt_at = datetime.utcnow() + timedelta(
+                    seconds=settings.outbox_retry_delay * 2 ** (item.attempts - 1)
+                )
+            else:
+                item.status = "failed"
+            logger.error(f"Error sending message {item.id} to {item.channel}: {error}")
+            await self.db.commit()
+        
+        await self._publish_status(item, conversation_id)
+    
+    async def _record_sent(self, item: OutboxMessage) -> Tuple[int, int]:
+        """Store a sent message in its conversation; returns (conversation_id, message_id)."""
+        service = MessageService(self.db)
+        conversation_id = await service._get_or_create_conversation_id(
+            channel_name=item.channel,
+            participant_identifier=item.recipient
+        )
+        message = await service.create_message(
+            MessageCreate(
+                conversation_id=conversation_id,
+                external_message_id=item.external_message_id,
+                content=item.content,
+                message_type=item.message_type,
+                direction="outgoing",
+                sender_identifier="system",  # Or current user
+                timestamp=datetime.utcnow()
+            ),
+            channel=item.channel
+        )
+        conversation_cache.set((item.channel, item.recipient), conversation_id)
+        return conversation_id, message.id
+    
+    async def _publish_status(self, item: OutboxMessage, conversation_id: Optional[int]) -> None:
+        topics = ["all", f"channel:{item.channel}"]
+        if conversation_id:
+            topics = message_topics(item.channel, conversation_id)
+        await manager.publish(topics, {
+            "type": "outbox.status",
+            "tracking_id": item.id,
+            "channel": item.channel,
+            "status": item.status,
+            "attempts": item.attempts,
+            "error": item.last_error,
+            "message_id": item.message_id
+        })
+
+class OutboxDispatcher:
+    """Pool of asyncio workers draining the outbox table.
+    
+    A poller leases due messages and hands their ids to the workers; it runs
+    every `poll_interval` seconds or right away when notify() is called.
+    Per-channel concurrency is bounded by each channel client's limit.
+    """
+    
+    def __init__(self, workers: int, poll_interval: float):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._queue: "asyncio.Queue[int]" = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        # Deliveries a worker has taken off the queue and not finished yet
+        self._in_flight = 0
+    
+    def notify(self) -> None:
+        """Wake the poller up, e.g. right after enqueueing a message."""
+        self._wakeup.set()
+    
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._in_flight = 0
+        self._tasks = [asyncio.create_task(self._poll_loop())]
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Outbox dispatcher started with {self.workers} workers")
+    
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+    
+    async def _poll_loop(self) -> None:
+        from src.database import SessionLocal
+        
+        while True:
+            try:
+                # Only lease what idle workers can pick up now: queued ids and
+                # deliveries in progress both hold a worker
+                free = self.workers - self._queue.qsize() - self._in_flight
+                if free > 0:
+                    async with SessionLocal() as db:
+                        for outbox_id in await OutboxService(db).claim_due(free):
+                            self._queue.put_nowait(outbox_id)
+            except Exception as e:
+                logger.error(f"Error polling outbox: {str(e)}")
+            
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+    
+    async def _worker(self) -> None:
+        from src.database import SessionLocal
+        
+        while True:
+            outbox_id = await self._queue.get()
+            self._in_flight += 1
+            try:
+                async with SessionLocal() as db:
+                    await OutboxService(db).deliver(outbox_id)
+            except Exception as e:
+                logger.error(f"Error delivering outbox message {outbox_id}: {str(e)}")
+            finally:
+                # A worker just freed up, look for more work
+                self._in_flight -= 1
+                self.notify()
+
+outbox_dispatcher = OutboxDispatcher(
+    workers=settings.outbox_workers,
+    poll_interval=settings.outbox_poll_interval
+)
@@ -0,0 +1,206 @@
+"""Pub/sub backends that carry WebSocket events between uvicorn workers.
+
+The ConnectionManager of every worker hands outgoing events to a backend,
+and the backend delivers each event exactly once to every worker (including
+the publishing one), which then fans it out to its own local clients.
+
+- "memory": single process, events are delivered in place.
+- "unix": workers on the same host; every worker binds a Unix datagram
+  socket in a shared directory and sends each event to all of them.
+- "redis": workers on any host, over Redis PUBLISH/SUBSCRIBE (needs the
+  optional `redis` package).
+
+Publishing is best effort: events are sent after the data they describe is
+committed, so a transport failure is logged and counted, never raised.
+"""
+import asyncio
+import json
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from src.utils.logger import get_logger
+from src.utils.metrics import registry
+
+logger = get_logger(__name__)
+
+publish_errors = registry.counter(
+    "pubsub_publish_errors_total", "Events that could not be sent to other workers", ("backend",)
+)
+
+Handler = Callable[[dict], Awaitable[None]]
+
+class PubSubBackend:
+    """Base backend: delivers events to this process only."""
+    
+    name = "memory"
+    
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+        self._handler: Optional[Handler] = None
+    
+    async def start(self, handler: Handler) -> None:
+        self._handler = handler
+    
+    async def stop(self) -> None:
+        self._handler = None
+    
+    async def publish(self, envelope: dict) -> None:
+        await self._deliver(dict(envelope, origin=self.worker_id))
+    
+    async def _deliver(self, envelope: dict) -> None:
+        if self._handler is None:
+            return
+        try:
+            await self._handler(envelope)
+        except Exception as e:
+            logger.error(f"Error handling pub/sub event: {str(e)}")
+
+class InProcessBackend(PubSubBackend):
+    """Single-worker deployments: no IPC at all."""
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, backend: "UnixSocketBackend"):
+        self.backend = backend
+    
+    def datagram_received(self, data: bytes, addr) -> None:
+        try:
+            envelope = json.loads(data)
+        except ValueError:
+            return
+        asyncio.create_task(self.backend._deliver(envelope))
+
+class UnixSocketBackend(PubSubBackend):
+    """Workers on one host exchanging events over Unix datagram sockets.
+    
+    Each worker binds `<socket_dir>/<worker_id>.sock`; publishing delivers
+    locally and sends one datagram to every other socket in the directory.
+    Sockets of dead workers refuse the datagram and are removed.
+    """
+    
+    name = "unix"
+    
+    def __init__(self, socket_dir: str):
+        super().__init__()
+        self.socket_dir = socket_dir
+        self.path = os.path.join(socket_dir, f"{self.worker_id}.sock")
+        self.dropped = 0
+        self._sock: Optional[socket.socket] = None
+        self._transport = None
+    
+    async def start(self, handler: Handler) -> None:
+        await super().start(handler)
+        os.makedirs(self.socket_dir, exist_ok=True)
+        
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self.path)
+        self._sock.setblocking(False)
+        self._transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: _DatagramProtocol(self), sock=self._sock
+        )
+        logger.info(f"Unix pub/sub backend listening on {self.path}")
+    
+    async def stop(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        await super().stop()
+    
+    async def publish(self, envelope: dict) -> None:
+        envelope = dict(envelope, origin=self.worker_id)
+        try:
+            self._send_to_peers(json.dumps(envelope).encode("utf-8"))
+        except Exception as e:
+            publish_errors.inc(self.name)
+            logger.error(f"Error publishing pub/sub event: {str(e)}")
+        
+        # Local clients get the event even if the other workers could not
+        await self._deliver(envelope)
+    
+    def _send_to_peers(self, data: bytes) -> None:
+        if self._sock is None:
+            raise RuntimeError("Unix pub/sub backend is not started")
+        
+        for name in os.listdir(self.socket_dir):
+            peer = os.path.join(self.socket_dir, name)
+            if not name.endswith(".sock") or peer == self.path:
+                continue
+            try:
+                self._sock.sendto(data, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Worker is gone, clean up its socket
+                try:
+                    os.unlink(peer)
+                except FileNotFoundError:
+                    pass
+            except (BlockingIOError, OSError) as e:
+                self.dropped += 1
+                publish_errors.inc(self.name)
+                logger.warning(f"Pub/sub event to {name} dropped: {str(e)}")
+
+class RedisBackend(PubSubBackend):
+    """Workers on any host exchanging events over a Redis channel."""
+    
+    name = "redis"
+    
+    def __init__(self, url: str, channel: str):
+        super().__init__()
+        self.url = url
+        self.channel = channel
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+    
+    async def start(self, handler: Handler) -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("PUBSUB_BACKEND=redis requires the 'redis' package") from e
+        
+        await super().start(handler)
+        self._redis = redis.from_url(self.url)
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self.channel)
+        self._listener = asyncio.create_task(self._listen(pubsub))
+        logger.info(f"Redis pub/sub backend subscribed to {self.channel}")
+    
+    async def _listen(self, pubsub) -> None:
+        async for item in pubsub.listen():
+            if item.get("type") != "message":
+                continue
+            try:
+                envelope = json.loads(item["data"])
+            except ValueError:
+                continue
+            await self._deliver(envelope)
+    
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+        if self._redis is not None:
+            await self._redis.close()
+        await super().stop()
+    
+    async def publish(self, envelope: dict) -> None:
+        # Redis echoes the event back to this worker's subscription too
+        envelope = dict(envelope, origin=self.worker_id)
+        try:
+            if self._redis is None:
+                raise RuntimeError("Redis pub/sub backend is not started")
+            await self._redis.publish(self.channel, json.dumps(envelope))
+        except Exception as e:
+            publish_errors.inc(self.name)
+            logger.error(f"Error publishing pub/sub event to Redis: {str(e)}")
+
+def create_backend(name: str, socket_dir: str, redis_url: str, redis_channel: str) -> PubSubBackend:
+    """Build the backend selected by PUBSUB_BACKEND."""
+    if name == "unix":
+        return UnixSocketBackend(socket_dir)
+    if name == "redis":
+        return RedisBackend(redis_url, redis_channel)
+    if name != "memory":
+        raise ValueError(f"Unknown pub/sub backend: {name}")
+    return InProcessBackend()
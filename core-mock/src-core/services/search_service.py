@@ -0,0 +1,268 @@
+"""Full-text search over message content."""
+import asyncio
+import heapq
+import math
+import re
+import unicodedata
+from array import array
+from collections import Counter, defaultdict
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, desc, or_, select
+from sqlalchemy.dialects import mysql
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.models import Message, Conversation
+from src.schemas import MessageResponse, MessageSearchResult
+from src.services.channel_registry import channel_registry
+from src.utils.pagination import decode_cursor
+from src.utils.timestamps import to_naive_utc
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, accent-insensitive word tokens (like MySQL's *_ci collations)."""
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(char for char in normalized if not unicodedata.combining(char))
+    return [token for token in TOKEN_PATTERN.findall(stripped) if len(token) > 1]
+
+class InvertedIndex:
+    """In-process inverted index ranked with BM25.
+    
+    Used when the database has no full-text support (SQLite deployments and
+    tests). Postings are compact arrays appended to as messages are created;
+    removed messages are dropped from `docs` and skipped lazily. Each worker
+    process keeps its own copy, built from the database on first use.
+    """
+    
+    K1 = 1.2
+    B = 0.75
+    
+    def __init__(self):
+        self.postings: Dict[str, Tuple[array, array]] = defaultdict(lambda: (array("I"), array("H")))
+        # message id -> (conversation_id, timestamp, token count)
+        self.docs: Dict[int, Tuple[int, datetime, int]] = {}
+        self.total_length = 0
+        self.started = False
+        self.ready = False
+        self._lock = asyncio.Lock()
+    
+    def add(self, message_id: int, conversation_id: int, timestamp: datetime, content: str) -> None:
+        """Index a message. No-op until the index has been started."""
+        if not self.started or message_id in self.docs:
+            return
+        
+        tokens = Counter(tokenize(content))
+        length = sum(tokens.values())
+        self.docs[message_id] = (conversation_id, timestamp, length)
+        self.total_length += length
+        for token, frequency in tokens.items():
+            ids, frequencies = self.postings[token]
+            ids.append(message_id)
+            frequencies.append(min(frequency, 65535))
+    
+    def remove(self, message_ids: Iterable[int]) -> None:
+        """Forget deleted messages; their postings are skipped from now on."""
+        for message_id in message_ids:
+            doc = self.docs.pop(message_id, None)
+            if doc:
+                self.total_length -= doc[2]
+    
+    async def ensure_built(self, chunk_size: int = 10000) -> None:
+        """Load every stored message the first time the index is needed.
+        
+        The build reads from the primary with a session of its own: search
+        requests run on a replica, and a lagging replica would leave recent
+        messages out of the index for the life of the process. Messages
+        created while the build streams are indexed by `add` right away; the
+        build skips them when it reaches their rows.
+        """
+        from src.database import SessionLocal
+        
+        if self.ready:
+            return
+        async with self._lock:
+            if self.ready:
+                return
+            
+            self.started = True
+            async with SessionLocal() as db:
+                result = await db.stream(
+                    select(Message.id, Message.conversation_id, Message.timestamp, Message.content)
+                    .execution_options(yield_per=chunk_size)
+                )
+                async for message_id, conversation_id, timestamp, content in result:
+                    self.add(message_id, conversation_id, timestamp, content)
+            
+            self.ready = True
+            logger.info(f"Search index built: {len(self.docs)} messages, {len(self.postings)} terms")
+    
+    def search(
+        self,
+        query: str,
+        conversation_ids: Optional[Set[int]] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        after: Optional[Tuple[float, int]] = None,
+        limit: int = 20
+    ) -> List[Tuple[float, int]]:
+        """Return up to `limit` (score, message_id) pairs, best first.
+        
+        `after` is the (score, id) of the last result of the previous page.
+        """
+        docs = self.docs
+        if not docs:
+            return []
+        
+        doc_count = len(docs)
+        average_length = self.total_length / doc_count or 1
+        scores: Dict[int, float] = defaultdict(float)
+        
+        for token in set(tokenize(query)):
+            if token not in self.postings:
+                continue
+            ids, frequencies = self.postings[token]
+            idf = math.log(1 + (doc_count - len(ids) + 0.5) / (len(ids) + 0.5))
+            
+            for message_id, frequency in zip(ids, frequencies):
+                doc = docs.get(message_id)
+                if doc is None:
+                    continue
+                conversation_id, timestamp, length = doc
+                if conversation_ids is not None and conversation_id not in conversation_ids:
+                    continue
+                if (date_from and timestamp < date_from) or (date_to and timestamp > date_to):
+                    continue
+                norm = self.K1 * (1 - self.B + self.B * length / average_length)
+                scores[message_id] += idf * frequency * (self.K1 + 1) / (frequency + norm)
+        
+        candidates = ((score, message_id) for message_id, score in scores.items())
+        if after:
+            after_score, after_id = after
+            candidates = (
+                (score, message_id) for score, message_id in candidates
+                if score < after_score or (score == after_score and message_id < after_id)
+            )
+        return heapq.nlargest(limit, candidates)
+
+# Fallback index shared by all requests of this process
+search_index = InvertedIndex()
+
+class SearchService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def search_messages(
+        self,
+        query: str,
+        channel: Optional[str] = None,
+        conversation_id: Optional[int] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> List[MessageSearchResult]:
+        """Search messages by content, most relevant first.
+        
+        MySQL uses the FULLTEXT index on messages.content (natural language
+        mode); other databases use the in-process inverted index. Pages
+        continue after the (score, id) the cursor points to.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        if after and not isinstance(after[0], float):
+            raise ValueError(f"Invalid cursor: {cursor}")
+        # Stored timestamps are naive UTC; comparing them with aware ones raises
+        date_from, date_to = to_naive_utc(date_from), to_naive_utc(date_to)
+        
+        if self.db.bind.dialect.name == "mysql":
+            return await self._search_fulltext(query, channel, conversation_id, date_from, date_to, limit, after)
+        return await self._search_index(query, channel, conversation_id, date_from, date_to, limit, after)
+    
+    async def _search_fulltext(
+        self,
+        query: str,
+        channel: Optional[str],
+        conversation_id: Optional[int],
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        limit: int,
+        after: Optional[Tuple[float, int]]
+    ) -> List[MessageSearchResult]:
+        relevance = mysql.match(Message.content, against=query).in_natural_language_mode()
+        stmt = select(Message, relevance.label("score")).where(relevance)
+        
+        if channel:
+            await channel_registry.ensure_loaded(self.db)
+            known = channel_registry.get(channel)
+            if known is None:
+                return []
+            stmt = stmt.join(Conversation).where(Conversation.channel_id == known.id)
+        if conversation_id:
+            stmt = stmt.where(Message.conversation_id == conversation_id)
+        if date_from:
+            stmt = stmt.where(Message.timestamp >= date_from)
+        if date_to:
+            stmt = stmt.where(Message.timestamp <= date_to)
+        if after:
+            after_score, after_id = after
+            stmt = stmt.where(or_(
+                relevance < after_score,
+                and_(relevance == after_score, Message.id < after_id)
+            ))
+        
+        result = await self.db.execute(
+            stmt.order_by(desc("score"), desc(Message.id)).limit(limit)
+        )
+        return [self._to_result(message, score) for message, score in result.all()]
+    
+    async def _search_index(
+        self,
+        query: str,
+        channel: Optional[str],
+        conversation_id: Optional[int],
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        limit: int,
+        after: Optional[Tuple[float, int]]
+    ) -> List[MessageSearchResult]:
+        await search_index.ensure_built()
+        
+        conversation_ids = None
+        if channel:
+            await channel_registry.ensure_loaded(self.db)
+            known = channel_registry.get(channel)
+            if known is None:
+                return []
+            result = await self.db.execute(
+                select(Conversation.id).where(Conversation.channel_id == known.id)
+            )
+            conversation_ids = set(result.scalars().all())
+        if conversation_id:
+            conversation_ids = {conversation_id} if conversation_ids is None else conversation_ids & {conversation_id}
+        
+        # Hits can be missing from this session: archived by another worker,
+        # or not yet on the replica. Skip them and keep reading hits so the
+        # page stays full and the cursor still points past everything returned.
+        results: List[MessageSearchResult] = []
+        while len(results) < limit:
+            hits = search_index.search(query, conversation_ids, date_from, date_to, after, limit - len(results))
+            if not hits:
+                break
+            
+            result = await self.db.execute(
+                select(Message).where(Message.id.in_([message_id for _, message_id in hits]))
+            )
+            messages = {message.id: message for message in result.scalars().all()}
+            results += [
+                self._to_result(messages[message_id], score)
+                for score, message_id in hits if message_id in messages
+            ]
+            after = hits[-1]
+        return results
+    
+    @staticmethod
+    def _to_result(message: Message, score: float) -> MessageSearchResult:
+        return MessageSearchResult(**MessageResponse.from_orm(message).model_dump(), score=score)
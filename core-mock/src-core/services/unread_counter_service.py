@@ -0,0 +1,157 @@
+"""Unread counter service: materialized unread counts per conversation and channel."""
+import asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, bindparam, func, select
+from sqlalchemy.sql.expression import Update
+from typing import Dict, List
+
+from src.models import Channel, Conversation, Message
+from src.services.channel_service import invalidate_channel_stats
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+conversations_table = Conversation.__table__
+channels_table = Channel.__table__
+
+# Executemany statements; bind names must not clash with column names.
+# New messages move the conversation up the listing (updated_at onupdate);
+# every other adjustment (reads, archiving) keeps its updated_at
+_touch_conversation = conversations_table.update().where(
+    conversations_table.c.id == bindparam("b_conversation_id")
+).values(
+    unread_count=conversations_table.c.unread_count + bindparam("b_delta"),
+    version=conversations_table.c.version + 1
+)
+
+_adjust_conversation = _touch_conversation.values(updated_at=conversations_table.c.updated_at)
+
+# The channel's conversations_version moves with every conversation change
+_adjust_channel = channels_table.update().where(
+    channels_table.c.id == bindparam("b_channel_id")
+).values(
+    unread_count=channels_table.c.unread_count + bindparam("b_delta"),
+    conversations_version=channels_table.c.conversations_version + 1
+)
+
+def _conversation_unread():
+    return select(func.count(Message.id)).where(
+        and_(
+            Message.conversation_id == conversations_table.c.id,
+            Message.direction == "incoming",
+            Message.is_read == False
+        )
+    ).scalar_subquery()
+
+def rebuild_statements() -> List[Update]:
+    """Statements that recompute every counter from the messages table.
+    
+    Conversations first, then channels from the conversation counters. Only
+    drifted conversations are written, and their updated_at (the listing
+    order) is left alone.
+    """
+    conversation_unread = _conversation_unread()
+    
+    channel_unread = select(
+        func.coalesce(func.sum(conversations_table.c.unread_count), 0)
+    ).where(
+        conversations_table.c.channel_id == channels_table.c.id
+    ).scalar_subquery()
+    
+    return [
+        conversations_table.update()
+        .where(conversations_table.c.unread_count != conversation_unread)
+        .values(unread_count=conversation_unread, updated_at=conversations_table.c.updated_at),
+        channels_table.update().values(unread_count=channel_unread),
+    ]
+
+class UnreadCounterService:
+    """Keeps conversations.unread_count and channels.unread_count in sync.
+    
+    Only incoming messages count as unread. Adjustments run in the caller's
+    transaction so counters commit (or roll back) together with the messages.
+    """
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def adjust(self, deltas: Dict[int, int], touch: bool = False) -> None:
+        """Add `delta` to the unread counters of each conversation id and its channel.
+        
+        Every conversation listed also gets its version bumped (and its
+        channel's conversations_version), so callers that changed a
+        conversation's messages without touching its unread count pass a
+        delta of 0. `touch` also refreshes updated_at (the listing order and
+        cursor key); only new messages pass it.
+        
+        Rows are updated in id order, conversations first and then one
+        update per channel, so concurrent transactions lock them in the same
+        order (no InnoDB deadlocks) and the hot channel rows are written once.
+        """
+        if not deltas:
+            return
+        
+        params = [
+            {"b_conversation_id": conversation_id, "b_delta": delta}
+            for conversation_id, delta in sorted(deltas.items())
+        ]
+        await self.db.execute(_touch_conversation if touch else _adjust_conversation, params)
+        
+        result = await self.db.execute(
+            select(conversations_table.c.id, conversations_table.c.channel_id)
+            .where(conversations_table.c.id.in_(deltas))
+        )
+        channel_deltas: Dict[int, int] = {}
+        for conversation_id, channel_id in result.all():
+            channel_deltas[channel_id] = channel_deltas.get(channel_id, 0) + deltas[conversation_id]
+        await self.db.execute(_adjust_channel, [
+            {"b_channel_id": channel_id, "b_delta": delta}
+            for channel_id, delta in sorted(channel_deltas.items())
+        ])
+    
+    async def get_conversation_unread(self, conversation_id: int) -> int:
+        """Unread count of a single conversation."""
+        count = await self.db.scalar(
+            select(Conversation.unread_count).where(Conversation.id == conversation_id)
+        )
+        return count or 0
+    
+    async def get_total_unread(self) -> int:
+        """Unread count across every channel."""
+        count = await self.db.scalar(select(func.sum(Channel.unread_count)))
+        return count or 0
+    
+    async def rebuild(self) -> None:
+        """Recompute every counter from the source tables."""
+        # Corrected conversations change representation; bump them (and their
+        # channels' listing versions) first
+        await self.db.execute(
+            channels_table.update()
+            .where(channels_table.c.id.in_(
+                select(conversations_table.c.channel_id)
+                .where(conversations_table.c.unread_count != _conversation_unread())
+            ))
+            .values(conversations_version=channels_table.c.conversations_version + 1)
+        )
+        await self.db.execute(
+            conversations_table.update()
+            .where(conversations_table.c.unread_count != _conversation_unread())
+            .values(version=conversations_table.c.version + 1, updated_at=conversations_table.c.updated_at)
+        )
+        for stmt in rebuild_statements():
+            await self.db.execute(stmt)
+        await self.db.commit()
+        invalidate_channel_stats()
+        logger.info("Unread counters rebuilt")
+
+async def run_unread_reconciliation(interval: int) -> None:
+    """Background job that periodically rebuilds the unread counters."""
+    from src.database import SessionLocal
+    
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with SessionLocal() as db:
+                await UnreadCounterService(db).rebuild()
+        except Exception as e:
+            logger.error(f"Error rebuilding unread counters: {str(e)}")
@@ -0,0 +1,45 @@
+"""ETags and conditional GET (If-None-Match -> 304 Not Modified).
+
+Two ways to get an ETag:
+- `make_etag(*parts)` from cheap version markers read before the real query
+  (conversation versions), so an unchanged poll skips the query entirely;
+- `etag_response(...)` hashes an already rendered JSON body, for small
+  responses (channels) where the saving is the transfer, not the query.
+"""
+import hashlib
+from typing import Any, Dict, Optional
+
+import orjson
+from fastapi import Request, Response
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag for a representation identified by `parts`."""
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match covers `etag` (weak comparison, RFC 9110)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or any(
+        candidate.removeprefix("W/") == etag for candidate in candidates
+    )
+
+def cache_headers(etag: str, cache_control: Optional[str] = None) -> Dict[str, str]:
+    headers = {"ETag": etag}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return headers
+
+def not_modified(etag: str, cache_control: Optional[str] = None) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag, cache_control))
+
+def etag_response(request: Request, content: Any, cache_control: Optional[str] = None) -> Response:
+    """JSON response (orjson) with a content-hash ETag; 304 if the client has it."""
+    body = orjson.dumps(content)
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    return Response(body, media_type="application/json", headers=cache_headers(etag, cache_control))
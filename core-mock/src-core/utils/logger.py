@@ -1,40 +1,108 @@
-"""Logger configuration."""
+"""Logger configuration.
+
+Every logger hands its records to a `QueueHandler`; a single `QueueListener`
+thread does the formatting and the console/file I/O, so request handlers
+never block on logging.
+"""
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
 from datetime import datetime
+from typing import Optional
 
-def get_logger(name: str) -> logging.Logger:
-    """Get logger with console and file handlers."""
-    logger = logging.getLogger(name)
+from src.config import settings
+
+# Pass as `extra=` on per-message logs so they are kept at LOG_SAMPLE_RATE
+SAMPLED = {"sampled": True}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
     
-    if logger.handlers:
-        return logger
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+class SamplingFilter(logging.Filter):
+    """Drop a share of the records flagged with SAMPLED."""
     
-    logger.setLevel(logging.INFO)
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
     
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1 or not getattr(record, "sampled", False):
+            return True
+        return random.random() < self.rate
+
+def _file_handler() -> logging.Handler:
+    if not os.path.exists(settings.log_dir):
+        os.makedirs(settings.log_dir)
+    log_file = os.path.join(settings.log_dir, "core_service.log")
     
-    # File handler
-    log_dir = "logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+    if settings.log_rotation == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            log_file,
+            when=settings.log_rotate_when,
+            backupCount=settings.log_backup_count,
+            encoding="utf-8"
+        )
+    return logging.handlers.RotatingFileHandler(
+        log_file,
+        maxBytes=settings.log_max_bytes,
+        backupCount=settings.log_backup_count,
+        encoding="utf-8"
+    )
+
+def _configure() -> None:
+    """Install the queue handler on the root logger and start the listener."""
+    global _listener
     
-    today = datetime.now().strftime("%Y%m%d")
-    log_file = f"{log_dir}/core_service_{today}.log"
+    if settings.log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setLevel(logging.DEBUG)
+    console_handler = logging.StreamHandler()
+    file_handler = _file_handler()
+    for handler in (console_handler, file_handler):
+        handler.setFormatter(formatter)
     
-    # Formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    console_handler.setFormatter(formatter)
-    file_handler.setFormatter(formatter)
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(settings.log_sample_rate))
     
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    root = logging.getLogger()
+    root.addHandler(queue_handler)
+    logging.getLogger("src").setLevel(settings.log_level.upper())
+    if settings.db_echo:
+        logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+    for name, level in settings.log_levels.items():
+        logging.getLogger(name).setLevel(level.upper())
     
-    return logger
+    _listener = logging.handlers.QueueListener(log_queue, console_handler, file_handler)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread (runs at exit)."""
+    if _listener is not None:
+        _listener.stop()
+
+def get_logger(name: str) -> logging.Logger:
+    """Get a logger; the first call sets up the shared queue-based pipeline."""
+    if _listener is None:
+        _configure()
+    return logging.getLogger(name)
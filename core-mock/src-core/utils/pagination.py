@@ -0,0 +1,54 @@
+"""Keyset (cursor) pagination helpers."""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import DateTime, and_, or_
+
+# Response header carrying the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(sort_value: Union[datetime, float], row_id: int) -> str:
+    """Build an opaque cursor token from the last row of a page.
+    
+    The sort value is a timestamp, or a relevance score for search results.
+    """
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(token: str) -> Tuple[Union[datetime, float], int]:
+    """Decode a cursor token. Raises ValueError if it is malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if isinstance(sort_value, str):
+            sort_value = datetime.fromisoformat(sort_value)
+        else:
+            sort_value = float(sort_value)
+        return sort_value, int(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+
+def keyset_filter(sort_column: Any, id_column: Any, token: str):
+    """WHERE clause selecting the rows after the cursor in (sort desc, id desc) order.
+    
+    Raises ValueError if the cursor was not issued for this kind of column
+    (e.g. a search score cursor sent to a timestamp-sorted listing).
+    """
+    sort_value, row_id = decode_cursor(token)
+    if isinstance(sort_value, datetime) != isinstance(sort_column.type, DateTime):
+        raise ValueError(f"Invalid cursor: {token}")
+    return or_(
+        sort_column < sort_value,
+        and_(sort_column == sort_value, id_column < row_id)
+    )
+
+def next_cursor(items: Sequence[Any], limit: int, sort_attr: str) -> Optional[str]:
+    """Cursor for the page after `items`, or None when this was the last page."""
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(getattr(last, sort_attr), last.id)
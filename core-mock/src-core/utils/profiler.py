@@ -0,0 +1,194 @@
+"""Per-request SQL profiling.
+
+When enabled for a request, every statement the request executes is counted
+and timed (the engine's cursor hooks call `record_query`). Statements
+repeated within one request are reported as N+1 candidates and slow ones are
+logged with their EXPLAIN plan. Results go to X-Query-* response headers and
+to GET /debug/queries.
+
+Enable it with QUERY_PROFILING=always, or QUERY_PROFILING=header plus an
+`X-Profile-Queries: 1` request header. `assert_max_queries` turns it on for
+the requests made inside its block, for tests.
+"""
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+
+from src.config import settings
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PROFILE_REQUEST_HEADER = b"x-profile-queries"
+QUERY_COUNT_HEADER = "X-Query-Count"
+QUERY_TIME_HEADER = "X-Query-Time-Ms"
+N_PLUS_ONE_HEADER = "X-Query-N-Plus-One"
+
+# Statements whose plan is worth capturing (EXPLAIN of writes is not portable)
+EXPLAINABLE = ("SELECT", "WITH")
+
+_current_profile: ContextVar[Optional["QueryProfile"]] = ContextVar("query_profile", default=None)
+
+# Finished request profiles, newest last, served by /debug/queries
+recent_profiles: Deque[dict] = deque(maxlen=settings.profile_history_size)
+
+# Open assert_max_queries blocks; while any is open every request is profiled
+_collectors: List[List["QueryProfile"]] = []
+
+class QueryProfile:
+    """Statements executed while handling one request."""
+    
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.queries: List[Tuple[str, float]] = []
+        self.slow: List[Dict[str, Any]] = []
+    
+    def add(self, statement: str, parameters: Any, elapsed: float, executemany: bool) -> None:
+        self.queries.append((statement, elapsed))
+        if elapsed * 1000 >= settings.profile_slow_query_ms:
+            self.slow.append({
+                "statement": statement,
+                # executemany parameter lists can be huge and can't be EXPLAINed
+                "parameters": None if executemany else parameters,
+                "duration_ms": round(elapsed * 1000, 3)
+            })
+    
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+    
+    @property
+    def total_ms(self) -> float:
+        return round(sum(elapsed for _, elapsed in self.queries) * 1000, 3)
+    
+    def repeated(self) -> List[Tuple[str, int]]:
+        """Identical statements run at least profile_n_plus_one_threshold times."""
+        counts = Counter(statement for statement, _ in self.queries)
+        return [
+            (statement, count) for statement, count in counts.most_common()
+            if count >= settings.profile_n_plus_one_threshold
+        ]
+    
+    def summary(self) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "query_count": self.count,
+            "query_time_ms": self.total_ms,
+            "request_time_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "n_plus_one": [
+                {"statement": statement, "count": count} for statement, count in self.repeated()
+            ],
+            "slow_queries": self.slow
+        }
+
+def record_query(statement: str, parameters: Any, elapsed: float, executemany: bool) -> None:
+    """Called from the engine's after_cursor_execute hook; no-op outside profiled requests."""
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.add(statement, parameters, elapsed, executemany)
+
+class QueryProfilerMiddleware:
+    """ASGI middleware that profiles the SQL of the requests it is enabled for."""
+    
+    def __init__(self, app, engine: AsyncEngine):
+        self.app = app
+        self.engine = engine
+    
+    def _enabled(self, scope) -> bool:
+        if _collectors or settings.query_profiling == "always":
+            return True
+        if settings.query_profiling == "header":
+            return dict(scope["headers"]).get(PROFILE_REQUEST_HEADER) in (b"1", b"true")
+        return False
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._enabled(scope):
+            await self.app(scope, receive, send)
+            return
+        
+        profile = QueryProfile(scope["method"], scope["path"])
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers[QUERY_COUNT_HEADER] = str(profile.count)
+                headers[QUERY_TIME_HEADER] = str(profile.total_ms)
+                headers[N_PLUS_ONE_HEADER] = str(len(profile.repeated()))
+            await send(message)
+        
+        token = _current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            route = scope.get("route")
+            profile.path = getattr(route, "path", None) or profile.path
+            await self._finish(profile)
+    
+    async def _finish(self, profile: QueryProfile) -> None:
+        for statement, count in profile.repeated():
+            logger.warning(
+                f"Possible N+1 in {profile.method} {profile.path}: statement run {count} times: {statement}"
+            )
+        for slow in profile.slow:
+            slow["explain"] = await self._explain(slow["statement"], slow["parameters"])
+            logger.warning(
+                f"Slow query in {profile.method} {profile.path} ({slow['duration_ms']} ms): "
+                f"{slow['statement']} | plan: {slow['explain']}"
+            )
+        
+        summary = profile.summary()
+        recent_profiles.append(summary)
+        for collector in _collectors:
+            collector.append(profile)
+    
+    async def _explain(self, statement: str, parameters: Any) -> Optional[List[Any]]:
+        """Plan of a slow statement, run after the response on a separate connection."""
+        if parameters is None or not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        prefix = "EXPLAIN QUERY PLAN " if self.engine.dialect.name == "sqlite" else "EXPLAIN "
+        try:
+            async with self.engine.connect() as conn:
+                result = await conn.exec_driver_sql(prefix + statement, parameters)
+                return [list(row) for row in result.all()]
+        except Exception as e:
+            return [f"EXPLAIN failed: {str(e)}"]
+
+@contextmanager
+def assert_max_queries(max_queries: int, path: Optional[str] = None) -> Iterator[List[QueryProfile]]:
+    """Test helper: fail if a request made inside the block ran too many statements.
+    
+        async def test_listing(client, db):
+            with assert_max_queries(3):
+                await client.get("/api/v1/conversations")
+    
+    Every request handled while the block is open is profiled; `path`
+    restricts the check to one route template (e.g. "/api/v1/messages").
+    Background tasks (outbox workers, reconciliation) are not counted.
+    """
+    profiles: List[QueryProfile] = []
+    _collectors.append(profiles)
+    try:
+        yield profiles
+    finally:
+        _collectors.remove(profiles)
+    
+    checked = [profile for profile in profiles if path is None or profile.path == path]
+    if not checked:
+        raise AssertionError(f"No request{' to ' + path if path else ''} was profiled")
+    
+    for profile in checked:
+        if profile.count > max_queries:
+            statements = "\n".join(f"  {statement}" for statement, _ in profile.queries)
+            raise AssertionError(
+                f"{profile.method} {profile.path} ran {profile.count} queries "
+                f"(max {max_queries}):\n{statements}"
+            )
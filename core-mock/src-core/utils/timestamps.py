@@ -0,0 +1,14 @@
+"""Timestamp normalization.
+
+The database columns are naive DATETIMEs holding UTC. Channel services and
+API clients may send offsets (`...Z`, `+02:00`); those are converted to
+naive UTC before they are stored or compared with stored values.
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Naive UTC datetime; naive input is assumed to be UTC already."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,60 @@
+"""Shared fixtures: a throwaway SQLite database per test."""
+import importlib.util
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Settings and engines are built on import, so point them at a scratch
+# directory before anything imports src
+_scratch = tempfile.mkdtemp(prefix="core-tests-")
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{_scratch}/core.db"
+os.environ["LOG_DIR"] = os.path.join(_scratch, "logs")
+
+# The package lives in src-core but is imported as `src`
+SRC_DIR = Path(__file__).resolve().parent.parent / "src-core"
+if "src" not in sys.modules:
+    spec = importlib.util.spec_from_file_location(
+        "src", SRC_DIR / "__init__.py", submodule_search_locations=[str(SRC_DIR)]
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["src"] = module
+    spec.loader.exec_module(module)
+
+@pytest.fixture
+async def db():
+    """Fresh schema with the default channels, and a session on it."""
+    from src.database import Base, SessionLocal, engine, init_db
+    from src.migrations import schema_migrations
+    from src.services.channel_registry import channel_registry
+    from src.services.channel_service import invalidate_channel_stats
+    from src.services.message_service import conversation_cache, recent_message_ids
+    from src.services.search_service import search_index
+    
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(schema_migrations.drop, checkfirst=True)
+    await init_db()
+    
+    # Process-wide caches must not leak rows of a previous test
+    channel_registry.invalidate()
+    invalidate_channel_stats()
+    conversation_cache.clear()
+    recent_message_ids.clear()
+    search_index.__init__()
+    
+    async with SessionLocal() as session:
+        yield session
+    # Connections belong to this test's event loop
+    await engine.dispose()
+
+@pytest.fixture
+async def client(db):
+    """HTTP client on the app, without running its lifespan (no background workers)."""
+    import httpx
+    from src.main import app
+    
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
@@ -0,0 +1,66 @@
+"""Archival of messages past the retention age."""
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from src.database import SessionLocal
+from src.models import ArchivedMessage, Channel, Conversation, Message
+from src.services.archive_service import ArchiveService
+from src.services.message_service import MessageService
+
+CUTOFF = datetime(2024, 1, 1)
+
+async def seed(db):
+    """Per conversation: three 2023 messages and two 2024 ones, all unread."""
+    results = await MessageService(db).process_unified_batch([
+        {"channel": "whatsapp", "sender": sender, "message": f"hello {year} {index}",
+         "timestamp": f"{year}-06-01T00:00:0{index}", "message_id": f"{sender}-{year}-{index}"}
+        for sender in ("+1", "+2")
+        for year, count in ((2023, 3), (2024, 2))
+        for index in range(count)
+    ])
+    return {result.message_id: result.conversation_id for result in results}
+
+async def unread_counts():
+    async with SessionLocal() as session:
+        conversations = dict((await session.execute(
+            select(Conversation.participant_identifier, Conversation.unread_count)
+        )).all())
+        channel = await session.scalar(select(Channel.unread_count).where(Channel.name == "whatsapp"))
+        return conversations, channel
+
+async def test_archive_moves_old_messages_in_batches(client, db):
+    await seed(db)
+    # One old message already read: it must not be subtracted again
+    old_read = await db.scalar(select(Message.id).where(Message.external_message_id == "+1-2023-0"))
+    assert (await client.put(f"/api/v1/messages/{old_read}/read")).status_code == 200
+    assert await unread_counts() == ({"+1": 4, "+2": 5}, 9)
+    
+    async with SessionLocal() as session:
+        assert await ArchiveService(session).archive_before(CUTOFF, batch_size=4) == 6
+    
+    async with SessionLocal() as session:
+        remaining = (await session.execute(select(Message.timestamp))).scalars().all()
+        assert len(remaining) == 4 and all(timestamp >= CUTOFF for timestamp in remaining)
+        assert await session.scalar(select(func.count()).select_from(ArchivedMessage)) == 6
+    assert await unread_counts() == ({"+1": 2, "+2": 2}, 4)
+    
+    # Nothing left to move
+    async with SessionLocal() as session:
+        assert await ArchiveService(session).archive_before(CUTOFF, batch_size=4) == 0
+
+async def test_archived_history_stays_readable(client, db):
+    conversations = await seed(db)
+    conversation_id = next(iter(conversations.values()))
+    # Build the search index before archiving
+    assert len((await client.get("/api/v1/messages/search", params={"q": "2023"})).json()) == 6
+    async with SessionLocal() as session:
+        await ArchiveService(session).archive_before(CUTOFF)
+    
+    detail = (await client.get(f"/api/v1/conversations/{conversation_id}")).json()
+    assert len(detail["messages"]) == 5
+    
+    # Archived messages leave the search index
+    results = (await client.get("/api/v1/messages/search", params={"q": "2023"})).json()
+    assert results == []
+    assert len((await client.get("/api/v1/messages/search", params={"q": "2024"})).json()) == 4
@@ -0,0 +1,84 @@
+"""Channel service client: retries and circuit breaker."""
+import asyncio
+
+import httpx
+import pytest
+
+from src.config import settings
+from src.services.channel_client import ChannelClient, ChannelUnavailableError
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "channel_retry_backoff", 0)
+    monkeypatch.setattr(settings, "channel_max_retries", 2)
+    monkeypatch.setattr(settings, "channel_breaker_threshold", 2)
+    monkeypatch.setattr(settings, "channel_breaker_reset_timeout", 0.05)
+
+def channel_client(*outcomes):
+    """Client whose requests get the given outcomes in order (a status code or an exception class)."""
+    calls = []
+    
+    async def handler(request):
+        await asyncio.sleep(0.001)
+        outcome = outcomes[min(len(calls), len(outcomes) - 1)]
+        calls.append(request)
+        if isinstance(outcome, int):
+            return httpx.Response(outcome, json={"success": outcome < 400})
+        raise outcome("boom", request=request)
+    
+    client = ChannelClient("whatsapp", "http://channel")
+    client.client = httpx.AsyncClient(base_url="http://channel", transport=httpx.MockTransport(handler))
+    return client, calls
+
+async def test_connect_errors_are_retried():
+    client, calls = channel_client(httpx.ConnectError, httpx.ConnectError, 200)
+    status, body = await client.send({"to": "+1"})
+    assert (status, body) == (200, {"success": True})
+    assert len(calls) == 3
+    assert client.retries == 2
+    assert client.breaker.state == "closed"
+
+async def test_read_timeout_is_not_retried():
+    client, calls = channel_client(httpx.ReadTimeout, 200)
+    with pytest.raises(httpx.ReadTimeout):
+        await client.send({"to": "+1"})
+    assert len(calls) == 1
+
+async def test_503_is_retried_until_max_retries():
+    client, calls = channel_client(503)
+    status, _ = await client.send({"to": "+1"})
+    assert status == 503
+    assert len(calls) == 1 + settings.channel_max_retries
+    assert client.breaker.failures == 1
+
+async def test_breaker_opens_then_lets_one_trial_through():
+    client, calls = channel_client(500, 500, 200)
+    for _ in range(2):
+        await client.send({"to": "+1"})
+    assert client.breaker.state == "open"
+    
+    with pytest.raises(ChannelUnavailableError):
+        await client.send({"to": "+1"})
+    assert len(calls) == 2
+    assert client.rejected == 1
+    
+    await asyncio.sleep(0.06)
+    assert client.breaker.state == "half_open"
+    # Half-open: one trial request, concurrent sends still fail fast
+    trial, concurrent = await asyncio.gather(
+        client.send({"to": "+1"}), client.send({"to": "+1"}), return_exceptions=True
+    )
+    assert trial[0] == 200
+    assert isinstance(concurrent, ChannelUnavailableError)
+    assert len(calls) == 3
+    assert client.breaker.state == "closed"
+
+async def test_failed_trial_reopens_the_breaker():
+    client, calls = channel_client(500)
+    for _ in range(2):
+        await client.send({"to": "+1"})
+    await asyncio.sleep(0.06)
+    
+    await client.send({"to": "+1"})
+    assert len(calls) == 3
+    assert client.breaker.state == "open"
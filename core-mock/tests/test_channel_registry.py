@@ -0,0 +1,37 @@
+"""In-memory channel registry used by the request paths."""
+from sqlalchemy import update
+
+from src.database import SessionLocal
+from src.models import Channel
+from src.services.channel_registry import channel_registry
+from src.utils.profiler import assert_max_queries
+
+async def test_channel_lookups_do_not_query(client, db):
+    await channel_registry.ensure_loaded(db)
+    with assert_max_queries(0):
+        response = await client.get("/api/v1/channels")
+    assert [channel["name"] for channel in response.json()] == ["whatsapp", "gmail", "instagram"]
+    with assert_max_queries(0):
+        assert (await client.get("/api/v1/channels/gmail")).status_code == 200
+    assert (await client.get("/api/v1/channels/telegram")).status_code == 404
+
+async def test_changes_show_up_after_invalidate_or_refresh(client, db):
+    await channel_registry.ensure_loaded(db)
+    async with SessionLocal() as session:
+        await session.execute(update(Channel).where(Channel.name == "instagram").values(is_active=False))
+        await session.commit()
+    
+    # Served from memory until reloaded
+    names = [channel["name"] for channel in (await client.get("/api/v1/channels")).json()]
+    assert "instagram" in names
+    
+    channel_registry.invalidate()
+    names = [channel["name"] for channel in (await client.get("/api/v1/channels")).json()]
+    assert "instagram" not in names
+    
+    async with SessionLocal() as session:
+        await session.execute(update(Channel).where(Channel.name == "instagram").values(is_active=True))
+        await session.commit()
+    await channel_registry.refresh()
+    names = [channel["name"] for channel in (await client.get("/api/v1/channels")).json()]
+    assert "instagram" in names
@@ -0,0 +1,111 @@
+"""WebSocket fan-out: per-connection queues and the overflow policies."""
+import asyncio
+
+import pytest
+
+from src.services.connection_manager import SLOW_CONSUMER_CLOSE_CODE, ConnectionManager
+
+class FakeWebSocket:
+    """Records what is sent; sends block while `blocked` is set."""
+    
+    def __init__(self, blocked: bool = False):
+        self.sent = []
+        self.closed_with = None
+        self.unblocked = asyncio.Event()
+        if not blocked:
+            self.unblocked.set()
+    
+    async def accept(self):
+        pass
+    
+    async def send_text(self, text: str):
+        await self.unblocked.wait()
+        self.sent.append(text)
+    
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+@pytest.fixture
+async def make_manager():
+    managers = []
+    
+    async def make(**options):
+        manager = ConnectionManager(send_timeout=10, heartbeat_interval=60, **options)
+        await manager.start()
+        managers.append(manager)
+        return manager
+    
+    yield make
+    for manager in managers:
+        for websocket in list(manager.connections):
+            manager.disconnect(websocket)
+        await manager.stop()
+
+async def settle():
+    """Let the writer tasks run."""
+    for _ in range(5):
+        await asyncio.sleep(0.001)
+
+async def test_slow_client_does_not_delay_others(make_manager):
+    manager = await make_manager(queue_size=10)
+    fast, slow = FakeWebSocket(), FakeWebSocket(blocked=True)
+    await manager.connect(fast)
+    await manager.connect(slow)
+    
+    for index in range(3):
+        await manager.broadcast({"n": index})
+    await settle()
+    assert fast.sent == ['{"n": 0}', '{"n": 1}', '{"n": 2}']
+    assert slow.sent == []
+    
+    slow.unblocked.set()
+    await settle()
+    assert slow.sent == fast.sent
+
+async def test_drop_oldest_keeps_the_newest_events(make_manager):
+    manager = await make_manager(queue_size=2, overflow_policy="drop_oldest")
+    slow = FakeWebSocket(blocked=True)
+    await manager.connect(slow)
+    
+    await manager.broadcast("m0")
+    await settle()
+    # m0 is being sent; m1..m4 compete for the two queue slots
+    for index in range(1, 5):
+        await manager.broadcast(f"m{index}")
+    assert manager.dropped == 2
+    
+    slow.unblocked.set()
+    await settle()
+    assert slow.sent == ["m0", "m3", "m4"]
+    assert slow in manager.connections
+
+async def test_disconnect_policy_evicts_slow_client(make_manager):
+    manager = await make_manager(queue_size=2, overflow_policy="disconnect")
+    fast, slow = FakeWebSocket(), FakeWebSocket(blocked=True)
+    await manager.connect(fast)
+    await manager.connect(slow)
+    
+    # The fast client drains its queue between events; the slow one never does
+    for index in range(4):
+        await manager.broadcast(f"m{index}")
+        await settle()
+    
+    assert slow not in manager.connections
+    assert slow.closed_with == SLOW_CONSUMER_CLOSE_CODE
+    assert manager.evicted == 1
+    assert fast.sent == ["m0", "m1", "m2", "m3"]
+
+async def test_failed_send_drops_client(make_manager):
+    class BrokenWebSocket(FakeWebSocket):
+        async def send_text(self, text: str):
+            raise ConnectionResetError("peer gone")
+    
+    manager = await make_manager()
+    broken = BrokenWebSocket()
+    await manager.connect(broken)
+    manager.subscribe(broken, "all")
+    
+    await manager.broadcast("m0")
+    await settle()
+    assert broken not in manager.connections
+    assert "all" not in manager.subscriptions
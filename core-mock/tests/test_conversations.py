@@ -0,0 +1,65 @@
+"""Conversation listings."""
+from src.schemas import UnifiedMessage
+from src.services.message_service import MessageService
+
+def unified(sender: str, message_id: str, timestamp: str = "2024-01-01T00:00:00") -> UnifiedMessage:
+    return UnifiedMessage(
+        channel="whatsapp", sender=sender, message="hello", timestamp=timestamp, message_id=message_id
+    )
+
+async def listing_ids(client):
+    response = await client.get("/api/v1/conversations")
+    assert response.status_code == 200
+    return [conversation["id"] for conversation in response.json()]
+
+async def test_reading_keeps_listing_order(client, db):
+    service = MessageService(db)
+    first_id, _ = await service.process_unified_message(unified(sender="+1", message_id="a"))
+    await service.process_unified_message(unified(sender="+2", message_id="b", timestamp="2024-01-01T00:01:00"))
+    assert await listing_ids(client) == [2, 1]
+    
+    response = await client.put(f"/api/v1/messages/{first_id}/read")
+    assert response.status_code == 200
+    assert await listing_ids(client) == [2, 1]
+    
+    # A new message does move its conversation to the top
+    await service.process_unified_message(unified(sender="+1", message_id="c", timestamp="2024-01-01T00:02:00"))
+    assert await listing_ids(client) == [1, 2]
+
+async def test_listing_etag_tracks_changes_in_scope(client, db):
+    service = MessageService(db)
+    message_id, _ = await service.process_unified_message(unified(sender="+1", message_id="a"))
+    
+    async def etag(params=None):
+        response = await client.get("/api/v1/conversations", params=params or {})
+        assert response.status_code == 200
+        return response.headers["etag"]
+    
+    all_etag, whatsapp_etag = await etag(), await etag({"channel_id": 1})
+    response = await client.get("/api/v1/conversations", headers={"If-None-Match": all_etag})
+    assert response.status_code == 304
+    
+    # A read flip changes has_unread, so the listing changes too
+    await client.put(f"/api/v1/messages/{message_id}/read")
+    assert await etag() != all_etag
+    assert await etag({"channel_id": 1}) != whatsapp_etag
+    
+    # Activity in another channel leaves the whatsapp listing alone
+    all_etag, whatsapp_etag = await etag(), await etag({"channel_id": 1})
+    await service.process_unified_message(unified(sender="x@y.z", message_id="b").model_copy(update={"channel": "gmail"}))
+    assert await etag() != all_etag
+    assert await etag({"channel_id": 1}) == whatsapp_etag
+
+async def test_duplicate_conversation_is_a_conflict(client):
+    payload = {"channel_id": 1, "external_id": "whatsapp_+9", "participant_identifier": "+9"}
+    response = await client.post("/api/v1/conversations", json=payload)
+    assert response.status_code == 200
+    conversation_id = response.json()["id"]
+    
+    response = await client.post("/api/v1/conversations", json={**payload, "external_id": "other"})
+    assert response.status_code == 409
+    assert str(conversation_id) in response.json()["detail"]
+    
+    # The session is still usable after the rollback
+    response = await client.post("/api/v1/conversations", json={**payload, "participant_identifier": "+10"})
+    assert response.status_code == 200
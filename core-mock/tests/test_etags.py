@@ -0,0 +1,82 @@
+"""Per-channel listing version behind the conversation ETags."""
+from datetime import datetime
+
+from sqlalchemy import select
+
+from src.database import SessionLocal
+from src.models import Channel
+from src.services.archive_service import ArchiveService
+from src.services.message_service import MessageService
+
+async def versions():
+    """channel name -> conversations_version, read in a fresh session."""
+    async with SessionLocal() as session:
+        return dict((await session.execute(select(Channel.name, Channel.conversations_version))).all())
+
+async def bumped(before):
+    after = await versions()
+    return {name for name in after if after[name] != before[name]}
+
+def unified(sender: str, message_id: str, channel: str = "whatsapp") -> dict:
+    return {"channel": channel, "sender": sender, "message": "hi",
+            "timestamp": "2023-01-01T00:00:00", "message_id": message_id}
+
+async def test_every_listing_change_bumps_only_its_channel(client, db):
+    before = await versions()
+    response = await client.post("/api/v1/conversations", json={
+        "channel_id": 1, "external_id": "whatsapp_+1", "participant_identifier": "+1"
+    })
+    conversation_id = response.json()["id"]
+    assert await bumped(before) == {"whatsapp"}
+    
+    before = await versions()
+    await client.put(f"/api/v1/conversations/{conversation_id}/participant", params={"participant_name": "Ana"})
+    assert await bumped(before) == {"whatsapp"}
+    
+    before = await versions()
+    message_id = (await client.post("/api/v1/messages/unified", json=unified("+1", "m1"))).json()["message_id"]
+    assert await bumped(before) == {"whatsapp"}
+    
+    before = await versions()
+    await client.put(f"/api/v1/messages/{message_id}/read")
+    assert await bumped(before) == {"whatsapp"}
+    
+    before = await versions()
+    await client.post("/api/v1/messages/unified", json=unified("a@b.c", "m2", channel="gmail"))
+    assert await bumped(before) == {"gmail"}
+    
+    before = await versions()
+    async with SessionLocal() as session:
+        assert await ArchiveService(session).archive_before(datetime(2024, 1, 1)) == 2
+    assert await bumped(before) == {"whatsapp", "gmail"}
+    
+    before = await versions()
+    await client.put(f"/api/v1/conversations/{conversation_id}/deactivate")
+    assert await bumped(before) == {"whatsapp"}
+
+async def test_batch_bumps_each_channel_once(client, db):
+    before = await versions()
+    await MessageService(db).process_unified_batch([
+        unified("+1", "m1"), unified("+2", "m2"), unified("+1", "m3"), unified("a@b.c", "m4", channel="gmail")
+    ])
+    after = await versions()
+    assert after["whatsapp"] == before["whatsapp"] + 1
+    assert after["gmail"] == before["gmail"] + 1
+    assert after["instagram"] == before["instagram"]
+
+async def test_detail_etag_follows_the_conversation(client, db):
+    message_id = (await client.post("/api/v1/messages/unified", json=unified("+1", "m1"))).json()["message_id"]
+    conversation_id = (await client.get(f"/api/v1/messages/{message_id}")).json()["conversation_id"]
+    url = f"/api/v1/conversations/{conversation_id}"
+    
+    etag = (await client.get(url)).headers["etag"]
+    assert (await client.get(url, headers={"If-None-Match": etag})).status_code == 304
+    
+    # Activity elsewhere in the channel leaves this conversation's ETag alone
+    await client.post("/api/v1/messages/unified", json=unified("+2", "m2"))
+    assert (await client.get(url, headers={"If-None-Match": etag})).status_code == 304
+    
+    await client.post("/api/v1/messages/unified", json=unified("+1", "m3"))
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
@@ -0,0 +1,100 @@
+"""Unified message ingestion."""
+from src.models import Message
+from src.schemas import UnifiedMessage
+from src.services.connection_manager import manager
+from src.services.message_service import MessageService, conversation_cache, recent_message_ids
+
+def unified(**overrides) -> UnifiedMessage:
+    fields = {
+        "channel": "whatsapp",
+        "sender": "+1",
+        "message": "hello",
+        "timestamp": "2024-01-01T00:00:00",
+        "message_id": "m1"
+    }
+    fields.update(overrides)
+    return UnifiedMessage(**fields)
+
+async def test_conversation_cached_only_after_commit(db):
+    service = MessageService(db)
+    
+    await service._get_or_create_conversation_id("whatsapp", "+1")
+    assert conversation_cache.get(("whatsapp", "+1")) is None
+    await db.rollback()
+    assert conversation_cache.get(("whatsapp", "+1")) is None
+    
+    message_id, created = await service.process_unified_message(unified())
+    assert created
+    cached = conversation_cache.get(("whatsapp", "+1"))
+    assert cached is not None
+    message = await service.get_message_by_id(message_id)
+    assert message.conversation_id == cached
+
+async def test_batch_counter_totals(client, db):
+    items = [
+        {"channel": channel, "sender": sender, "message": f"m{index}",
+         "timestamp": f"2024-01-01T00:00:{index:02d}", "message_id": f"{channel}-{sender}-{index}"}
+        for channel, sender, count in [("whatsapp", "+2", 3), ("gmail", "a@b.c", 2), ("whatsapp", "+1", 4)]
+        for index in range(count)
+    ]
+    results = await MessageService(db).process_unified_batch(items)
+    assert all(result.status == "success" for result in results)
+    
+    response = await client.get("/api/v1/conversations")
+    unread = {item["participant_identifier"]: item["unread_count"] for item in response.json()}
+    assert unread == {"+1": 4, "+2": 3, "a@b.c": 2}
+    
+    stats = {item["channel_name"]: item["unread_count"] for item in (await client.get("/api/v1/channels/stats")).json()}
+    assert stats == {"whatsapp": 7, "gmail": 2, "instagram": 0}
+    assert (await client.get("/api/v1/messages/unread/count")).json() == {"unread_count": 9}
+
+async def test_publish_failure_keeps_stored_messages(client, db, monkeypatch):
+    async def broken_publish(topics, event):
+        raise ConnectionError("pub/sub down")
+    monkeypatch.setattr(manager, "publish", broken_publish)
+    
+    response = await client.post("/api/v1/messages/unified", json=unified().model_dump())
+    assert response.status_code == 200
+    assert await db.get(Message, response.json()["message_id"]) is not None
+    
+    response = await client.post("/api/v1/messages/unified/batch", json=[
+        unified(message_id="m2").model_dump(), unified(message_id="m3").model_dump()
+    ])
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == ["success", "success"]
+    for result in results:
+        assert await db.get(Message, result["message_id"]) is not None
+
+async def test_webhook_retry_returns_the_stored_message(client, db):
+    first = (await client.post("/api/v1/messages/unified", json=unified().model_dump())).json()
+    assert first["duplicate"] is False
+    
+    # Answered from the recent-ids cache, then (cache cleared) by the unique key
+    for clear_cache in (False, True):
+        if clear_cache:
+            recent_message_ids.clear()
+        retry = (await client.post("/api/v1/messages/unified", json=unified(message="edited").model_dump())).json()
+        assert retry == {"status": "success", "message_id": first["message_id"], "duplicate": True}
+    
+    # The same external id from another participant is another message
+    other = (await client.post("/api/v1/messages/unified", json=unified(sender="+2").model_dump())).json()
+    assert other["duplicate"] is False
+    assert (await client.get("/api/v1/messages/unread/count")).json() == {"unread_count": 2}
+
+async def test_batch_reports_duplicates_with_the_stored_id(client, db):
+    stored = (await client.post("/api/v1/messages/unified", json=unified().model_dump())).json()
+    recent_message_ids.clear()
+    
+    response = await client.post("/api/v1/messages/unified/batch", json=[
+        unified().model_dump(),
+        unified(message_id="m2").model_dump(),
+        unified(message_id="m2").model_dump(),
+    ])
+    body = response.json()
+    assert (body["succeeded"], body["duplicates"], body["failed"]) == (1, 2, 0)
+    first, new, repeated = body["results"]
+    assert (first["status"], first["message_id"]) == ("duplicate", stored["message_id"])
+    assert new["status"] == "success"
+    assert (repeated["status"], repeated["message_id"]) == ("duplicate", new["message_id"])
+    assert (await client.get("/api/v1/messages/unread/count")).json() == {"unread_count": 2}
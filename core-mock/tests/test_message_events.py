@@ -0,0 +1,80 @@
+"""message.created events pushed to WebSocket subscribers by topic."""
+import asyncio
+import json
+
+import pytest
+
+from src.services.connection_manager import manager
+
+class Subscriber:
+    """Stand-in WebSocket that records the events it is sent."""
+    
+    def __init__(self):
+        self.events = []
+    
+    async def accept(self):
+        pass
+    
+    async def send_text(self, text: str):
+        self.events.append(json.loads(text))
+    
+    async def close(self, code: int = 1000):
+        pass
+
+@pytest.fixture
+async def subscribe():
+    await manager.start()
+    subscribers = []
+    
+    async def connect(*topics: str) -> Subscriber:
+        subscriber = Subscriber()
+        await manager.connect(subscriber)
+        for topic in topics:
+            assert manager.subscribe(subscriber, topic)
+        subscribers.append(subscriber)
+        return subscriber
+    
+    yield connect
+    for subscriber in subscribers:
+        manager.disconnect(subscriber)
+    await manager.stop()
+
+async def ingest(client, channel: str, sender: str, message_id: str) -> dict:
+    response = await client.post("/api/v1/messages/unified", json={
+        "channel": channel, "sender": sender, "message": "hi",
+        "timestamp": "2024-01-01T00:00:00", "message_id": message_id
+    })
+    assert response.status_code == 200
+    await asyncio.sleep(0.01)
+    return response.json()
+
+async def test_events_reach_matching_topics_once(client, db, subscribe):
+    everything = await subscribe("all")
+    whatsapp = await subscribe("channel:whatsapp", "all")
+    gmail = await subscribe("channel:gmail")
+    
+    stored = await ingest(client, "whatsapp", "+1", "m1")
+    
+    assert gmail.events == []
+    for subscriber in (everything, whatsapp):
+        [event] = subscriber.events
+        assert event["type"] == "message.created"
+        assert event["channel"] == "whatsapp"
+        assert event["message"]["id"] == stored["message_id"]
+
+async def test_conversation_topic(client, db, subscribe):
+    first = await ingest(client, "whatsapp", "+1", "m1")
+    conversation_id = (await client.get(f"/api/v1/messages/{first['message_id']}")).json()["conversation_id"]
+    subscriber = await subscribe(f"conversation:{conversation_id}")
+    
+    await ingest(client, "whatsapp", "+2", "m2")
+    second = await ingest(client, "whatsapp", "+1", "m3")
+    # A webhook retry stores nothing and publishes nothing
+    await ingest(client, "whatsapp", "+1", "m3")
+    
+    assert [event["message"]["id"] for event in subscriber.events] == [second["message_id"]]
+
+async def test_unknown_topic_is_rejected(subscribe):
+    subscriber = await subscribe()
+    assert not manager.subscribe(subscriber, "channel:")
+    assert not manager.subscribe(subscriber, "conversation:abc")
@@ -0,0 +1,95 @@
+"""Outbox delivery: what gets retried, and sent messages are never sent twice."""
+import asyncio
+
+import httpx
+import pytest
+
+from src.database import SessionLocal
+from src.schemas import SendMessageRequest
+from src.services import outbox_service
+from src.services.channel_client import ChannelClient
+from src.services.message_service import MessageService
+from src.services.outbox_service import OutboxDispatcher, OutboxService
+
+def channel_client(handler) -> ChannelClient:
+    """Channel client whose HTTP requests are answered by `handler`."""
+    client = ChannelClient("whatsapp", "http://channel")
+    client.client = httpx.AsyncClient(base_url="http://channel", transport=httpx.MockTransport(handler))
+    return client
+
+@pytest.fixture
+def channel(monkeypatch):
+    def use(handler):
+        client = channel_client(handler)
+        monkeypatch.setattr(outbox_service.channel_clients, "get", lambda name: client)
+    return use
+
+async def deliver_one(db):
+    """Enqueue, claim and deliver one message, each step in its own session as the workers do."""
+    item = await OutboxService(db).enqueue(SendMessageRequest(channel="whatsapp", to="+1", message="hi"))
+    async with SessionLocal() as session:
+        assert await OutboxService(session).claim_due(10) == [item.id]
+    async with SessionLocal() as session:
+        await OutboxService(session).deliver(item.id)
+    async with SessionLocal() as session:
+        return await OutboxService(session).get_status(item.id)
+
+async def test_sent_message_is_stored(db, channel):
+    channel(lambda request: httpx.Response(200, json={"success": True, "message_id": "wamid.1"}))
+    status = await deliver_one(db)
+    assert status.status == "sent"
+    assert status.message_id is not None
+
+async def test_non_json_gateway_error_is_retried(db, channel):
+    channel(lambda request: httpx.Response(502, text="<html>Bad Gateway</html>"))
+    status = await deliver_one(db)
+    assert status.status == "pending"
+    assert "HTTP 502" in status.error
+
+async def test_read_timeout_is_not_retried(db, channel):
+    def handler(request):
+        raise httpx.ReadTimeout("timed out", request=request)
+    
+    channel(handler)
+    status = await deliver_one(db)
+    assert status.status == "failed"
+    assert "ReadTimeout" in status.error
+
+async def test_sent_status_survives_storage_failure(db, channel, monkeypatch):
+    channel(lambda request: httpx.Response(200, json={"success": True, "message_id": "wamid.1"}))
+    
+    async def broken_create_message(self, *args, **kwargs):
+        raise RuntimeError("database went away")
+    
+    monkeypatch.setattr(MessageService, "create_message", broken_create_message)
+    status = await deliver_one(db)
+    assert status.status == "sent"
+    assert status.message_id is None
+    async with SessionLocal() as session:
+        assert await OutboxService(session).claim_due(10) == []
+
+async def test_dispatcher_leases_only_for_idle_workers(db, monkeypatch):
+    release = asyncio.Event()
+    delivering = []
+    
+    async def slow_deliver(self, outbox_id):
+        delivering.append(outbox_id)
+        await release.wait()
+    
+    monkeypatch.setattr(OutboxService, "deliver", slow_deliver)
+    for _ in range(5):
+        await OutboxService(db).enqueue(SendMessageRequest(channel="whatsapp", to="+1", message="hi"))
+    
+    dispatcher = OutboxDispatcher(workers=2, poll_interval=60)
+    await dispatcher.start()
+    try:
+        for _ in range(20):
+            await asyncio.sleep(0.01)
+            # Both workers busy: wake-ups must not lease more rows
+            dispatcher.notify()
+        assert len(delivering) == 2
+        async with SessionLocal() as session:
+            assert len(await OutboxService(session).claim_due(10)) == 3
+    finally:
+        release.set()
+        await dispatcher.stop()
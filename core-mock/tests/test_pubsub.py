@@ -0,0 +1,80 @@
+"""Pub/sub backends that fan WebSocket events out to the workers."""
+import asyncio
+import os
+import socket
+
+from src.services.connection_manager import ConnectionManager
+from src.services.pubsub import RedisBackend, UnixSocketBackend, publish_errors
+
+def errors(backend: str) -> float:
+    return publish_errors._values.get((backend,), 0.0)
+
+async def test_unix_publish_before_start_is_counted_not_raised(tmp_path):
+    backend = UnixSocketBackend(str(tmp_path))
+    before = errors("unix")
+    await backend.publish({"kind": "broadcast", "text": "x"})
+    assert errors("unix") == before + 1
+
+async def test_redis_publish_failure_is_counted_not_raised():
+    class DownRedis:
+        async def publish(self, channel, data):
+            raise ConnectionError("Connection refused")
+    
+    backend = RedisBackend("redis://localhost:6379/0", "events")
+    before = errors("redis")
+    await backend.publish({"kind": "broadcast", "text": "x"})
+    backend._redis = DownRedis()
+    await backend.publish({"kind": "broadcast", "text": "x"})
+    assert errors("redis") == before + 2
+
+async def test_unix_backend_delivers_to_every_worker_once(tmp_path):
+    workers = [UnixSocketBackend(str(tmp_path)) for _ in range(3)]
+    received = {backend.worker_id: [] for backend in workers}
+    for backend in workers:
+        async def handler(envelope, seen=received[backend.worker_id]):
+            seen.append(envelope)
+        await backend.start(handler)
+    
+    # A worker that died without removing its socket file
+    stale = str(tmp_path / "dead.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as dead:
+        dead.bind(stale)
+    
+    try:
+        await workers[0].publish({"kind": "broadcast", "text": "x"})
+        await asyncio.sleep(0.05)
+        for seen in received.values():
+            assert seen == [{"kind": "broadcast", "text": "x", "origin": workers[0].worker_id}]
+        assert not os.path.exists(stale)
+    finally:
+        for backend in workers:
+            await backend.stop()
+
+async def test_broadcast_reaches_clients_of_other_workers(tmp_path):
+    class Client:
+        def __init__(self):
+            self.sent = []
+        
+        async def accept(self):
+            pass
+        
+        async def send_text(self, text):
+            self.sent.append(text)
+    
+    managers = [
+        ConnectionManager(backend=UnixSocketBackend(str(tmp_path)), heartbeat_interval=60)
+        for _ in range(2)
+    ]
+    clients = [Client(), Client()]
+    for manager, client in zip(managers, clients):
+        await manager.start()
+        await manager.connect(client)
+    
+    try:
+        await managers[0].broadcast("hello")
+        await asyncio.sleep(0.05)
+        assert [client.sent for client in clients] == [["hello"], ["hello"]]
+    finally:
+        for manager, client in zip(managers, clients):
+            manager.disconnect(client)
+            await manager.stop()
@@ -0,0 +1,29 @@
+"""Statement budgets of the read endpoints: a regression to N+1 fails here."""
+import pytest
+
+from src.services.message_service import MessageService
+from src.utils.profiler import assert_max_queries
+
+async def seed(db) -> None:
+    # Ten conversations with several messages each, over two channels
+    await MessageService(db).process_unified_batch([
+        {"channel": channel, "sender": f"{channel}-{index % 5}", "message": f"m{index}",
+         "timestamp": f"2024-01-01T00:{index:02d}:00", "message_id": f"{channel}-{index}"}
+        for channel in ("whatsapp", "gmail")
+        for index in range(30)
+    ])
+
+@pytest.mark.parametrize("path, max_queries", [
+    # Listing version, page of conversations, last messages of the whole page
+    ("/api/v1/conversations", 3),
+    # Version, conversation, its messages, archived messages to fill the page
+    ("/api/v1/conversations/1", 4),
+    ("/api/v1/messages", 1),
+    ("/api/v1/channels/stats", 1),
+    ("/api/v1/channels/whatsapp/stats", 1),
+])
+async def test_read_endpoint_query_budget(client, db, path, max_queries):
+    await seed(db)
+    with assert_max_queries(max_queries):
+        response = await client.get(path)
+    assert response.status_code == 200
@@ -0,0 +1,126 @@
+"""The hot listing and lookup queries must be served by indexes (SQLite plans)."""
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import event
+
+from src.database import engine
+from src.services.conversation_service import ConversationService
+from src.services.message_service import MessageService
+
+TABLES = ("messages", "conversations", "channels")
+
+@asynccontextmanager
+async def captured_selects():
+    """Collect the (statement, parameters) of every SELECT run inside the block."""
+    statements: List[Tuple[str, tuple]] = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+    
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+async def query_plans(db, statements) -> List[List[str]]:
+    """EXPLAIN QUERY PLAN details of each captured statement."""
+    conn = await db.connection()
+    plans = []
+    for statement, parameters in statements:
+        result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        plans.append([row[3] for row in result.all()])
+    return plans
+
+def assert_indexed(plan: List[str]) -> None:
+    """Every table access goes through an index; scans of subqueries are fine."""
+    assert any("USING INDEX" in step or "USING COVERING INDEX" in step for step in plan), plan
+    for step in plan:
+        for table in TABLES:
+            if step.startswith(f"SCAN {table}"):
+                assert "USING" in step and "INDEX" in step, plan
+
+def assert_searched(plan: List[str], table: str) -> None:
+    """The table is reached through an index lookup, never scanned."""
+    assert_indexed(plan)
+    assert any(step.startswith(f"SEARCH {table} USING") for step in plan), plan
+    assert not any(step.startswith(f"SCAN {table}") for step in plan), plan
+
+def assert_index_ordered(plan: List[str]) -> None:
+    """A LIMITed listing walks a sort index instead of sorting the table."""
+    assert_indexed(plan)
+    assert not any(step == "USE TEMP B-TREE FOR ORDER BY" for step in plan), plan
+
+async def seed(db) -> None:
+    start = datetime(2024, 1, 1)
+    items = [
+        {
+            "channel": channel,
+            "sender": f"+{sender}",
+            "message": f"message {index}",
+            "timestamp": (start + timedelta(minutes=index)).isoformat(),
+            "message_id": f"{channel}-{sender}-{index}"
+        }
+        for channel in ("whatsapp", "gmail")
+        for sender in range(3)
+        for index in range(5)
+    ]
+    await MessageService(db).process_unified_batch(items)
+
+async def test_get_messages_plans(db):
+    await seed(db)
+    service = MessageService(db)
+    
+    async with captured_selects() as statements:
+        await service.get_messages(conversation_id=1)
+        await service.get_messages(conversation_id=1, channel="whatsapp")
+    for plan in await query_plans(db, statements):
+        assert_searched(plan, "messages")
+    
+    async with captured_selects() as statements:
+        await service.get_messages()
+    [plan] = await query_plans(db, statements)
+    assert_index_ordered(plan)
+
+async def test_get_conversations_plans(db):
+    await seed(db)
+    service = ConversationService(db)
+    
+    async with captured_selects() as statements:
+        await service.get_conversations(channel_id=1)
+    listing, recent = await query_plans(db, statements)
+    assert_searched(listing, "conversations")
+    assert_index_ordered(listing)
+    assert_searched(recent, "messages")
+    
+    async with captured_selects() as statements:
+        await service.get_conversations()
+    listing, recent = await query_plans(db, statements)
+    assert_index_ordered(listing)
+    assert_searched(recent, "messages")
+
+async def test_listing_version_plan(db):
+    await seed(db)
+    
+    async with captured_selects() as statements:
+        await ConversationService(db).get_listing_version(channel_id=1)
+    [plan] = await query_plans(db, statements)
+    assert any(step.startswith("SEARCH channels USING INTEGER PRIMARY KEY") for step in plan), plan
+    assert not any(step.startswith("SCAN conversations") for step in plan), plan
+
+async def test_upsert_lookup_plans(db):
+    await seed(db)
+    service = MessageService(db)
+    
+    async with captured_selects() as statements:
+        await service._select_conversation_ids(
+            [("whatsapp", "+1"), ("whatsapp", "+2"), ("gmail", "+2")],
+            {"whatsapp": 1, "gmail": 2}
+        )
+        await service._select_message_ids([(1, "whatsapp-0-1"), (1, "whatsapp-0-2"), (2, "missing")])
+    conversations_plan, messages_plan = await query_plans(db, statements)
+    assert_searched(conversations_plan, "conversations")
+    assert_searched(messages_plan, "messages")
@@ -0,0 +1,62 @@
+"""Bulk read-state endpoints."""
+from sqlalchemy import select
+
+from src.config import settings
+from src.database import SessionLocal
+from src.models import Channel, Conversation, Message
+from src.services.message_service import MessageService
+
+async def seed(db):
+    """Five incoming messages in one WhatsApp conversation, one in another; ids in time order."""
+    results = await MessageService(db).process_unified_batch([
+        {"channel": "whatsapp", "sender": sender, "message": f"m{index}",
+         "timestamp": f"2024-01-01T00:00:{index:02d}", "message_id": f"m{index}"}
+        for index, sender in enumerate(["+1"] * 5 + ["+2"])
+    ])
+    return [result.message_id for result in results], results[0].conversation_id
+
+async def read_state(conversation_id: int):
+    """(read message ids, conversation unread count, WhatsApp unread count) in a fresh session."""
+    async with SessionLocal() as session:
+        read = set((await session.execute(select(Message.id).where(Message.is_read == True))).scalars())
+        conversation_unread = await session.scalar(
+            select(Conversation.unread_count).where(Conversation.id == conversation_id)
+        )
+        channel_unread = await session.scalar(select(Channel.unread_count).where(Channel.name == "whatsapp"))
+        return read, conversation_unread, channel_unread
+
+async def test_mark_read_id_cap_has_its_own_setting(client, monkeypatch):
+    monkeypatch.setattr(settings, "mark_read_max_ids", 2)
+    monkeypatch.setattr(settings, "unified_batch_max_size", 100)
+    response = await client.post("/api/v1/messages/read", json={"message_ids": [1, 2, 3]})
+    assert response.status_code == 413
+    response = await client.post("/api/v1/messages/read", json={"message_ids": [1, 2]})
+    assert response.status_code == 200
+
+async def test_mark_conversation_read_up_to_message(client, db):
+    ids, conversation_id = await seed(db)
+    assert (await read_state(conversation_id))[1:] == (5, 6)
+    
+    response = await client.put(
+        f"/api/v1/conversations/{conversation_id}/read", params={"up_to_message_id": ids[2]}
+    )
+    assert response.status_code == 200
+    assert response.json()["updated"] == 3
+    assert await read_state(conversation_id) == (set(ids[:3]), 2, 3)
+    
+    # Already read messages are not counted again
+    response = await client.put(f"/api/v1/conversations/{conversation_id}/read")
+    assert response.json()["updated"] == 2
+    assert await read_state(conversation_id) == (set(ids[:5]), 0, 1)
+
+async def test_mark_messages_read_by_id(client, db):
+    ids, conversation_id = await seed(db)
+    
+    response = await client.post("/api/v1/messages/read", json={"message_ids": [ids[1], ids[3], ids[5], 999]})
+    assert response.status_code == 200
+    assert response.json()["updated"] == 3
+    assert await read_state(conversation_id) == ({ids[1], ids[3], ids[5]}, 3, 3)
+    
+    response = await client.post("/api/v1/messages/read", json={"message_ids": [ids[1], ids[4]]})
+    assert response.json()["updated"] == 1
+    assert await read_state(conversation_id) == ({ids[1], ids[3], ids[4], ids[5]}, 2, 2)
@@ -0,0 +1,100 @@
+"""Read-your-writes routing between the primary and the replicas."""
+import time
+
+import pytest
+from fastapi import Response
+from starlette.requests import Request
+
+from src import database
+from src.config import settings
+
+def make_request(host: str = "127.0.0.1", headers: dict = None) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "client": (host, 5000),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    })
+
+@pytest.fixture
+def with_replica(monkeypatch):
+    monkeypatch.setattr(database, "replica_engines", [database.engine])
+    database.recent_writers.clear()
+
+async def write(request: Request) -> Response:
+    response = Response()
+    session = database.get_db(request, response)
+    await session.__anext__()
+    await session.aclose()
+    return response
+
+async def test_writes_do_not_pin_other_clients_on_the_same_address(with_replica):
+    await write(make_request())
+    assert not database._reads_primary(make_request())
+
+async def test_writer_reads_primary_by_cookie_or_client_id(with_replica):
+    response = await write(make_request(headers={"X-Client-Id": "whatsapp-service"}))
+    cookie = response.headers["set-cookie"].split(";")[0]
+    
+    assert database._reads_primary(make_request(headers={"Cookie": cookie}))
+    assert database._reads_primary(make_request(headers={"X-Client-Id": "whatsapp-service"}))
+    assert not database._reads_primary(make_request(headers={"X-Client-Id": "gmail-service"}))
+
+async def test_expired_cookie_reads_the_replica(with_replica):
+    expired = f"{database.PRIMARY_COOKIE}={time.time() - 1:.3f}"
+    assert not database._reads_primary(make_request(headers={"Cookie": expired}))
+    garbage = f"{database.PRIMARY_COOKIE}=soon"
+    assert not database._reads_primary(make_request(headers={"Cookie": garbage}))
+
+def test_router_skips_lagging_and_unavailable_replicas(monkeypatch):
+    monkeypatch.setattr(settings, "db_replica_max_lag", 5)
+    replicas = ["replica-0", "replica-1", "replica-2"]
+    router = database.ReplicaRouter(replicas)
+    
+    # Not checked yet: everything goes to the primary
+    assert router.choose() is database.engine
+    
+    router.lag = [0.5, None, 2.0]
+    assert {router.choose() for _ in range(4)} == {"replica-0", "replica-2"}
+    router.lag = [30.0, None, 6.0]
+    assert router.choose() is database.engine
+
+async def test_router_check_marks_broken_replica_unavailable(tmp_path):
+    broken = database._create_engine(f"sqlite+aiosqlite:///{tmp_path}/missing/replica.db")
+    router = database.ReplicaRouter([database.engine, broken])
+    await router.check()
+    assert router.lag == [0.0, None]
+    assert [replica["in_use"] for replica in router.status()] == [True, False]
+    await broken.dispose()
+
+@pytest.fixture
+async def stale_replica(monkeypatch, tmp_path):
+    """An empty database standing in for a replica that has not caught up."""
+    replica = database._create_engine(f"sqlite+aiosqlite:///{tmp_path}/replica.db")
+    async with replica.begin() as conn:
+        await conn.run_sync(database.Base.metadata.create_all)
+    router = database.ReplicaRouter([replica])
+    router.lag = [0.0]
+    monkeypatch.setattr(database, "replica_engines", [replica])
+    monkeypatch.setattr(database, "replica_router", router)
+    database.recent_writers.clear()
+    yield replica
+    await replica.dispose()
+
+async def test_writer_reads_its_own_writes_through_the_api(client, db, stale_replica):
+    response = await client.post(
+        "/api/v1/messages/unified",
+        headers={"X-Client-Id": "whatsapp-service"},
+        json={"channel": "whatsapp", "sender": "+1", "message": "hi",
+              "timestamp": "2024-01-01T00:00:00", "message_id": "m1"}
+    )
+    assert response.status_code == 200
+    
+    # Cookie-less service: the header keeps it on the primary
+    client.cookies.clear()
+    response = await client.get("/api/v1/messages", headers={"X-Client-Id": "whatsapp-service"})
+    assert len(response.json()) == 1
+    # Everybody else reads the (stale) replica
+    assert (await client.get("/api/v1/messages")).json() == []
+    assert (await client.get("/api/v1/messages", headers={"X-Client-Id": "gmail-service"})).json() == []
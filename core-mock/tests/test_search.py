@@ -0,0 +1,50 @@
+"""Message search filters and paging."""
+from sqlalchemy import delete
+
+from src.models import Message
+from src.services.message_service import MessageService
+from src.utils.pagination import NEXT_CURSOR_HEADER
+
+async def test_date_filters_accept_aware_and_naive_datetimes(client, db):
+    await MessageService(db).process_unified_batch([
+        {"channel": "whatsapp", "sender": "+1", "message": "hello there",
+         "timestamp": "2024-01-01T10:00:00Z", "message_id": "a"},
+        {"channel": "whatsapp", "sender": "+1", "message": "hello again",
+         "timestamp": "2024-01-01T12:00:00+02:00", "message_id": "b"},
+    ])
+    
+    for date_from in ("2023-01-01T00:00:00", "2023-01-01T00:00:00Z"):
+        response = await client.get("/api/v1/messages/search", params={"q": "hello", "date_from": date_from})
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+    
+    # 12:00+02:00 is 10:00 UTC like the first message; 12:00+01:00 is later
+    response = await client.get(
+        "/api/v1/messages/search", params={"q": "hello", "date_from": "2024-01-01T12:00:00+01:00"}
+    )
+    assert response.status_code == 200
+    assert len(response.json()) == 0
+    response = await client.get(
+        "/api/v1/messages/search", params={"q": "hello", "date_to": "2024-01-01T10:00:00Z"}
+    )
+    assert len(response.json()) == 2
+
+async def test_pages_stay_full_when_hits_are_gone(client, db):
+    await MessageService(db).process_unified_batch([
+        {"channel": "whatsapp", "sender": "+1", "message": "hello " + "word " * index,
+         "timestamp": f"2024-01-01T10:00:{index:02d}", "message_id": str(index)}
+        for index in range(5)
+    ])
+    response = await client.get("/api/v1/messages/search", params={"q": "hello"})
+    ranked = [item["id"] for item in response.json()]
+    assert len(ranked) == 5
+    
+    # Deleted by another worker: still in this process's index
+    await db.execute(delete(Message).where(Message.id.in_(ranked[:2])))
+    await db.commit()
+    
+    response = await client.get("/api/v1/messages/search", params={"q": "hello", "limit": 2})
+    assert [item["id"] for item in response.json()] == ranked[2:4]
+    cursor = response.headers[NEXT_CURSOR_HEADER]
+    response = await client.get("/api/v1/messages/search", params={"q": "hello", "limit": 2, "cursor": cursor})
+    assert [item["id"] for item in response.json()] == ranked[4:]
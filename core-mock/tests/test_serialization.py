@@ -0,0 +1,34 @@
+"""List endpoints render the same JSON as the previous from_orm + response_model path."""
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+from src.benchmarks.serialization_benchmark import (
+    legacy_conversations, legacy_messages, response_field, seed
+)
+from src.database import SessionLocal
+
+async def legacy_body(path: str, items) -> bytes:
+    content = await serialize_response(field=response_field(path), response_content=items, is_coroutine=True)
+    return JSONResponse(content).body
+
+async def test_messages_json_unchanged(client, db):
+    await seed(conversations=4, messages_per_conversation=6)
+    async with SessionLocal() as session:
+        expected = await legacy_body("/api/v1/messages", await legacy_messages(session, 20))
+    
+    response = await client.get("/api/v1/messages", params={"limit": 20})
+    assert response.status_code == 200
+    assert len(response.json()) == 20
+    assert response.content == expected
+
+async def test_conversations_json_unchanged(client, db):
+    await seed(conversations=4, messages_per_conversation=6)
+    async with SessionLocal() as session:
+        expected = await legacy_body(
+            "/api/v1/conversations", await legacy_conversations(session, 50, messages_limit=5)
+        )
+    
+    response = await client.get("/api/v1/conversations", params={"messages_limit": 5})
+    assert response.status_code == 200
+    assert [len(item["messages"]) for item in response.json()] == [5] * 4
+    assert response.content == expected